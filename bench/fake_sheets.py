@@ -0,0 +1,153 @@
+import json
+import random
+import threading
+import time
+from collections import deque
+import gspread
+import requests
+
+
+class SimulatedGoogle:
+    """Latency, quota and error model shared by every fake worksheet of one benchmark run."""
+
+    def __init__(self, latency=0.08, latency_per_kb=0.0005, jitter=0.3, reads_per_minute=300, writes_per_minute=300, error_rate=0.0, seed=None):
+        self.latency = latency  # Seconds every request takes at least
+        self.latency_per_kb = latency_per_kb  # Extra seconds per KiB of payload
+        self.jitter = jitter  # Latency varies by up to this fraction either way
+        self.quotas = {"read": reads_per_minute, "write": writes_per_minute}
+        self.error_rate = error_rate  # Probability of a spontaneous 429 on any request
+        self.random = random.Random(seed)
+        self.calls = {}  # method -> requests
+        self.bytes = 0
+        self.rejected = 0  # Requests answered with 429
+        self._windows = {"read": deque(), "write": deque()}  # Monotonic times of the requests in the last minute
+        self._lock = threading.Lock()
+
+    def request(self, kind, method, payload):
+        """Accounts one API request, sleeps for its latency and raises a 429 APIError when it is over quota."""
+        size = len(json.dumps(payload, default=str)) if payload is not None else 0
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            self.bytes += size
+            now = time.monotonic()
+            window = self._windows.setdefault(kind, deque())
+            while window and now - window[0] >= 60:
+                window.popleft()
+            quota = self.quotas.get(kind)  # Drive metadata calls have no Sheets quota
+            over_quota = quota is not None and len(window) >= quota
+            if not over_quota:
+                window.append(now)
+            spontaneous = self.random.random() < self.error_rate
+            delay = (self.latency + self.latency_per_kb * size / 1024) * (1 + self.random.uniform(-self.jitter, self.jitter))
+        time.sleep(delay)
+        if over_quota or spontaneous:
+            with self._lock:
+                self.rejected += 1
+            raise quota_error()
+
+    def stats(self):
+        with self._lock:
+            return {"calls": dict(self.calls), "bytes": self.bytes, "rejected": self.rejected}
+
+
+def quota_error():
+    """Builds the APIError gspread raises for a 429 answer."""
+    response = requests.Response()
+    response.status_code = 429
+    response._content = json.dumps({"error": {"code": 429, "message": "Quota exceeded (simulated)", "status": "RESOURCE_EXHAUSTED"}}).encode()
+    return gspread.exceptions.APIError(response)
+
+
+class FakeWorksheet:
+    """In-memory stand-in for gspread.Worksheet, implementing the calls the bot's storage backend makes."""
+
+    def __init__(self, google, spreadsheet, title, rows, width=30):
+        self.google = google
+        self.spreadsheet = spreadsheet
+        self.spreadsheet_id = spreadsheet.id
+        self.title = title
+        self.id = title
+        self.width = width
+        self.rows = [_padded(row, width) for row in rows]
+        self._lock = threading.Lock()
+
+    def get_all_values(self, *args, **kwargs):
+        with self._lock:
+            rows = [list(_trimmed(row)) for row in self.rows]
+        self.google.request("read", "get_all_values", rows)
+        return rows
+
+    def batch_get(self, ranges, **kwargs):
+        self.google.request("read", "batch_get", ranges)
+        with self._lock:
+            results = []
+            for address in ranges:
+                row, col = gspread.utils.a1_to_rowcol(address.split(":")[0])
+                value = self.rows[row - 1][col - 1] if row <= len(self.rows) and col <= self.width else ""
+                results.append([[value]] if value != "" else [])
+            return results
+
+    def batch_update(self, data, **kwargs):
+        self.google.request("write", "batch_update", data)
+        with self._lock:
+            for entry in data:
+                row, col = gspread.utils.a1_to_rowcol(entry["range"].split(":")[0])
+                for i, values in enumerate(entry["values"]):
+                    for j, value in enumerate(values):
+                        self._set(row + i, col + j, value)
+            self.spreadsheet.modified()
+
+    def update(self, range_name, values, **kwargs):
+        self.batch_update([{"range": range_name, "values": values}])
+
+    def _set(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([""] * self.width)
+        self.rows[row - 1][col - 1] = "" if value is None else str(value)
+
+
+class FakeSpreadsheet:
+    def __init__(self, google, title):
+        self.google = google
+        self.title = title
+        self.id = f"fake-{title}"
+        self.tabs = {}
+        self._modified = 0
+
+    def add_worksheet(self, title, rows):
+        self.tabs[title] = FakeWorksheet(self.google, self, title, rows)
+        return self.tabs[title]
+
+    def worksheet(self, title):
+        self.google.request("read", "worksheet", None)
+        return self.tabs[title]
+
+    def modified(self):
+        self._modified += 1
+
+    def get_lastUpdateTime(self):
+        self.google.request("metadata", "get_lastUpdateTime", None)
+        return str(self._modified)
+
+
+class FakeClient:
+    """Stand-in for the authorized gspread client, install it as utils.connections._client."""
+
+    def __init__(self, spreadsheets):
+        self.spreadsheets = {spreadsheet.title: spreadsheet for spreadsheet in spreadsheets}
+
+    def open(self, title):
+        return self.spreadsheets[title]
+
+    def open_by_key(self, key):
+        return next(spreadsheet for spreadsheet in self.spreadsheets.values() if spreadsheet.id == key)
+
+
+def _padded(row, width):
+    return [str(value) for value in row] + [""] * (width - len(row))
+
+def _trimmed(row):
+    end = len(row)
+    while end and row[end - 1] == "":
+        end -= 1
+    return row[:end]
@@ -0,0 +1,317 @@
+"""Offline load test of the qualifiers commands against a simulated Google Sheet.
+
+Runs from the bot's root directory, no Discord or Google credentials are needed:
+
+    python -m bench.run --lobbies 50,500,5000 --ops 500 --concurrency 16
+
+Every size seeds a fresh QSchedule, then concurrent workers call the Qualifiers cog's slash commands with fake
+interactions and the reminder tick with due lobbies. The report lists per operation latency percentiles, error
+counts and Sheets reads/writes per call, plus the API calls, bytes and 429s the simulated Google saw.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+import pytz
+
+from bench.fake_sheets import SimulatedGoogle, FakeSpreadsheet, FakeClient
+from config import STAGES
+from utils import connections, metrics
+from utils.sheets_client import sheets_client, TokenBucket
+from utils.google_sheets import qschedule
+from utils.roster import roster
+from utils.jobs import job_queue
+from utils.notifications import dispatcher
+from cogs.qualifiers import Qualifiers
+
+REFEREE_ROLE = 1162844846478864544
+DEFAULT_MIX = "lobbies=40,qsched=30,qclaim=10,qdrop=5,qmake=10,tick=5"
+CONDITIONS = ["", "free", "free>=2", "referee=empty", "referee=needed", "sort=free", "team=Team 7"]
+
+
+class FakeRole:
+    def __init__(self, role_id):
+        self.id = role_id
+
+
+class FakeUser:
+    def __init__(self, user_id, roles=()):
+        self.id = user_id
+        self.nick = None
+        self.name = f"user{user_id}"
+        self.roles = [FakeRole(role_id) for role_id in roles]
+        self.mention = f"<@{user_id}>"
+        self.display_name = f"user{user_id}"
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def defer(self, **kwargs):
+        self.done = True
+
+    async def send_message(self, content=None, **kwargs):
+        self.done = True
+        self.interaction.record(content)
+
+    async def edit_message(self, content=None, **kwargs):
+        self.done = True
+        self.interaction.record(content)
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self.interaction.record(content)
+        return FakeMessage()
+
+
+class FakeMessage:
+    id = 1
+
+    async def edit(self, **kwargs):
+        pass
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for the qualifiers commands, remembers whether they answered with ❌."""
+
+    def __init__(self, user):
+        self.user = user
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.failed = False
+
+    def record(self, content):
+        if content and str(content).startswith("❌"):
+            self.failed = True
+
+    async def delete_original_response(self):
+        pass
+
+    async def edit_original_response(self, **kwargs):
+        pass
+
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+
+
+class FakeBot:
+    def __init__(self):
+        self.channel = FakeChannel()
+
+    def get_channel(self, channel_id):
+        return self.channel
+
+    async def wait_until_ready(self):
+        pass
+
+
+def seed_rows(lobbies, teams, now, due_every=100):
+    """Builds a QSchedule grid: lobby X<i> every 15 minutes from two hours out, every due_every-th one due now.
+
+    Like the ref sheet, the grid ends in blank rows that /qmake fills.
+    """
+    rows = [["header"] * 28]
+    due = []
+    for i in range(1, lobbies + 1):
+        if i % due_every == 0:
+            start = now + timedelta(minutes=10)  # Inside the reminder lead
+            due.append(f"X{i}")
+        else:
+            start = now + timedelta(hours=2, minutes=15 * i)
+        row = [""] * 28
+        row[7] = f"X{i}"  # H
+        row[8] = start.strftime("%m/%d/%y")  # I
+        row[9] = start.strftime("%H:%M")  # J
+        row[19] = "0"  # T
+        filled = random.randint(0, 5)
+        for slot in range(filled):
+            team = random.randrange(teams)
+            row[12 + slot] = f"Team {team}"  # M-Q
+            row[23 + slot] = str(1000 + team)  # X-AB captain IDs
+        rows.append(row)
+    rows.extend([""] * 28 for _ in range(max(20, lobbies // 10)))
+    return rows, due
+
+def write_roster(path, teams):
+    with open(path, "w", newline="") as file:
+        for team in range(teams):
+            file.write(f"{1000 + team},Team {team}\n")
+
+def install(google, rows):
+    """Points the bot's connection layer and the QSchedule snapshot at a fresh simulated sheet."""
+    spreadsheet = FakeSpreadsheet(google, STAGES["qualifiers"]["spreadsheet"])
+    spreadsheet.add_worksheet(STAGES["qualifiers"]["worksheet"], rows)
+    connections._client = FakeClient([spreadsheet])
+    connections._spreadsheets.clear()
+    connections._spreadsheet_ids.clear()
+    connections._worksheets.clear()
+    qschedule.rows, qschedule.version = [], 0
+    qschedule.invalidate()
+
+
+async def run_operation(cog, op, lobby_ids, due, teams, now):
+    """Runs one operation, returns whether it answered without an error."""
+    if op == "tick":
+        await cog.check_lobbies(random.sample(due, min(5, len(due))) if due else [])
+        return True
+
+    if op == "lobbies":
+        interaction = FakeInteraction(FakeUser(1))
+        await cog.list_lobbies.callback(cog, interaction, random.choice(CONDITIONS))
+    elif op == "qsched":
+        interaction = FakeInteraction(FakeUser(1000 + random.randrange(teams)))
+        await cog.schedule_qualifiers.callback(cog, interaction, random.choice(lobby_ids))
+    elif op == "qclaim":
+        interaction = FakeInteraction(FakeUser(500 + random.randrange(20), [REFEREE_ROLE]))
+        await cog.claim_lobby.callback(cog, interaction, random.choice(lobby_ids))
+    elif op == "qdrop":
+        interaction = FakeInteraction(FakeUser(500 + random.randrange(20), [REFEREE_ROLE]))
+        await cog.drop_lobby.callback(cog, interaction, random.choice(lobby_ids))
+    elif op == "qmake":
+        interaction = FakeInteraction(FakeUser(1000 + random.randrange(teams)))
+        start = now + timedelta(days=random.randint(1, 60), minutes=random.randrange(0, 24 * 60, 5))
+        await cog.make_qualifiers.callback(cog, interaction, start.strftime("%m/%d/%y"), start.strftime("%H:%M"))
+    else:
+        raise ValueError(f"Unknown operation {op}")
+    return not interaction.failed
+
+
+async def bench_size(args, lobbies, mix, roster_path):
+    random.seed(args.seed)
+    now = datetime.now(pytz.UTC).replace(second=0, microsecond=0)
+    rows, due = seed_rows(lobbies, args.teams, now)
+    google = SimulatedGoogle(args.latency / 1000, jitter=args.jitter, reads_per_minute=args.quota, writes_per_minute=args.quota, error_rate=args.error_rate, seed=args.seed)
+    install(google, rows)
+    window_end = now + timedelta(days=61)
+    STAGES["qualifiers"]["lobby_window"] = (now.strftime("%m/%d/%y %H:%M"), window_end.strftime("%m/%d/%y %H:%M"))
+    metrics.registry = metrics.Registry()
+    for counter in sheets_client.counters:
+        sheets_client.counters[counter] = 0
+
+    bot = FakeBot()
+    cog = Qualifiers(bot)
+    dispatcher.bind(bot)
+    try:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        await loop.run_in_executor(None, qschedule.get)
+        cold_load = time.perf_counter() - started
+
+        lobby_ids = [f"X{i}" for i in range(1, lobbies + 1)]
+        ops = random.choices(list(mix), weights=list(mix.values()), k=args.ops)
+        results = {op: [] for op in mix}  # op -> [(seconds, ok)]
+        queue = asyncio.Queue()
+        for op in ops:
+            queue.put_nowait(op)
+
+        async def worker():
+            while not queue.empty():
+                op = queue.get_nowait()
+                op_started = time.perf_counter()
+                # Ticks measure themselves (tick_* metrics), commands are measured like the bot's command tree does
+                token = metrics.begin("command", op) if op != "tick" else None
+                status = "ok"
+                try:
+                    ok = await run_operation(cog, op, lobby_ids, due, args.teams, now)
+                except Exception as e:
+                    print(f"⚠️ {op} raised {e!r}", file=sys.stderr)
+                    ok, status = False, "error"
+                if token:
+                    metrics.finish(token, status)
+                results[op].append((time.perf_counter() - op_started, ok))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    finally:
+        qschedule.remove_index(cog.reminder_index)
+
+    report(lobbies, results, elapsed, cold_load, google.stats(), sheets_client.stats(), bot.channel.sent)
+
+
+def report(lobbies, results, elapsed, cold_load, google_stats, client_stats, pings):
+    total = sum(len(samples) for samples in results.values())
+    print(f"\n=== {lobbies} lobbies: {total} ops in {elapsed:.2f}s ({total / elapsed:.1f} ops/s), cold load {cold_load * 1000:.0f}ms ===")
+    print(f"{'operation':<10}{'count':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'reads':>8}{'writes':>8}")
+    reads = {labels["command"]: histogram for labels, histogram in metrics.registry.histogram_items("command_sheets_reads")}
+    writes = {labels["command"]: histogram for labels, histogram in metrics.registry.histogram_items("command_sheets_writes")}
+    reads.update({"tick": histogram for _, histogram in metrics.registry.histogram_items("tick_sheets_reads")})
+    writes.update({"tick": histogram for _, histogram in metrics.registry.histogram_items("tick_sheets_writes")})
+    for op, samples in results.items():
+        if not samples:
+            continue
+        latencies = sorted(seconds for seconds, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        per_call = lambda histograms: histograms[op].sum / histograms[op].count if op in histograms and histograms[op].count else 0
+        print(f"{op:<10}{len(samples):>7}{errors:>8}{percentile(latencies, 50) * 1000:>9.1f}{percentile(latencies, 95) * 1000:>9.1f}"
+              f"{percentile(latencies, 99) * 1000:>9.1f}{latencies[-1] * 1000:>9.1f}{per_call(reads):>8.2f}{per_call(writes):>8.2f}")
+    calls = ", ".join(f"{method} {count}" for method, count in sorted(google_stats["calls"].items()))
+    print(f"API calls: {calls} | {google_stats['bytes'] / 1024:.0f} KiB | 429s {google_stats['rejected']}")
+    print(f"Client: throttled {client_stats['throttled']}, retried {client_stats['retried']}, coalesced {client_stats['coalesced']}, failed {client_stats['failed']} | pings sent {pings}")
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        op, weight = part.split("=")
+        mix[op.strip()] = float(weight)
+    return mix
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lobbies", default="50,500,5000", help="Comma separated QSchedule sizes to benchmark")
+    parser.add_argument("--ops", type=int, default=500, help="Operations per size")
+    parser.add_argument("--concurrency", type=int, default=16, help="Simultaneous commands")
+    parser.add_argument("--teams", type=int, default=200)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Operation weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--latency", type=float, default=80, help="Base latency of a Sheets request in ms")
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--quota", type=int, default=300, help="Simulated Sheets reads and writes per minute")
+    parser.add_argument("--client-quota", type=int, default=None, help="Override the bot's own per-minute throttle")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a spontaneous 429")
+    parser.add_argument("--retry-delay", type=float, default=0.05, help="Backoff base of the bot's Sheets client in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the bench away from the bot's real roster, job database and quotas
+        roster_path = os.path.join(tmp, "teams.csv")
+        write_roster(roster_path, args.teams)
+        roster.file_path = roster_path
+        job_queue.path = os.path.join(tmp, "jobs.db")
+        dispatcher.merge_seconds = 0.05
+        sheets_client.base_delay = args.retry_delay
+        if args.client_quota:
+            sheets_client.buckets = {"read": TokenBucket(args.client_quota), "write": TokenBucket(args.client_quota)}
+
+        for lobbies in (int(size) for size in args.lobbies.split(",")):
+            await bench_size(args, lobbies, parse_mix(args.mix), roster_path)
+        dispatcher.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+from utils.assignment import plan_assignments, commit_plan
+from utils.sheet_executor import run_sheet
+from utils.lobby_locks import lock_lobbies
+
+ADMIN_ROLE = 1160286790498930759
+
+
+class AssignmentPreview(discord.ui.View):
+    """Commit/Discard buttons under an assignment preview, only the admin who asked for it can press them."""
+
+    def __init__(self, plan, admin_id):
+        super().__init__(timeout=600)
+        self.plan = plan
+        self.admin_id = admin_id
+        self.message = None
+
+    def close(self):
+        for item in self.children:
+            item.disabled = True
+        self.stop()
+
+    async def on_timeout(self):
+        self.close()
+        if self.message:
+            await self.message.edit(content="⌛ Assignment preview expired, nothing was written.", view=self)
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user.id != self.admin_id:
+            await interaction.response.send_message("❌ Only the admin who ran the preview can use these buttons.", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="Commit", style=discord.ButtonStyle.success)
+    async def commit(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.close()
+        await interaction.response.edit_message(content="⏳ Writing assignments...", view=self)
+
+        # Same locks as /qclaim and /matches_claim so no claim lands between the precondition check and the write
+        async with lock_lobbies(*(slot.lock_key for slot, _ in self.plan.assignments)):
+            written, errors = await run_sheet(commit_plan, self.plan)
+
+        content = f"✅ Assigned {written} of {len(self.plan.assignments)} referees."
+        if errors:
+            content += "\n" + "\n".join(f"❌ {error}" for error in errors)
+        await interaction.edit_original_response(content=content, view=self)
+
+    @discord.ui.button(label="Discard", style=discord.ButtonStyle.danger)
+    async def discard(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.close()
+        await interaction.response.edit_message(content="🗑️ Assignment preview discarded, nothing was written.", view=self)
+
+
+class Assignments(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @app_commands.command(name="assign_referees", description="Preview an automatic referee assignment for every uncovered lobby and match.")
+    @commands.cooldown(1, 1.0, commands.BucketType.default)  # Limit command activation to 1 time per second globally
+    async def assign_referees(self, interaction: discord.Interaction):
+        """Admin command solving the referee assignment and showing it with Commit/Discard buttons."""
+        if not any(role.id == ADMIN_ROLE for role in interaction.user.roles):
+            await interaction.response.send_message("❌ You don't have permission to use this command.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        plan = await run_sheet(plan_assignments)
+
+        if not plan.assignments and not plan.uncovered:
+            await interaction.followup.send("✅ Every upcoming lobby and match already has a referee.", ephemeral=True)
+            return
+
+        embed = discord.Embed(title="Referee Assignment Preview", color=0x1ABC9C)
+        embed.description = f"Covers **{len(plan.assignments)}** of {len(plan.assignments) + len(plan.uncovered)} open slots ({plan.coverage:.0%})"
+        lines = [f"• {slot.record_id} <t:{slot.start}:f> → <@{referee_id}>" for slot, referee_id in plan.assignments]
+        embed.add_field(name="📝 Assignments", value=_truncate(lines) or "none", inline=False)
+        loads = [f"<@{referee_id}>: +{count}" + (f" ({len(plan.busy[referee_id])} already claimed)" if referee_id in plan.busy else "") for referee_id, count in sorted(plan.loads.items(), key=lambda item: -item[1])]
+        embed.add_field(name="⚖️ Load", value=_truncate(loads) or "none", inline=False)
+        if plan.uncovered:
+            embed.add_field(name="⚠️ Still uncovered", value=_truncate([f"• {slot.record_id} <t:{slot.start}:f>" for slot in plan.uncovered]), inline=False)
+        embed.set_footer(text="Nothing is written until you press Commit")
+
+        view = AssignmentPreview(plan, interaction.user.id)
+        if not plan.assignments:
+            view.commit.disabled = True
+        view.message = await interaction.followup.send(embed=embed, view=view, ephemeral=True, wait=True)
+
+
+def _truncate(lines, limit=1000):
+    """Joins lines up to an embed field's size, noting how many were left out."""
+    text = ""
+    for i, line in enumerate(lines):
+        if len(text) + len(line) + 40 > limit:
+            return text + f"… and {len(lines) - i} more"
+        text += line + "\n"
+    return text
+
+
+async def setup(bot):
+    await bot.add_cog(Assignments(bot))
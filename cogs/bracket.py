@@ -1,13 +1,191 @@
+import asyncio
+import logging
 import discord
 from discord import app_commands, Embed
 from discord.ext import commands
-# from utils.google_sheets import
+from utils.bracket_sheets import bschedule, get_match, match_table, match_ids, reschedule_match, format_conflicts, claim_match, drop_match, find_matches, get_claimed_matches, mark_pinged, COLUMNS, STAFF_COLUMNS
+from utils.notifications import Notification, dispatcher
+from utils import metrics
+from utils.logs import log_event
+from utils.lobby_query import LobbyQuery, QueryError, parse_conditions, upcoming, match_has_teams
+from utils.autocomplete import choices, start_label
+from utils.sheet_executor import run_sheet, run_lookup
+from utils.lobby_locks import lock_lobbies
+from utils.members import member_directory
+from utils.reschedule import ProposalStore, RescheduleProposal
+from utils.jobs import job_queue, job_runner
+from utils.reminders import ReminderScheduler, ReminderIndex
+from utils.change_feed import ChangeFeed
+from config import RESCHEDULE_EXPIRY_HOURS, REMINDER_LEAD_MINUTES, CHANGE_POLL_SECONDS, STAGES
 from datetime import datetime
 import pytz
+from utils.roster import roster
+
+class RescheduleView(discord.ui.View):
+    """Accept/Decline buttons for the opposing captain of a reschedule proposal."""
+
+    def __init__(self, cog, proposal):
+        # Persistent view: expiry is a job in the job queue, so the buttons keep working across restarts
+        super().__init__(timeout=None)
+        self.cog = cog
+        self.proposal = proposal
+        self.message = None
+        self.accept.custom_id = f"reschedule:accept:{proposal.proposal_id}"
+        self.decline.custom_id = f"reschedule:decline:{proposal.proposal_id}"
+
+    def close(self):
+        for item in self.children:
+            item.disabled = True
+        self.cog.views.pop(self.proposal.proposal_id, None)
+        self.stop()
+
+    @discord.ui.button(label="Accept", style=discord.ButtonStyle.success)
+    async def accept(self, interaction: discord.Interaction, button: discord.ui.Button):
+        proposal = self.proposal
+        if not roster.is_captain(interaction.user.id, proposal.opponent):
+            await interaction.response.send_message(f"❌ Only the captain of {proposal.opponent} can accept this reschedule.", ephemeral=True)
+            return
+        if await self.cog.proposals.get(proposal.proposal_id) is not proposal:
+            self.close()
+            await interaction.response.edit_message(content="❌ This reschedule request is no longer pending.", view=self)
+            return
+
+        await interaction.response.defer()
+        async with lock_lobbies(f"bracket:{proposal.match_id}"):
+            success, error_msg = await run_sheet(reschedule_match, proposal.match_id, proposal.new_start, proposal.old_start)
+        await self.cog.proposals.pop(proposal.proposal_id)
+        self.close()
+
+        if success:
+            embed = Embed(
+                title=f"✅ Match {proposal.match_id} Rescheduled",
+                description=f"{proposal.team} vs {proposal.opponent} now starts <t:{proposal.new_start}:F>.",
+                color=discord.Color.green()
+            )
+            await interaction.edit_original_response(content=None, embed=embed, view=self)
+        else:
+            await interaction.edit_original_response(content=f"❌ Reschedule failed: {error_msg}", view=self)
+
+    @discord.ui.button(label="Decline", style=discord.ButtonStyle.danger)
+    async def decline(self, interaction: discord.Interaction, button: discord.ui.Button):
+        proposal = self.proposal
+        # The opposing captain declines, the proposing captain can withdraw
+        if not (roster.is_captain(interaction.user.id, proposal.opponent) or roster.is_captain(interaction.user.id, proposal.team)):
+            await interaction.response.send_message("❌ Only the captains of this match can decline the reschedule.", ephemeral=True)
+            return
+        await self.cog.proposals.pop(proposal.proposal_id)
+        self.close()
+        await interaction.response.edit_message(content=f"❌ Reschedule of match {proposal.match_id} was declined by {interaction.user.mention}.", embed=None, view=self)
 
 class Bracket(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.proposals = ProposalStore(RESCHEDULE_EXPIRY_HOURS * 3600, job_queue)  # Pending reschedules, persisted as jobs
+        self.views = {}  # proposal_id -> RescheduleView
+        # Match reminders, kept current by every BSchedule refresh, reschedule and result entered
+        self.reminders = ReminderScheduler(self.check_matches, REMINDER_LEAD_MINUTES * 60)
+        self.reminder_index = bschedule.add_index(ReminderIndex(self.reminders, id_col=COLUMNS["match_id"], date_col=COLUMNS["date"], time_col=COLUMNS["time"], pinged_col=COLUMNS["pinged"]))
+        self.change_feed = ChangeFeed(bschedule, CHANGE_POLL_SECONDS)
+        dispatcher.register("bracket", mark_pinged)
+
+    async def cog_load(self):
+        self._reminders_task = asyncio.create_task(self.start_reminders())
+
+    async def cog_unload(self):
+        self._reminders_task.cancel()
+        self.reminders.stop()
+        self.change_feed.stop()
+        dispatcher.unregister("bracket")
+        job_runner.unregister("reschedule")
+        bschedule.remove_index(self.reminder_index)
+
+    async def start_reminders(self):
+        # Wait until the bot is fully ready, then start watching the sheet
+        await self.bot.wait_until_ready()
+        self.reminders.start()
+        self.change_feed.start()  # The first poll loads the snapshot and seeds the heap
+
+        # Reattach the buttons of proposals that were pending when the bot stopped, the runner expires the rest
+        for proposal in await run_sheet(self.proposals.load):
+            if proposal.message_id:
+                view = self.views[proposal.proposal_id] = RescheduleView(self, proposal)
+                self.bot.add_view(view, message_id=proposal.message_id)
+        job_runner.register("reschedule", self.expire_proposals)
+
+    async def expire_proposals(self, jobs):
+        """Job handler: closes the proposals whose reschedule jobs became due."""
+        for job in jobs:
+            proposal_id = job.payload["proposal_id"]
+            await self.proposals.pop(proposal_id)
+            view = self.views.pop(proposal_id, None) or RescheduleView(self, RescheduleProposal(**job.payload))
+            view.close()
+            try:
+                if job.payload.get("message_id"):
+                    channel = self.bot.get_channel(job.payload["channel_id"]) or await self.bot.fetch_channel(job.payload["channel_id"])
+                    await channel.get_partial_message(job.payload["message_id"]).edit(content=f"⌛ Reschedule request for match {job.payload['match_id']} expired.", view=view)
+            except discord.HTTPException as e:
+                log_event("reschedule_expiry_edit_failed", logging.WARNING, proposal_id=proposal_id, error=str(e))
+        await run_sheet(job_queue.complete, [job.key for job in jobs])
+
+    async def check_matches(self, match_ids):
+        """Queues a ping for both teams and the assigned staff of every match whose reminder just became due."""
+        with metrics.measure("tick", "bracket"):
+            log_event("reminder_tick", stage="bracket", match_ids=match_ids)
+            await run_sheet(bschedule.get, force=True)
+            now = datetime.now(pytz.UTC).timestamp()
+            notifications = []
+
+            for match_id in match_ids:
+                try:
+                    match = match_table.get(match_id)
+                    # Skip matches that already started, were moved later, have a result or were pinged by hand
+                    if not match or match.start is None or match.start < now or match.start - now > REMINDER_LEAD_MINUTES * 60 or match.finished or match.pinged:
+                        continue
+
+                    team_mentions = " ".join(f"<@{member_id}>" for team in match.teams for member_id in member_directory.present(roster.get_members(team)))
+                    staff_mentions = ", ".join(f"{role}: <@{staff_id}>" for role, staff_id in match.staff.items() if staff_id)
+                    if not team_mentions:
+                        continue
+
+                    message = f"{team_mentions} Your match **{match.match_id}** ({' vs '.join(match.teams)}) starts {match.discord_timestamp}. Staff: {staff_mentions or 'none assigned yet'}"
+                    notifications.append(Notification(f"bracket:{match.match_id}:{match.start}", "bracket", STAGES["bracket"]["ping_channel"], match.row, match.match_id, message))
+
+                except Exception as e:
+                    log_event("match_check_failed", logging.WARNING, match_id=match_id, error=str(e))
+
+            await dispatcher.submit(notifications)
+
+    @app_commands.command(name="matches", description="Shows the upcoming matches of your team.")
+    @commands.cooldown(1, 1.0, commands.BucketType.default)  # Limit command activation to 1 time per second globally
+    async def matches(self, interaction: discord.Interaction):
+        """Slash command listing the caller's team's upcoming matches from the match index."""
+        team = roster.get_member_team(interaction.user.id)
+        if not team:
+            await interaction.response.send_message("❌ You are not on any team's roster. For urgent matters please reach out to an admin", ephemeral=True)
+            return
+
+        if not bschedule.is_fresh():
+            await interaction.response.defer(ephemeral=True)
+            await run_sheet(bschedule.get)
+        upcoming = match_table.upcoming_for_team(team, datetime.now(pytz.UTC).timestamp(), limit=10)
+
+        if not upcoming:
+            message = f"❌ {team} has no upcoming matches."
+            if interaction.response.is_done():
+                await interaction.followup.send(message, ephemeral=True)
+            else:
+                await interaction.response.send_message(message, ephemeral=True)
+            return
+
+        embed = discord.Embed(title=f"Upcoming Matches of {team}", color=0x1ABC9C)
+        embed.description = "Times are in **your local timezone**"
+        for match in upcoming:
+            embed.add_field(name=f"• {match.match_id}: vs {match.opponent(team) or 'TBD'}", value=match.discord_timestamp, inline=False)
+
+        if interaction.response.is_done():
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        else:
+            await interaction.response.send_message(embed=embed, ephemeral=True)
 
     @app_commands.command(name="brules", description="Displays the bracket stage rules")
     @commands.cooldown(1, 1.0, commands.BucketType.default)  # Limit command activation to 1 time per second globally
@@ -32,9 +210,153 @@ class Bracket(commands.Cog):
         if not any(role.id == 1344467503245557770 for role in interaction.user.roles):
             await interaction.response.send_message("❌ Only captains can reschedule matches. For urgent matters please reach out to an admin", ephemeral=True)
             return
+
+        team = roster.get_team(interaction.user.id)
+        if not team:
+            await interaction.response.send_message("❌ Only captains can reschedule matches. For urgent matters please reach out to an admin", ephemeral=True)
+            return
         
         await interaction.response.defer()
 
-    
+        try:
+            new_start = int(datetime.strptime(f"{date} {time}", "%m/%d/%y %H:%M").replace(tzinfo=pytz.UTC).timestamp())
+        except ValueError:
+            await interaction.delete_original_response()
+            await interaction.followup.send("❌ Invalid date or date format. Please use mm/dd/yy HH:MM.", ephemeral=True)
+            return
+
+        match = await run_lookup(bschedule, get_match, match_id)
+        error_msg = None
+        if not match:
+            error_msg = "**Match not found.**"
+        elif not match.opponent(team):
+            error_msg = "**Only the captains of the teams playing this match can reschedule it.**"
+        elif match.start is None:
+            error_msg = "**Invalid date or time format in the sheet.**"
+        elif new_start <= datetime.now(pytz.UTC).timestamp():
+            error_msg = "**The new time must be in the future.**"
+        elif new_start == match.start:
+            error_msg = "**The match already starts at that time.**"
+        else:
+            # Check early so captains don't agree on a time that can't be applied
+            conflicts = await run_sheet(match_table.find_conflicts, match, new_start)
+            if conflicts:
+                error_msg = f"**The new time overlaps other matches:**\n{format_conflicts(conflicts)}"
+
+        if error_msg:
+            await interaction.delete_original_response()
+            await interaction.followup.send(f"❌ Reschedule failed: {error_msg} For urgent matters, please reach out to an admin.", ephemeral=True)
+            return
+
+        opponent = match.opponent(team)
+        proposal = await self.proposals.create(match.match_id, team, opponent, interaction.user.id, match.start, new_start)
+        view = RescheduleView(self, proposal)
+
+        captain_mentions = " ".join(f"<@{captain_id}>" for captain_id in roster.get_captains(opponent)) or opponent
+        embed = Embed(
+            title=f"🕒 Reschedule Request for Match {match.match_id}",
+            description=f"{team} wants to move their match against {opponent}\nfrom {match.discord_timestamp}\nto <t:{new_start}:F>.",
+            color=0x1ABC9C
+        )
+        embed.set_footer(text=f"The captain of {opponent} can accept or decline within {RESCHEDULE_EXPIRY_HOURS}h")
+        view.message = await interaction.followup.send(content=captain_mentions, embed=embed, view=view, allowed_mentions=discord.AllowedMentions(users=True), wait=True)
+        self.views[proposal.proposal_id] = view
+        await self.proposals.attach(proposal, view.message.channel.id, view.message.id)
+
+    @schedule_qualifiers.autocomplete("match_id")
+    async def own_match_choices(self, interaction: discord.Interaction, current: str):
+        """Suggests the caller's team's upcoming matches."""
+        team = roster.get_team(interaction.user.id)
+        if not team:
+            return []
+        rows = {match.row for match in match_table.upcoming_for_team(team, datetime.now(pytz.UTC).timestamp())}
+        matches = [match_table.by_row[row] for row in match_ids.rows(current, rows.__contains__)]
+        return choices(matches, lambda match: f"vs {match.opponent(team) or 'TBD'} · {start_label(match)}")
+
+    def is_staff(self, member, role):
+        """Checks the member has the Discord role allowed to take this staff role."""
+        role_id = STAGES["bracket"]["staff_roles"].get(role)
+        if role_id is None:
+            return False  # Nobody can take a staff role whose Discord role isn't configured yet
+        return any(member_role.id == role_id for member_role in getattr(member, "roles", []))
+
+    @app_commands.command(name="matches_claim", description="Claim a staff role in a bracket match.")
+    @commands.cooldown(1, 1.0, commands.BucketType.default)  # Limit command activation to 1 time per second globally
+    @app_commands.choices(role=[app_commands.Choice(name=role, value=role) for role in STAFF_COLUMNS])
+    async def matches_claim(self, interaction: discord.Interaction, role: str, match_id: str):
+        """Slash command for claiming a match as referee, streamer or caster."""
+        if not self.is_staff(interaction.user, role):
+            await interaction.response.send_message(f"❌ You don't have the {role} role.", ephemeral=True)
+            return
+
+        await interaction.response.defer()
+
+        async with lock_lobbies(f"bracket:{match_id.strip()}"):
+            success, error_msg = await run_sheet(claim_match, match_id, role, interaction.user.id)
+
+        if success:
+            await interaction.followup.send(f"✅ Successfully claimed {role} of match {match_id}.")
+        else:
+            await interaction.delete_original_response()
+            await interaction.followup.send(f"❌ Claim failed: {error_msg}", ephemeral=True)
+
+    @app_commands.command(name="matches_drop", description="Drop a staff role you claimed in a bracket match.")
+    @commands.cooldown(1, 1.0, commands.BucketType.default)  # Limit command activation to 1 time per second globally
+    @app_commands.choices(role=[app_commands.Choice(name=role, value=role) for role in STAFF_COLUMNS])
+    async def matches_drop(self, interaction: discord.Interaction, role: str, match_id: str):
+        """Slash command for dropping a claimed match."""
+        if not self.is_staff(interaction.user, role):
+            await interaction.response.send_message(f"❌ You don't have the {role} role.", ephemeral=True)
+            return
+
+        await interaction.response.defer()
+
+        async with lock_lobbies(f"bracket:{match_id.strip()}"):
+            success, error_msg = await run_sheet(drop_match, match_id, role, interaction.user.id)
+
+        if success:
+            await interaction.followup.send(f"✅ Successfully dropped {role} of match {match_id}.")
+        else:
+            await interaction.delete_original_response()
+            await interaction.followup.send(f"❌ Drop failed: {error_msg}", ephemeral=True)
+
+    @app_commands.command(name="matches_find", description="Find bracket matches, e.g. 'caster=empty' or 'referee=needed after=4/20/25'.")
+    @commands.cooldown(1, 1.0, commands.BucketType.default)  # Limit command activation to 1 time per second globally
+    @app_commands.describe(condition="Space separated: <role>=empty, team=<name>, after=/before=<m/d/yy>, sort=start|id, order=asc|desc, mine")
+    async def matches_find(self, interaction: discord.Interaction, condition: str = None):
+        """Slash command listing upcoming matches that match the conditions, or the caller's claims with 'mine'."""
+        tokens = (condition or "").split()
+        mine = "mine" in tokens
+        try:
+            query = parse_conditions(" ".join(token for token in tokens if token != "mine"), STAFF_COLUMNS, LobbyQuery().where(upcoming()), slots=False, teams_signed_up=match_has_teams())
+        except QueryError as e:
+            await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        if mine:
+            claims = await run_lookup(bschedule, get_claimed_matches, interaction.user.id)
+            matches = [match for match in query.run([match for _, match in claims])]
+            roles = {match.row: role for role, match in claims}
+        else:
+            matches = await run_lookup(bschedule, find_matches, query)
+            roles = {}
+
+        if not matches:
+            await interaction.followup.send("❌ No matches found.", ephemeral=True)
+            return
+
+        embed = discord.Embed(title=f"Matches ({query}{', mine' if mine else ''})", color=0x1ABC9C)
+        embed.description = "Times are in **your local timezone**"
+        for match in matches[:15]:
+            staff = ", ".join(f"{role}: {f'<@{staff_id}>' if staff_id else 'empty'}" for role, staff_id in match.staff.items())
+            name = f"• {match.match_id}: {' vs '.join(match.teams) or 'TBD'}" + (f" (you: {roles[match.row]})" if match.row in roles else "")
+            embed.add_field(name=name, value=f"{match.discord_timestamp}\n{staff}", inline=False)
+        if len(matches) > 15:
+            embed.set_footer(text=f"Showing 15 of {len(matches)} matches, narrow the conditions to see the rest")
+
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+
 async def setup(bot):
-    await bot.add_cog(Bracket(bot))
\ No newline at end of file
+    await bot.add_cog(Bracket(bot))
@@ -0,0 +1,45 @@
+import discord
+from discord.ext import commands
+from utils.members import member_directory
+
+
+class Members(commands.Cog):
+    """Keeps the member directory current, the guild is only chunked once per run."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if member_directory.loaded:  # on_ready fires again after every reconnect, the events kept the directory current
+            return
+        members = []
+        for guild in self.bot.guilds:
+            if not guild.chunked:
+                await guild.chunk()
+            members.extend(guild.members)
+        member_directory.load(members)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        member_directory.upsert(member)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        member_directory.upsert(after)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before: discord.User, after: discord.User):
+        # Username changes arrive as user updates, re-read the member to pick them up
+        for guild in self.bot.guilds:
+            member = guild.get_member(after.id)
+            if member:
+                member_directory.upsert(member)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        member_directory.remove(member.id)
+
+
+async def setup(bot):
+    await bot.add_cog(Members(bot))
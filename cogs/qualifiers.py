@@ -1,38 +1,90 @@
+import asyncio
+import logging
 import discord
 from discord import app_commands, Embed
-from discord.ext import commands, tasks
-from utils.google_sheets import get_worksheet, update_sheet, create_lobby, get_lobbies, claim_referee, drop_referee, get_claimed_lobbies, fetch_pings
+from discord.ext import commands
+from utils.google_sheets import qschedule, qschedule_index, lobby_table, lobby_ids, staff_index, get_team_lobby, update_sheet, create_lobby, find_lobbies, claim_referee, drop_referee, get_claimed_lobbies, fetch_pings, mark_pinged
+from utils.notifications import Notification, dispatcher
+from utils import metrics
+from utils.logs import log_event
+from utils.sheet_executor import run_sheet, run_lookup
+from utils.lobby_locks import lock_lobbies
+from utils.roster import roster
+from utils.members import member_directory
+from utils.reminders import ReminderScheduler, ReminderIndex
+from utils.change_feed import ChangeFeed
+from utils.storage import MirroredBackend
+from utils.lobby_query import parse_conditions, QueryError
+from utils.autocomplete import choices, start_label
+from config import REMINDER_LEAD_MINUTES, CHANGE_POLL_SECONDS, MIRROR_SYNC_SECONDS, STAGES
 from datetime import datetime
 import pytz
-import io
 import os
-import csv
-
-def get_team_from_csv(user_id):
-    """Reads the CSV file and returns the team associated with the user_id."""
-    try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))  # Absolute path of the script
-        parent_dir = os.path.dirname(current_dir)  # Go up one directory
-        file_path = os.path.join(parent_dir, 'MBB7teams.csv')  # Path to the CSV file
-
-        with open(file_path, mode='r') as file:
-            # Manually specify the column names since there are no headers
-            reader = csv.DictReader(file, fieldnames=['id', 'team'])
-
-            for row in reader:
-                print(f"Row data: {row}")  # Print each row to inspect the data
-                if str(row['id']) == str(user_id):  # Ensure both IDs are treated as strings
-                    return row['team']  # Return the corresponding team name
-
-        return None  # Return None if the user ID is not found
-    except Exception as e:
-        print(f"⚠️ Error reading CSV file: {e}")
-        return None
-    
+
+class LobbyPages(discord.ui.View):
+    """Previous/Next buttons over the results of a LobbyQuery."""
+
+    def __init__(self, query, user_id, page_size=8):
+        super().__init__(timeout=300)
+        self.query = query
+        self.user_id = user_id
+        self.page_size = page_size
+        self.cursors = [None]  # Cursor of every page visited so far, the last one is shown
+        self.next_cursor = None
+
+    def render(self):
+        lobbies, self.next_cursor, total = self.query.page(lobby_table.lobbies(), self.cursors[-1], self.page_size)
+
+        embed = discord.Embed(title=f"Upcoming Lobbies ({str(self.query).capitalize()})", color=0x1ABC9C)
+        embed.description = "Times are in **your local timezone**"
+        for lobby in lobbies:
+            embed.add_field(name=f"• {lobby.lobby_id}", value=f"{lobby.discord_timestamp}", inline=False)
+        embed.set_footer(text=f"Page {len(self.cursors)} • {total} lobbies match this condition")
+
+        self.previous_page.disabled = len(self.cursors) == 1
+        self.next_page.disabled = self.next_cursor is None
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user.id != self.user_id:
+            await interaction.response.send_message("❌ Run /lobbies yourself to browse the list.", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if len(self.cursors) > 1:
+            self.cursors.pop()
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.next_cursor is not None:
+            self.cursors.append(self.next_cursor)
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
 class Qualifiers(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.check_lobbies.start()
+        # Reminders fire REMINDER_LEAD_MINUTES before each lobby, the heap is kept current by every snapshot refresh and write
+        self.reminders = ReminderScheduler(self.check_lobbies, REMINDER_LEAD_MINUTES * 60)
+        self.reminder_index = qschedule.add_index(ReminderIndex(self.reminders, id_col=8, date_col=9, time_col=10, pinged_col=20, rearm_cols=range(13, 18)))
+        # Manual edits to the ref sheet reach the snapshot (and through it the reminders) as row diffs
+        self.change_feed = ChangeFeed(qschedule, CHANGE_POLL_SECONDS)
+        dispatcher.register("qualifiers", mark_pinged)
+
+    async def cog_load(self):
+        self._mirror_task = None
+        self._reminders_task = asyncio.create_task(self.start_reminders())
+
+    async def cog_unload(self):
+        self._reminders_task.cancel()
+        if self._mirror_task:
+            self._mirror_task.cancel()
+        self.reminders.stop()
+        self.change_feed.stop()
+        dispatcher.unregister("qualifiers")
+        qschedule.remove_index(self.reminder_index)
 
     @app_commands.command(name="qrules", description="Displays the qualifiers rules")
     @commands.cooldown(1, 1.0, commands.BucketType.default)  # Limit command activation to 1 time per second globally
@@ -49,8 +101,8 @@ class Qualifiers(commands.Cog):
     async def schedule_qualifiers(self, interaction: discord.Interaction, lobby_id: str):
         """Slash command for scheduling a qualifiers lobby using the user's team from a CSV file."""
 
-        # Get the user's team based on their user ID from the CSV file
-        team = get_team_from_csv(interaction.user.id)
+        # Get the user's team based on their user ID from the roster
+        team = roster.get_team(interaction.user.id)
 
         if not team:
             await interaction.response.send_message("❌ Only captains can schedule qualifier lobbies. For urgent matters please reach out to an admin.", ephemeral=True)
@@ -58,7 +110,14 @@ class Qualifiers(commands.Cog):
 
         await interaction.response.defer()
 
-        success, error_msg = update_sheet(team, lobby_id)
+        # Hold the new and the old lobby so signups are serialized per lobby but run in parallel across lobbies
+        while True:
+            old_lobby_id = await run_lookup(qschedule, get_team_lobby, team)
+            async with lock_lobbies(lobby_id, old_lobby_id):
+                if old_lobby_id != await run_lookup(qschedule, get_team_lobby, team):
+                    continue  # The team moved while we were waiting, lock the right lobbies
+                success, error_msg = await run_sheet(update_sheet, team, lobby_id)
+                break
 
         if success:
             # Create an embedded success message
@@ -73,6 +132,13 @@ class Qualifiers(commands.Cog):
             await interaction.delete_original_response()  # Delete the deferred response
             await interaction.followup.send(f"❌ Scheduling failed: {error_msg} For urgent matters, please reach out to an admin.", ephemeral=True)
 
+    @schedule_qualifiers.autocomplete("lobby_id")
+    async def open_lobby_choices(self, interaction: discord.Interaction, current: str):
+        """Suggests upcoming lobbies that still have a free slot."""
+        now = datetime.now(pytz.UTC).timestamp()
+        lobbies = [lobby_table.get(row) for row in lobby_ids.rows(current, lambda row: _upcoming(row, now) and lobby_table.get(row).free_slots)]
+        return choices(lobbies, lambda lobby: f"{start_label(lobby)} · {lobby.free_slots} free")
+
     @app_commands.command(name="qmake", description="Create custom qualifiers lobby.")
     @app_commands.describe(
         date="m/d/yy",
@@ -88,14 +154,14 @@ class Qualifiers(commands.Cog):
         # Check if the user has any of the roles or is in the CSV file
         if not any(role.id in role_ids for role in interaction.user.roles):
             # Check if the user is in the CSV by trying to get their team
-            team = get_team_from_csv(interaction.user.id)
+            team = roster.get_team(interaction.user.id)
             if not team:  # If no team is returned, the user is not in the CSV file
                 await interaction.response.send_message("❌ Only captains, admins, referees, or users listed in the CSV can create qualifier lobbies. For urgent matters please reach out to an admin", ephemeral=True)
                 return
 
         await interaction.response.defer()
 
-        new_lobby_id, error_msg = create_lobby(date, time)
+        new_lobby_id, error_msg = await run_sheet(create_lobby, date, time)
 
         if new_lobby_id:
             # Convert the input date and time to a datetime object
@@ -114,9 +180,6 @@ class Qualifiers(commands.Cog):
             timestamp = int(utc_time.timestamp())
             discord_timestamp = f"<t:{timestamp}:F>"  # Discord format for full date-time
 
-            # Log the time for the console (use the same UTC time)
-            print(f"✅ Created new lobby {new_lobby_id} on {utc_time.strftime('%m/%d/%y')} at {utc_time.strftime('%H:%M')}. Timestamp for Discord: {discord_timestamp}")
-
             # Create an embedded success message
             embed = Embed(
                 title=f"✅ New Lobby {new_lobby_id} Created",
@@ -130,39 +193,29 @@ class Qualifiers(commands.Cog):
             await interaction.followup.send(f"❌ Lobby creation failed: {error_msg} For urgent matters, please reach out to an admin.", ephemeral=True)
 
     @app_commands.command(name="lobbies", description="List upcoming qualifiers lobbies based on conditions.")
-    @app_commands.describe(condition="referee=empty for lobbies without a referee | referee=needed for lobbies with at least 1 team without referee | free for lobbies with free team slot")
+    @app_commands.describe(condition="Combine: referee=empty | referee=needed | free | free>=N | team=Name | after=m/d/yy | before=m/d/yy | sort=start|free|id | order=asc|desc")
     @commands.cooldown(1, 1.0, commands.BucketType.default)
-    async def list_lobbies(self, interaction: discord.Interaction, condition: str):
-        """Lists upcoming qualifiers lobbies based on user input ('empty' or 'free')."""
+    async def list_lobbies(self, interaction: discord.Interaction, condition: str = ""):
+        """Lists upcoming qualifiers lobbies matching the conditions, with buttons to page through the results."""
         await interaction.response.defer()
 
         # Validate the condition input
-        if condition not in ["referee=empty","referee=needed", "free"]:
+        try:
+            query = parse_conditions(condition, STAGES["qualifiers"]["staff"])
+        except QueryError as e:
             await interaction.delete_original_response()  # Delete the deferred response
-            await interaction.followup.send("❌ Invalid condition. Please use 'referee=empty' for no referee or 'free' for at least one empty team slot.", ephemeral=True)
+            await interaction.followup.send(f"❌ Invalid condition. {e}", ephemeral=True)
             return
 
-        lobbies = get_lobbies(condition)
+        lobbies = await run_lookup(qschedule, find_lobbies, query)
 
         if not lobbies:
-            await interaction.followup.send(f"❌ No upcoming lobbies found where the condition '{condition}' is met.")
+            await interaction.followup.send(f"❌ No upcoming lobbies found where the condition '{query}' is met.")
             return
 
-        max_display = 8
-        displayed_lobbies = lobbies[:max_display]
-        extra_count = len(lobbies) - max_display
-
-        embed = discord.Embed(title=f"Upcoming Lobbies ({condition.capitalize()})", color=0x1ABC9C)
-        embed.description = "Times are in **your local timezone**"
-
-        for lobby_id, timestamp in displayed_lobbies:
-            print(f"Lobby found: {lobby_id}")  # Logging for debugging
-            embed.add_field(name=f"• {lobby_id}", value=f"{timestamp}", inline=False)
-
-        if extra_count > 0:
-            embed.set_footer(text=f"+ {extra_count} more lobbies match this condition")
-
-        await interaction.followup.send(embed=embed)
+        # Every page after the first is served from the cached lobbies, clicking never touches the sheet
+        view = LobbyPages(query, interaction.user.id)
+        await interaction.followup.send(embed=view.render(), view=view)
 
     @app_commands.command(name="qclaim", description="Claim a qualifiers lobby as a referee.")
     @commands.has_role(1162844846478864544)
@@ -173,11 +226,12 @@ class Qualifiers(commands.Cog):
         if not any(role.id == 1162844846478864544 for role in interaction.user.roles):
             await interaction.response.send_message("❌ Only referees can claim qualifier lobbies", ephemeral=True)
             return
-        await interaction.defer()
+        await interaction.response.defer()
         discord_nickname = interaction.user.nick or interaction.user.name  # Use nickname if set, otherwise fallback to username
         discord_id = interaction.user.id
 
-        success, error_msg = claim_referee(lobby_id, discord_id)
+        async with lock_lobbies(lobby_id):
+            success, error_msg = await run_sheet(claim_referee, lobby_id, discord_id)
 
         if success:
             embedmsg = Embed(
@@ -190,6 +244,13 @@ class Qualifiers(commands.Cog):
             await interaction.delete_original_response()
             await interaction.followup.send(f"❌ {error_msg}", ephemeral=True)
 
+    @claim_lobby.autocomplete("lobby_id")
+    async def claimable_lobby_choices(self, interaction: discord.Interaction, current: str):
+        """Suggests upcoming lobbies nobody refs yet."""
+        now = datetime.now(pytz.UTC).timestamp()
+        unassigned = staff_index.unassigned_rows("referee")
+        return choices([lobby_table.get(row) for row in lobby_ids.rows(current, lambda row: row in unassigned and _upcoming(row, now))], start_label)
+
     @app_commands.command(name="qdrop", description="Drop your claim as a referee for a qualifiers lobby.")
     @commands.has_role(1162844846478864544)  # Only users with the referee role can use this
     @commands.cooldown(1, 1.0, commands.BucketType.default)  # Limit command activation to 1 time per second globally
@@ -205,7 +266,8 @@ class Qualifiers(commands.Cog):
         discord_nickname = interaction.user.nick or interaction.user.name  # Use nickname if set, otherwise fallback to username
         discord_id = interaction.user.id
 
-        success, error_msg = drop_referee(lobby_id, discord_id)
+        async with lock_lobbies(lobby_id):
+            success, error_msg = await run_sheet(drop_referee, lobby_id, discord_id)
 
         if success:
             # Create an embedded success message for dropping the lobby
@@ -219,6 +281,12 @@ class Qualifiers(commands.Cog):
             await interaction.delete_original_response()
             await interaction.followup.send(f"❌ {error_msg}", ephemeral=True)
 
+    @drop_lobby.autocomplete("lobby_id")
+    async def claimed_lobby_choices(self, interaction: discord.Interaction, current: str):
+        """Suggests the caller's own claims, like /qclaimed up to an hour after the start."""
+        claimed = set(staff_index.claimed_rows(interaction.user.id, "referee"))
+        return choices([lobby_table.get(row) for row in lobby_ids.rows(current, lambda row: row in claimed and _upcoming(row, datetime.now(pytz.UTC).timestamp() - 3600))], start_label)
+
     @app_commands.command(name="qclaimed", description="List the lobbies claimed by a referee.")
     @commands.has_role(1162844846478864544)  # Only users with the referee role can use this
     @commands.cooldown(1, 1.0, commands.BucketType.default)  # Limit command activation to 1 time per second globally
@@ -236,7 +304,7 @@ class Qualifiers(commands.Cog):
         discord_id = interaction.user.id
 
         # Get the list of claimed lobbies
-        claimed_lobbies = get_claimed_lobbies(discord_id)
+        claimed_lobbies = await run_lookup(qschedule, get_claimed_lobbies, discord_id)
 
         if not claimed_lobbies:
             await interaction.followup.send(f"❌ No claimed lobbies found for {discord_nickname}.", ephemeral=True)
@@ -251,29 +319,29 @@ class Qualifiers(commands.Cog):
 
         await interaction.followup.send(embed=embed)
 
-    @tasks.loop(minutes=1)  # Runs every minute
-    async def check_lobbies(self):
-        print("checking")
-        worksheet = get_worksheet()  # Get the Google Sheet
-        rows = worksheet.get_all_values()[1:60]  # Fetch all rows from the sheet
-
-        # Loop through each row and check if column 'S' has a number <= 15
-        for row in rows:
-            try:
-                lobby_id = row[7]  # Column H is index 7 (starting from 0) for the lobby ID
-                time_left = int(row[18])  # Column S is index 18 (starting from 0)
-                pinged_status = int(row[19])  # Column T is index 19 (starting from 0)
-
-                print(f"id:{lobby_id} in {time_left}")
-
-                # Skip if time_left is -727
-                if time_left < 0:
-                    print("finished/empty lobby")
-                    continue  # Skip if time left cell is -727
+    async def check_lobbies(self, lobby_ids):
+        """Queues a ping for the teams and referee of every lobby whose reminder just became due."""
+        with metrics.measure("tick", "qualifiers"):
+            log_event("reminder_tick", stage="qualifiers", lobby_ids=lobby_ids)
+            snapshot = await run_sheet(qschedule.get, force=True)  # Captain IDs are formulas, read them fresh once per batch
+            now = datetime.now(pytz.UTC).timestamp()
+            notifications = []
+
+            for lobby_id in lobby_ids:
+                try:
+                    row_index = qschedule_index.lobby_row(lobby_id)
+                    if not row_index:
+                        continue  # Lobby was removed from the sheet
+
+                    lobby = lobby_table.get(row_index)
+
+                    # Skip lobbies that already started, were moved later or were pinged by hand
+                    if lobby.start is None or lobby.start < now or lobby.start - now > REMINDER_LEAD_MINUTES * 60 or lobby.pinged:
+                        log_event("lobby_not_due", lobby_id=lobby_id)
+                        continue
 
-                # Check if the time left is <= 15 minutes and T column is 0 (not pinged yet)
-                if time_left <= 15 and pinged_status == 0:
-                    inviter_id, team_cap_ids = fetch_pings(lobby_id)  # Returns Discord user IDs
+                    inviter_id, team_cap_ids = fetch_pings(lobby_id, snapshot)  # Returns Discord user IDs
+                    team_cap_ids = member_directory.present(team_cap_ids)  # Captains who left can't be pinged
 
                     if not team_cap_ids:
                         continue
@@ -282,65 +350,66 @@ class Qualifiers(commands.Cog):
                     inviter_text = f"<@{inviter_id}>" if inviter_id else "No referee <@&1162844846478864544> please help"
 
                     # Mention each team captain directly
-                    role_mentions = [f"<@{cap_id}>" for cap_id in team_cap_ids]
-
-                    if not role_mentions:
-                        continue
-
-                    role_ping_text = " ".join(role_mentions)
-
+                    role_ping_text = " ".join(f"<@{cap_id}>" for cap_id in team_cap_ids)
 
                     message = f"{role_ping_text} Your qualifiers lobby: **{lobby_id}** starts soon, the referee for this lobby will be: {inviter_text}"
 
-                    # Send the ping to the channel
-                    channel = self.bot.get_channel(1160278434820411486)
-                    if channel:
-                        await channel.send(message, allowed_mentions=discord.AllowedMentions(roles=True, users=True))
+                    # Lobbies starting together go out as one message, the dispatcher sets column T once they were sent
+                    notifications.append(Notification(f"qualifiers:{lobby_id}:{lobby.start}", "qualifiers", STAGES["qualifiers"]["ping_channel"], row_index, lobby_id, message))
 
-                    # After sending the ping, increment the value in the T column
-                    row_index = rows.index(row) + 2  # Calculate the correct row number
-                    worksheet.update_cell(row_index, 20, 1)  # Column T is 20th, row_index is 1-based
+                except Exception as e:
+                    log_event("lobby_check_failed", logging.WARNING, lobby_id=lobby_id, error=str(e))
 
-            except Exception as e:
-                print(f"Error checking lobby {lobby_id}: {e}")
+            await dispatcher.submit(notifications)
 
-    @check_lobbies.before_loop
-    async def before_check_lobbies(self):
-        # Wait until the bot is fully ready before starting the task
+    async def start_reminders(self):
+        # Wait until the bot is fully ready, then start watching the sheet
         await self.bot.wait_until_ready()
+        self.reminders.start()
+        self.change_feed.start()  # The first poll loads the snapshot and seeds the heap
+        if isinstance(qschedule.backend, MirroredBackend):
+            self._mirror_task = asyncio.create_task(qschedule.backend.run_sync(MIRROR_SYNC_SECONDS))
 
 
 
-    @app_commands.command(name="get_users", description="Get all users in the guild and their IDs in a CSV format.")
-    async def get_users(self, interaction: discord.Interaction):
-        await interaction.response.defer(ephemeral=True)
-
+    @app_commands.command(name="reload_roster", description="Reload the captain roster from the CSV file.")
+    async def reload_roster(self, interaction: discord.Interaction):
         if not any(role.id == 1160286790498930759 for role in interaction.user.roles):
             await interaction.response.send_message("❌ You don't have permissions to use this command", ephemeral=True)
             return
 
-        guild = interaction.guild
-        await guild.chunk()
+        if roster.reload():
+            await interaction.response.send_message(f"✅ Roster reloaded: {len(roster.teams_by_id)} captains in {len(roster.captains_by_team)} teams.", ephemeral=True)
+        else:
+            await interaction.response.send_message("❌ Failed to reload the roster, check the CSV file.", ephemeral=True)
 
-        print(f"Cached members: {len(guild.members)}")
+    @app_commands.command(name="get_users", description="Get all users in the guild and their IDs in a CSV format.")
+    @app_commands.describe(role="Only members with this role", team="Only members on this team's roster")
+    async def get_users(self, interaction: discord.Interaction, role: discord.Role = None, team: str = None):
+        if not any(user_role.id == 1160286790498930759 for user_role in interaction.user.roles):
+            await interaction.response.send_message("❌ You don't have permissions to use this command", ephemeral=True)
+            return
 
-        # Prepare CSV data
-        csv_data = io.StringIO()
-        csv_writer = csv.writer(csv_data)
+        if not member_directory.loaded:
+            await interaction.response.send_message("❌ The member list is still loading, please try again in a minute.", ephemeral=True)
+            return
 
-        # Write header
-        csv_writer.writerow(["Username", "ID"])
+        await interaction.response.defer(ephemeral=True)
 
-        # Write each member's username and ID
-        for member in guild.members:
-            csv_writer.writerow([f"{member.name}#{member.discriminator}", member.id])
+        # The directory is kept current by the member events, no need to chunk the guild again
+        member_ids = member_directory.select(role.id if role else None, team.strip() if team else None)
+        path = await member_directory.export_csv(member_ids)
+        output_file = discord.File(path, filename="users.csv")
+        try:
+            await interaction.followup.send(content=f"Here's the CSV file with {len(member_ids)} users and their IDs:", file=output_file)
+        finally:
+            output_file.close()
+            os.unlink(path)
 
-        # Prepare the CSV file to send
-        csv_data.seek(0)  # Reset pointer to the beginning of the StringIO buffer
-        output_file = discord.File(fp=csv_data, filename="users.csv")
 
-        # Send the CSV file as a response
-        await interaction.followup.send(content="Here's the CSV file with all users and their IDs:", file=output_file)
+def _upcoming(row, now):
+    lobby = lobby_table.get(row)
+    return lobby is not None and lobby.start is not None and lobby.start > now
 
 
 async def setup(bot):
@@ -0,0 +1,60 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+from utils.metrics import registry
+from utils.sheets_client import sheets_client
+from utils.google_sheets import qschedule
+from utils.bracket_sheets import bschedule
+
+ADMIN_ROLE = 1160286790498930759
+
+
+def latency_lines(name, label, limit=10):
+    """Returns 'name: count, p50, p95, max' lines of one seconds histogram, slowest p95 first."""
+    rows = [(labels.get(label, "?"), labels.get("status", ""), histogram) for labels, histogram in registry.histogram_items(name)]
+    rows.sort(key=lambda row: -row[2].quantile(0.95))
+    lines = []
+    for value, status, histogram in rows[:limit]:
+        suffix = f" ({status})" if status and status != "ok" else ""
+        lines.append(f"`{value}`{suffix}: {histogram.count}× p50 {histogram.quantile(0.5) * 1000:.0f}ms, p95 {histogram.quantile(0.95) * 1000:.0f}ms, max {histogram.max * 1000:.0f}ms")
+    return lines
+
+
+class Stats(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @app_commands.command(name="botstats", description="Shows command latency and Google Sheets usage.")
+    @commands.cooldown(1, 1.0, commands.BucketType.default)  # Limit command activation to 1 time per second globally
+    async def botstats(self, interaction: discord.Interaction):
+        """Admin command summarizing the metrics registry, the same numbers the /metrics endpoint exports."""
+        if not any(role.id == ADMIN_ROLE for role in interaction.user.roles):
+            await interaction.response.send_message("❌ You don't have permission to use this command.", ephemeral=True)
+            return
+
+        embed = discord.Embed(title="Bot Statistics", color=0x1ABC9C)
+        embed.add_field(name="⌨️ Commands", value="\n".join(latency_lines("command_seconds", "command")) or "none yet", inline=False)
+        embed.add_field(name="⏰ Reminder ticks", value="\n".join(latency_lines("tick_seconds", "tick")) or "none yet", inline=False)
+        embed.add_field(name="📄 Sheet functions", value="\n".join(latency_lines("function_seconds", "function", limit=8)) or "none yet", inline=False)
+
+        requests = {}
+        for labels, value in registry.counter_items("sheets_requests_total"):
+            requests[labels["kind"]] = requests.get(labels["kind"], 0) + value
+        sent = registry.counter("sheets_bytes_total", direction="sent")
+        received = registry.counter("sheets_bytes_total", direction="received")
+        client = sheets_client.stats()
+        embed.add_field(
+            name="📊 Google Sheets",
+            value=(
+                f"Requests: {', '.join(f'{kind} {count}' for kind, count in sorted(requests.items())) or 'none'}\n"
+                f"Throttled {client['throttled']}, retried {client['retried']}, coalesced {client['coalesced']}, failed {client['failed']}\n"
+                f"Sent {sent / 1024:.1f} KiB, received {received / 1024:.1f} KiB\n"
+                f"Snapshots: QSchedule v{qschedule.version}, BSchedule v{bschedule.version}"
+            ),
+            inline=False,
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+async def setup(bot):
+    await bot.add_cog(Stats(bot))
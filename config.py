@@ -1,2 +1,46 @@
 TOKEN = "YOUR DISCORD BOT TOKEN"
 GOOGLE_SHEETS_CREDENTIALS = "./credentials.json"
+
+# Sheet and tab of each tournament stage, "spreadsheet_key" (the ID in the sheet URL) can be used instead of "spreadsheet"
+# "staff" maps each staff role to the 1-based column holding the assigned member's Discord ID
+STAGES = {
+    "qualifiers": {"spreadsheet": "MBB7 // Ref Sheet", "worksheet": "QSchedule", "staff": {"referee": 23}, "match_minutes": 60, "ping_channel": 1160278434820411486,
+                   "lobby_window": ("04/14/25 12:00", "04/21/25 12:00")},  # Custom lobbies can only be made inside this UTC window
+    "bracket": {
+        "spreadsheet": "SST3 Ref Sheet",
+        "worksheet": "BSchedule",
+        "columns": {"match_id": 2, "date": 3, "time": 4, "team1": 5, "team2": 6, "score1": 10, "score2": 11, "pinged": 12},  # BSchedule layout, 1-based
+        "staff": {"referee": 7, "streamer": 8, "caster": 9},
+        "staff_roles": {"referee": 1162844846478864544, "streamer": None, "caster": None},  # Discord role allowed to claim each staff role, fill in the streamer and caster role IDs
+        "match_minutes": 90,  # Slot length used to detect overlapping matches
+        "ping_channel": 1160278434820411486,  # Channel for the reminders before each match
+    },
+}
+
+SHEET_CACHE_TTL = 30  # Seconds a QSchedule snapshot is served from memory before it's fetched again
+SHEETS_MAX_WORKERS = 8  # Threads available for blocking Google Sheets calls
+SHEETS_WAITING_WORKERS = 24  # Extra threads for calls sleeping on a Sheets quota or a retry backoff
+ROSTER_FILE = "MBB7teams.csv"  # Headerless id,team[,role] CSV, role is "captain" (default) or "player"
+ROSTER_CHECK_SECONDS = 5  # How often lookups check the roster file for changes
+MEMBER_EXPORT_CHUNK = 1000  # Rows /get_users writes to its CSV before yielding to the event loop
+AVAILABILITY_FILE = "referee_availability.csv"  # Headerless id,from,to[,max] CSV of referee windows, times are "m/d/yy HH:MM" UTC
+REFEREE_MAX_ASSIGNMENTS = 8  # Default load cap per referee for the assignment optimizer
+ASSIGNMENT_EXACT_SLOTS = 40  # Groups of slots sharing referees up to this size are searched for a maximum plan
+ASSIGNMENT_SEARCH_NODES = 100000  # Search steps per group before the best plan found so far is kept
+REMINDER_LEAD_MINUTES = 15  # Teams and referees are pinged this long before their lobby starts
+CHANGE_POLL_SECONDS = 15  # How often the ref sheet's modified time is probed for manual edits
+STORAGE_BACKEND = "sheets"  # "sheets" to use the ref sheet directly, "sqlite" to commit locally and mirror to the sheet
+SQLITE_PATH = "./syncro.db"  # Local database used by the sqlite backend
+MIRROR_SYNC_SECONDS = 5  # How often local writes are pushed to the sheet with the sqlite backend
+SHEETS_READS_PER_MINUTE = 60  # Google Sheets read quota per user per minute
+SHEETS_WRITES_PER_MINUTE = 60  # Google Sheets write quota per user per minute
+SHEETS_MAX_RETRIES = 5  # Retries for 429/5xx answers before a command gives up
+RESCHEDULE_EXPIRY_HOURS = 24  # How long the opposing captain has to accept a reschedule
+CHANNEL_MESSAGES_PER_WINDOW = 5  # Discord allows about 5 messages per channel every 5 seconds
+CHANNEL_WINDOW_SECONDS = 5
+NOTIFY_MERGE_SECONDS = 2  # Pings queued within this long of each other are merged into one message
+NOTIFY_MAX_ATTEMPTS = 3  # Sends of a ping before it is dropped
+JOB_RETRY_SECONDS = 30  # Delay before a failed job is handed out again
+JOB_RETENTION_DAYS = 14  # Completed jobs (and their idempotency keys) are kept this long
+METRICS_HOST = "127.0.0.1"  # Prometheus text endpoint at http://METRICS_HOST:METRICS_PORT/metrics
+METRICS_PORT = 9108  # None disables the endpoint, /botstats works either way
@@ -1,25 +1,86 @@
+import time
+started = time.perf_counter()  # Startup is measured from the very first import
+
 import discord
 from discord.ext import commands
 import asyncio
-from config import TOKEN
+import logging
+from config import TOKEN, STAGES, METRICS_HOST, METRICS_PORT
+from utils import sheet_executor, connections, metrics
+from utils.logs import setup_logging, log_event
+from utils.notifications import dispatcher
+from utils.jobs import job_queue, job_runner
 
 intents = discord.Intents.default()
 intents.members = True
 
 bot = commands.Bot(command_prefix="/", intents=intents)
+dispatcher.bind(bot)  # Before the cogs load, so reminders can never submit a ping to an unbound dispatcher
+setup_logging()
+metrics_server = None
+
+async def begin_command(interaction: discord.Interaction):
+    """Runs before every slash command, everything it does from here on is measured."""
+    if interaction.type != discord.InteractionType.application_command:
+        return True  # Autocomplete never reaches on_app_command_completion, so it must not open a scope
+    metrics.begin("command", interaction.command.qualified_name if interaction.command else "unknown")
+    return True
+
+bot.tree.interaction_check = begin_command
+
+@bot.event
+async def on_app_command_completion(interaction, command):
+    metrics.finish()
+
+@bot.tree.error
+async def on_app_command_error(interaction, error):
+    metrics.finish(status="error")
+    log_event("command_failed", logging.ERROR, exc_info=error, command=interaction.command.qualified_name if interaction.command else None, user=interaction.user.id)
 
 async def load_cogs():
     await bot.load_extension("cogs.qualifiers")  # load qualifiers module
     await bot.load_extension("cogs.bracket")  # load bracket module
+    await bot.load_extension("cogs.assignments")  # load referee assignment module
+    await bot.load_extension("cogs.stats")  # load bot statistics module
+    await bot.load_extension("cogs.members")  # load member directory module
+    connections.startup_timings["load_cogs"] = time.perf_counter() - started
+
+async def open_sheets():
+    """Authorizes with Google and opens the ref sheets after login, commands work before this finishes."""
+    sheets_started = time.perf_counter()
+    await sheet_executor.run_sheet(connections.warm_up, list(STAGES))
+    connections.startup_timings["sheets_ready"] = time.perf_counter() - started
+    log_event("sheets_connected", seconds=round(time.perf_counter() - sheets_started, 2), timings=connections.startup_timings)
 
 @bot.event
 async def on_ready():
+    first_ready = "ready" not in connections.startup_timings  # on_ready fires again after every reconnect
+    if first_ready:
+        connections.startup_timings["ready"] = time.perf_counter() - started
+        log_event("logged_in", user=str(bot.user), seconds=round(connections.startup_timings['ready'], 2))
+        asyncio.create_task(open_sheets())
+        job_runner.start()  # Replays the jobs a previous run left pending, in order
+        asyncio.create_task(dispatcher.start())  # Pings go out through one paced worker per channel
+        asyncio.create_task(sheet_executor.run_sheet(job_queue.purge))
     await bot.tree.sync()  # This syncs the slash commands
-    print(f"Logged in as {bot.user}")
+    if first_ready and METRICS_PORT:
+        # A busy port only costs the metrics endpoint, commands are already synced
+        global metrics_server
+        try:
+            metrics_server = await metrics.start_http_server(METRICS_HOST, METRICS_PORT)
+        except Exception as e:
+            log_event("metrics_server_failed", logging.ERROR, host=METRICS_HOST, port=METRICS_PORT, error=str(e))
 
 async def main():
     async with bot:
         await load_cogs()
-        await bot.start(TOKEN)
+        try:
+            await bot.start(TOKEN)
+        finally:
+            dispatcher.stop()
+            job_runner.stop()
+            if metrics_server:
+                await metrics_server.cleanup()
+            sheet_executor.shutdown()  # Let in-flight sheet calls finish without blocking the exit
 
 asyncio.run(main())
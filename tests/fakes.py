@@ -0,0 +1,21 @@
+import threading
+from utils.storage import StorageBackend
+
+
+class BlockingBackend(StorageBackend):
+    """Grid in memory whose fetch waits until the test releases it."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetches = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def fetch_rows(self):
+        self.fetches += 1
+        self.release.wait(5)
+        return [list(row) for row in self.rows]
+
+    def write_cells(self, updates):
+        for (row, col), value in updates.items():
+            self.rows[row - 1][col - 1] = value
@@ -0,0 +1,99 @@
+import itertools
+import random
+from utils.assignment import Slot, solve
+
+
+def slot(name, start, end):
+    return Slot("qualifiers", int(name[1:]) + 2, name, start, end)
+
+
+def check_valid(plan, referees, busy=None):
+    busy = busy or {}
+    by_referee = {}
+    for assigned, referee_id in plan.assignments:
+        windows, _ = referees[referee_id]
+        assert any(start <= assigned.start and assigned.end <= end for start, end in windows)
+        assert not any(assigned.overlaps(start, end) for start, end in busy.get(referee_id, ()))
+        by_referee.setdefault(referee_id, []).append(assigned)
+    for referee_id, taken in by_referee.items():
+        assert len(taken) + len(busy.get(referee_id, ())) <= referees[referee_id][1]
+        for first, second in itertools.combinations(taken, 2):
+            assert not first.overlaps(second.start, second.end)
+
+
+def test_moves_a_blocking_slot_to_cover_more():
+    # r0 can take both, r1 only X0: X0 has to end up with r1 so r0 is free for X1
+    slots = [slot("X0", 0, 60), slot("X1", 30, 90)]
+    referees = {"r0": ([(0, 100)], 1), "r1": ([(0, 60)], 1)}
+    plan = solve(slots, referees)
+    check_valid(plan, referees)
+    assert dict((assigned.record_id, referee_id) for assigned, referee_id in plan.assignments) == {"X0": "r1", "X1": "r0"}
+
+
+def test_existing_claims_count_towards_cap_and_overlaps():
+    slots = [slot("X0", 0, 60), slot("X1", 120, 180)]
+    referees = {"r0": ([(0, 200)], 2)}
+    busy = {"r0": [(100, 150)]}
+    plan = solve(slots, referees, busy)
+    check_valid(plan, referees, busy)
+    assert [assigned.record_id for assigned, _ in plan.assignments] == ["X0"]
+    assert [uncovered.record_id for uncovered in plan.uncovered] == ["X1"]
+
+
+def test_finds_the_maximum_the_greedy_moves_miss():
+    # The one-slot moves alone cover 4, the search finds the plan covering all 5
+    slots = [slot("X0", 90, 150), slot("X1", 180, 240), slot("X2", 240, 300), slot("X3", 0, 60), slot("X4", 90, 150)]
+    referees = {"r0": ([(210, 540)], 1), "r1": ([(0, 360)], 3), "r2": ([(90, 270)], 1)}
+    assert len(solve(slots, referees, exact_slots=0).assignments) == 4
+    plan = solve(slots, referees)
+    check_valid(plan, referees)
+    assert len(plan.assignments) == 5
+
+
+def brute_force(slots, referees, busy):
+    """Largest number of slots any valid plan covers, by trying every assignment."""
+    best = 0
+    for choice in itertools.product([None, *referees], repeat=len(slots)):
+        taken = {}
+        for assigned, referee_id in zip(slots, choice):
+            if referee_id is not None:
+                taken.setdefault(referee_id, []).append(assigned)
+        valid = True
+        for referee_id, mine in taken.items():
+            windows, cap = referees[referee_id]
+            claims = busy.get(referee_id, ())
+            valid = (
+                len(mine) + len(claims) <= cap
+                and all(any(start <= s.start and s.end <= end for start, end in windows) for s in mine)
+                and not any(s.overlaps(start, end) for s in mine for start, end in claims)
+                and not any(a.overlaps(b.start, b.end) for a, b in itertools.combinations(mine, 2))
+            )
+            if not valid:
+                break
+        if valid:
+            best = max(best, sum(referee_id is not None for referee_id in choice))
+    return best
+
+
+def test_small_plans_are_maximum():
+    rng = random.Random(11)
+    for _ in range(150):
+        slots = [slot(f"X{i}", start, start + 60) for i, start in enumerate(rng.randrange(0, 420, 30) for _ in range(rng.randint(1, 6)))]
+        referees = {f"r{i}": ([(rng.randrange(0, 240, 30), rng.randrange(240, 540, 30))], rng.randint(1, 3)) for i in range(rng.randint(1, 3))}
+        claimed = rng.randrange(0, 420, 30)
+        busy = {"r0": [(claimed, claimed + 60)]} if rng.random() < 0.5 else {}
+        plan = solve(slots, referees, busy)
+        check_valid(plan, referees, busy)
+        assert len(plan.assignments) == brute_force(slots, referees, busy)
+
+
+def test_random_plans_are_valid():
+    rng = random.Random(7)
+    for _ in range(200):
+        slots = [slot(f"X{i}", start, start + 60) for i, start in enumerate(rng.randrange(0, 600, 30) for _ in range(rng.randint(1, 12)))]
+        referees = {f"r{i}": ([(rng.randrange(0, 300, 30), rng.randrange(300, 700, 30))], rng.randint(1, 4)) for i in range(rng.randint(1, 4))}
+        claimed = rng.randrange(0, 600, 30)
+        busy = {"r0": [(claimed, claimed + 60)]} if rng.random() < 0.5 else {}
+        plan = solve(slots, referees, busy)
+        check_valid(plan, referees, busy)
+        assert len(plan.assignments) + len(plan.uncovered) == len(slots)
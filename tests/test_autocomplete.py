@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+import types
+from datetime import datetime, timedelta
+import pytz
+from utils.google_sheets import qschedule
+from utils.notifications import dispatcher
+from cogs.qualifiers import Qualifiers
+from fakes import BlockingBackend
+
+
+def lobby_rows(count, referee_id):
+    start = datetime.now(pytz.UTC) + timedelta(days=1)
+    rows = [["header"] * 28]
+    for i in range(1, count + 1):
+        row = [""] * 28
+        row[7], row[8], row[9] = f"X{i}", start.strftime("%m/%d/%y"), start.strftime("%H:%M")  # H, I, J
+        row[22] = referee_id if i % 2 else ""  # W
+        rows.append(row)
+    return rows
+
+
+def test_lobby_autocomplete_answers_during_a_refresh():
+    backend, qschedule.backend = qschedule.backend, BlockingBackend(lobby_rows(200, "77"))
+    qschedule.rows = []
+    cog = Qualifiers(types.SimpleNamespace())
+    refresh = threading.Thread(target=qschedule.get, kwargs={"force": True})
+    try:
+        qschedule.get(force=True)
+        interaction = types.SimpleNamespace(user=types.SimpleNamespace(id=77))
+
+        qschedule.backend.release.clear()
+        refresh.start()
+        time.sleep(0.05)
+
+        async def complete():
+            return await asyncio.wait_for(asyncio.gather(
+                cog.open_lobby_choices(interaction, "x1"),
+                cog.claimable_lobby_choices(interaction, ""),
+                cog.claimed_lobby_choices(interaction, "X19"),
+            ), timeout=1)
+
+        started = time.perf_counter()
+        open_lobbies, claimable, claimed = asyncio.run(complete())
+        assert time.perf_counter() - started < 0.5
+        assert len(open_lobbies) == 25 and all(choice.value.startswith("X1") for choice in open_lobbies)
+        assert claimable and all(int(choice.value[1:]) % 2 == 0 for choice in claimable)
+        assert sorted(choice.value for choice in claimed) == ["X19", "X191", "X193", "X195", "X197", "X199"]
+    finally:
+        qschedule.backend.release.set()
+        if refresh.is_alive():
+            refresh.join()
+        qschedule.remove_index(cog.reminder_index)
+        dispatcher.unregister("qualifiers")
+        qschedule.backend = backend
+        qschedule.rows = []
+        qschedule.invalidate()
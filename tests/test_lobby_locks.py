@@ -0,0 +1,22 @@
+import asyncio
+import gc
+from utils import lobby_locks
+from utils.lobby_locks import lock_lobbies
+
+
+def test_locks_are_dropped_once_released():
+    async def run():
+        order = []
+
+        async def claim(name):
+            async with lock_lobbies("A1"):
+                order.append(name)
+                await asyncio.sleep(0.01)
+                assert len(lobby_locks._locks) == 1  # Both commands share the one lock
+
+        await asyncio.gather(claim("first"), claim("second"))
+        return order
+
+    assert asyncio.run(run()) == ["first", "second"]
+    gc.collect()
+    assert len(lobby_locks._locks) == 0
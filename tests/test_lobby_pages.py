@@ -0,0 +1,50 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+import pytz
+from utils.google_sheets import qschedule
+from utils.lobby_query import parse_conditions
+from cogs.qualifiers import LobbyPages
+from fakes import BlockingBackend
+
+
+def lobby_rows(count):
+    start = datetime.now(pytz.UTC) + timedelta(days=1)
+    rows = [["header"] * 28]
+    for i in range(1, count + 1):
+        slot = start + timedelta(minutes=15 * i)
+        row = [""] * 28
+        row[7], row[8], row[9] = f"X{i}", slot.strftime("%m/%d/%y"), slot.strftime("%H:%M")  # H, I, J
+        rows.append(row)
+    return rows
+
+
+def test_lobby_pages_render_during_a_refresh():
+    backend, qschedule.backend = qschedule.backend, BlockingBackend(lobby_rows(30))
+    qschedule.rows = []
+    refresh = threading.Thread(target=qschedule.get, kwargs={"force": True})
+    try:
+        qschedule.get(force=True)
+        qschedule.backend.release.clear()
+        refresh.start()
+        time.sleep(0.05)
+
+        async def browse():
+            view = LobbyPages(parse_conditions("", {"referee": 23}), user_id=1)
+            first = view.render()
+            view.cursors.append(view.next_cursor)
+            return first, view.render()
+
+        started = time.perf_counter()
+        first, second = asyncio.run(browse())
+        assert time.perf_counter() - started < 0.5
+        assert [field.name for field in first.fields][:2] == ["• X1", "• X2"]
+        assert second.fields[0].name == "• X9"
+    finally:
+        qschedule.backend.release.set()
+        if refresh.is_alive():
+            refresh.join()
+        qschedule.backend = backend
+        qschedule.rows = []
+        qschedule.invalidate()
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+import pytz
+from utils.lobbies import Lobby
+from utils.bracket_sheets import Match, COLUMNS, STAFF_COLUMNS
+from utils.lobby_query import parse_conditions, match_has_teams
+
+START = datetime.now(pytz.UTC) + timedelta(days=1)
+
+
+def match_row(match_id, teams=(), referee=""):
+    values = [""] * 30
+    values[COLUMNS["match_id"] - 1] = match_id
+    values[COLUMNS["date"] - 1] = START.strftime("%m/%d/%y")
+    values[COLUMNS["time"] - 1] = START.strftime("%H:%M")
+    for col, team in zip((COLUMNS["team1"], COLUMNS["team2"]), teams):
+        values[col - 1] = team
+    values[STAFF_COLUMNS["referee"] - 1] = referee
+    return values
+
+
+def lobby_row(lobby_id, teams=(), referee=""):
+    values = [""] * 30
+    values[7], values[8], values[9] = lobby_id, START.strftime("%m/%d/%y"), START.strftime("%H:%M")  # H, I, J
+    for i, team in enumerate(teams):
+        values[12 + i] = team  # M-Q
+    values[22] = referee  # W
+    return values
+
+
+def test_needed_on_matches_uses_match_teams():
+    matches = [Match(2, match_row("M1", ("A", "B"))), Match(3, match_row("M2")), Match(4, match_row("M3", ("A", "B"), referee="1"))]
+    query = parse_conditions("referee=needed", STAFF_COLUMNS, slots=False, teams_signed_up=match_has_teams())
+    assert [match.match_id for match in query.run(matches)] == ["M1"]
+
+
+def test_needed_on_lobbies_uses_slots():
+    lobbies = [Lobby(2, lobby_row("X1", ("A",)), {"referee": 23}), Lobby(3, lobby_row("X2"), {"referee": 23})]
+    query = parse_conditions("referee=needed", {"referee": 23})
+    assert [lobby.lobby_id for lobby in query.run(lobbies)] == ["X1"]
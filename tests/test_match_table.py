@@ -0,0 +1,42 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import pytz
+from utils.bracket_sheets import bschedule, match_table, COLUMNS
+from fakes import BlockingBackend
+
+
+def match_rows(count):
+    start = datetime.now(pytz.UTC) + timedelta(days=1)
+    rows = [["header"] * 12]
+    for i in range(1, count + 1):
+        slot = start + timedelta(hours=2 * i)
+        row = [""] * 12
+        row[COLUMNS["match_id"] - 1] = f"M{i}"
+        row[COLUMNS["date"] - 1], row[COLUMNS["time"] - 1] = slot.strftime("%m/%d/%y"), slot.strftime("%H:%M")
+        row[COLUMNS["team1"] - 1], row[COLUMNS["team2"] - 1] = "A", f"Team {i}"
+        rows.append(row)
+    return rows
+
+
+def test_upcoming_for_team_during_a_refresh():
+    backend, bschedule.backend = bschedule.backend, BlockingBackend(match_rows(20))
+    bschedule.rows = []
+    refresh = threading.Thread(target=bschedule.get, kwargs={"force": True})
+    try:
+        bschedule.get(force=True)
+        bschedule.backend.release.clear()
+        refresh.start()
+        time.sleep(0.05)
+
+        started = time.perf_counter()
+        upcoming = match_table.upcoming_for_team("A", datetime.now(pytz.UTC).timestamp(), limit=10)
+        assert time.perf_counter() - started < 0.5
+        assert [match.match_id for match in upcoming] == [f"M{i}" for i in range(1, 11)]
+    finally:
+        bschedule.backend.release.set()
+        if refresh.is_alive():
+            refresh.join()
+        bschedule.backend = backend
+        bschedule.rows = []
+        bschedule.invalidate()
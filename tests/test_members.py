@@ -0,0 +1,34 @@
+import asyncio
+import csv
+import os
+from types import SimpleNamespace
+from utils.members import MemberDirectory
+from utils.roster import roster
+
+
+def member(member_id, name, role_ids=()):
+    return SimpleNamespace(id=member_id, name=name, discriminator="0", display_name=name.title(), roles=[SimpleNamespace(id=role_id) for role_id in role_ids], bot=False)
+
+
+def test_export_reads_the_roster_once(monkeypatch):
+    directory = MemberDirectory()
+    directory.load([member(1, "ann", [10]), member(2, "bob", [10]), member(3, "cy")])
+    calls = []
+    monkeypatch.setattr(roster, "member_teams", lambda: calls.append(1) or {"1": "Alpha", "2": "Beta"})
+
+    path = asyncio.run(directory.export_csv(directory.select(10), chunk_size=1))
+    try:
+        with open(path, newline="", encoding="utf-8") as file:
+            rows = list(csv.reader(file))
+    finally:
+        os.unlink(path)
+    assert rows == [["Username", "ID", "Display Name", "Team"], ["ann", "1", "Ann", "Alpha"], ["bob", "2", "Bob", "Beta"]]
+    assert calls == [1]
+
+
+def test_present_drops_members_who_left():
+    directory = MemberDirectory()
+    assert directory.present(["1", "2"]) == ["1", "2"]  # Not loaded yet, nobody is dropped
+    directory.load([member(1, "ann"), member(2, "bob")])
+    directory.remove(2)
+    assert directory.present(["1", "2", "x"]) == ["1"]
@@ -0,0 +1,48 @@
+import asyncio
+import types
+from utils.jobs import JobQueue, JobRunner
+from utils.notifications import Dispatcher, Notification
+
+
+class FlakyQueue(JobQueue):
+    """Job queue whose first complete() fails, like a locked database."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.failures = 1
+
+    def complete(self, keys, follow_ups=()):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        super().complete(keys, follow_ups)
+
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content, **kwargs):
+        self.sent.append(content)
+
+
+def ping(key, text):
+    return Notification(key, "qualifiers", 1, 2, "X1", text)
+
+
+def test_channel_worker_survives_a_failed_complete(tmp_path):
+    async def run():
+        queue = FlakyQueue(str(tmp_path / "jobs.db"))
+        dispatcher = Dispatcher(queue, JobRunner(queue), merge_seconds=0)
+        channel = FakeChannel()
+        dispatcher.bind(types.SimpleNamespace(get_channel=lambda channel_id: channel))
+        await dispatcher.submit([ping("a", "first")])
+        await asyncio.sleep(0.1)
+        await dispatcher.submit([ping("b", "second")])
+        await asyncio.sleep(0.1)
+        dispatcher.stop()
+        return channel.sent, [job.key for job in queue.pending("ping")]
+
+    sent, pending = asyncio.run(run())
+    assert sent == ["first", "second"]
+    assert pending == ["a"]  # Sent but not recorded, replayed after a restart
@@ -0,0 +1,26 @@
+import asyncio
+from utils.jobs import JobQueue
+from utils.reschedule import ProposalStore
+
+
+def test_proposals_survive_a_restart(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+
+    async def propose():
+        store = ProposalStore(60, queue)
+        proposal = await store.create("M1", "A", "B", 1, 100, 200)
+        await store.attach(proposal, 5, 6)
+        replacement = await store.create("M1", "A", "B", 1, 100, 300)  # Replaces the pending one
+        return replacement
+
+    replacement = asyncio.run(propose())
+    restored = ProposalStore(60, queue).load()
+    assert [(proposal.proposal_id, proposal.new_start) for proposal in restored] == [(replacement.proposal_id, 300)]
+
+    async def decline():
+        store = ProposalStore(60, queue)
+        store.load()
+        await store.pop(replacement.proposal_id)
+
+    asyncio.run(decline())
+    assert ProposalStore(60, queue).load() == []
@@ -0,0 +1,35 @@
+import os
+from utils import roster as roster_module
+from utils.roster import Roster
+
+
+def test_broken_file_is_parsed_once_and_keeps_the_last_good_data(tmp_path, monkeypatch):
+    path = tmp_path / "teams.csv"
+    path.write_text("1,Alpha\n2,Alpha,player\n")
+    roster = Roster(str(path), check_seconds=0)
+    assert roster.get_member_team(2) == "Alpha"
+
+    parses = []
+
+    def broken(*args, **kwargs):
+        parses.append(1)
+        raise ValueError("bad row")
+
+    monkeypatch.setattr(roster_module.csv, "DictReader", broken)
+    path.write_text("garbage\n")
+    os.utime(path, (1, 1))  # A different mtime than the good file's
+    for _ in range(3):
+        assert roster.get_team(1) == "Alpha"
+    assert parses == [1]
+
+
+def test_mtime_is_checked_at_most_every_check_seconds(tmp_path, monkeypatch):
+    path = tmp_path / "teams.csv"
+    path.write_text("1,Alpha\n")
+    roster = Roster(str(path), check_seconds=60)
+    roster.get_team(1)
+    stats = []
+    monkeypatch.setattr(roster_module.os, "stat", lambda *args: stats.append(1))
+    for _ in range(5):
+        assert roster.get_team(1) == "Alpha"
+    assert stats == []
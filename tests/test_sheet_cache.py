@@ -0,0 +1,49 @@
+import threading
+import time
+from utils.sheet_cache import SheetSnapshot
+from utils.autocomplete import PrefixIndex
+from fakes import BlockingBackend
+
+
+def grid(*ids):
+    return [["header"]] + [[lobby_id] for lobby_id in ids]
+
+
+def start_refresh(snapshot):
+    thread = threading.Thread(target=snapshot.get, kwargs={"force": True})
+    thread.start()
+    return thread
+
+
+def test_index_reads_do_not_wait_on_a_fetch():
+    backend = BlockingBackend(grid("X1", "X2"))
+    snapshot = SheetSnapshot(backend)
+    ids = snapshot.add_index(PrefixIndex(1))
+    snapshot.get()
+
+    backend.release.clear()
+    thread = start_refresh(snapshot)
+    time.sleep(0.05)
+    started = time.perf_counter()
+    assert ids.rows("x") == [2, 3]
+    snapshot.update_cell(2, 1, "X9")  # Writes go through too
+    assert time.perf_counter() - started < 0.5
+    backend.release.set()
+    thread.join()
+    assert ids.rows("x9") == [2]  # The write made during the fetch survives the swap
+
+
+def test_concurrent_refreshes_share_one_fetch():
+    backend = BlockingBackend(grid("X1"))
+    snapshot = SheetSnapshot(backend, ttl=0)
+    snapshot.get()
+
+    backend.release.clear()
+    threads = [start_refresh(snapshot)]
+    time.sleep(0.05)
+    threads += [start_refresh(snapshot) for _ in range(4)]
+    time.sleep(0.05)
+    backend.release.set()
+    for thread in threads:
+        thread.join()
+    assert backend.fetches == 2  # The first load, then one fetch for everyone
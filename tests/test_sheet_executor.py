@@ -0,0 +1,47 @@
+import asyncio
+import threading
+from utils.sheet_cache import SheetSnapshot
+from config import SHEETS_MAX_WORKERS
+from utils.sheet_executor import run_lookup, run_sheet
+from utils.sheets_client import SheetsClient
+from fakes import BlockingBackend
+
+
+def lookup(snapshot):
+    def find(refresh=True):
+        if refresh:
+            snapshot.get()
+        return threading.current_thread().name, snapshot.rows[1][0]
+    return find
+
+
+def test_fresh_snapshot_is_read_on_the_event_loop():
+    snapshot = SheetSnapshot(BlockingBackend([["ID"], ["A1"]]), ttl=60)
+
+    async def run():
+        loop_thread = threading.current_thread().name
+        first = await run_lookup(snapshot, lookup(snapshot))  # Empty snapshot, refreshed on the pool
+        second = await run_lookup(snapshot, lookup(snapshot))
+        return loop_thread, first, second
+
+    loop_thread, first, second = asyncio.run(run())
+    assert first[0].startswith("sheets") and first[1] == "A1"
+    assert second == (loop_thread, "A1")
+    assert snapshot.backend.fetches == 1
+
+
+def test_throttled_calls_dont_hold_the_pool():
+    client = SheetsClient(6000, 600, 0)  # 10 writes per second
+    client.buckets["write"].tokens = 0
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        writes = [asyncio.ensure_future(run_sheet(client.call, "write", lambda: None)) for _ in range(SHEETS_MAX_WORKERS * 2)]
+        await asyncio.sleep(0.05)  # Every write is sleeping on the bucket by now
+        started = loop.time()
+        await run_sheet(lambda: None)  # A call that only reads memory
+        waited = loop.time() - started
+        await asyncio.gather(*writes)
+        return waited
+
+    assert asyncio.run(run()) < 0.3
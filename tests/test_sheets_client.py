@@ -0,0 +1,34 @@
+import gspread
+from utils.sheets_client import SheetsClient
+
+
+def test_stale_worksheet_is_forgotten_and_retried_once():
+    client = SheetsClient(6000, 6000, 2, base_delay=0)
+    handles = ["old"]
+    calls = []
+
+    def read():
+        calls.append(handles[0])
+        if handles[0] == "old":
+            raise gspread.exceptions.WorksheetNotFound("Schedule")
+        return [["ok"]]
+
+    def forget():
+        handles[0] = "new"
+
+    assert client.call("read", read, key="k", on_stale=forget) == [["ok"]]
+    assert calls == ["old", "new"]
+
+
+def test_missing_worksheet_without_handler_raises():
+    client = SheetsClient(6000, 6000, 2, base_delay=0)
+
+    def read():
+        raise gspread.exceptions.WorksheetNotFound("Schedule")
+
+    try:
+        client.call("read", read)
+    except gspread.exceptions.WorksheetNotFound:
+        pass
+    else:
+        assert False, "expected WorksheetNotFound"
@@ -0,0 +1,52 @@
+from utils.storage import MirroredBackend, SQLiteBackend, StorageBackend
+
+
+class FakeSheet(StorageBackend):
+    """Remote grid in memory whose modified marker moves on every write."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.marker = 1
+        self.fetches = 0
+
+    def fetch_rows(self):
+        self.fetches += 1
+        return [list(row) for row in self.rows]
+
+    def write_cells(self, updates):
+        for (row, col), value in updates.items():
+            self.rows[row - 1][col - 1] = value
+        self.marker += 1
+
+    def modified_marker(self):
+        return self.marker
+
+
+def test_own_sync_is_not_pulled_back(tmp_path):
+    remote = FakeSheet([["a", "b"], ["c", "d"]])
+    mirror = MirroredBackend(SQLiteBackend(str(tmp_path / "grid.db"), "Schedule"), remote)
+    mirror.fetch_rows()
+    assert remote.fetches == 1
+
+    mirror.write_cells({(2, 2): "x"})
+    assert mirror.sync() == 1
+    mirror.modified_marker()
+    assert remote.fetches == 1
+    assert remote.rows[1][1] == "x"
+
+    remote.write_cells({(1, 1): "edited"})  # Someone edits the sheet by hand
+    mirror.modified_marker()
+    assert remote.fetches == 2
+    assert mirror.fetch_rows()[0][0] == "edited"
+
+
+def test_external_edit_before_sync_is_still_pulled(tmp_path):
+    remote = FakeSheet([["a", "b"]])
+    mirror = MirroredBackend(SQLiteBackend(str(tmp_path / "grid.db"), "Schedule"), remote)
+    mirror.fetch_rows()
+
+    mirror.write_cells({(1, 2): "x"})
+    remote.write_cells({(1, 1): "edited"})
+    mirror.sync()
+    mirror.modified_marker()
+    assert mirror.fetch_rows()[0] == ["edited", "x"]
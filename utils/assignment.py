@@ -0,0 +1,261 @@
+import logging
+from datetime import datetime
+import pytz
+from config import STAGES, ASSIGNMENT_EXACT_SLOTS, ASSIGNMENT_SEARCH_NODES
+from utils import google_sheets, bracket_sheets
+from utils.availability import availability, is_available
+from utils.sheet_cache import StaleWriteError
+from utils.sheets_client import SheetsBusyError
+from utils.logs import log_event
+
+QUALIFIER_SECONDS = STAGES["qualifiers"]["match_minutes"] * 60
+
+
+class Slot:
+    """A lobby or match that still needs a referee."""
+
+    __slots__ = ("stage", "row", "record_id", "start", "end")
+
+    def __init__(self, stage, row, record_id, start, end):
+        self.stage = stage  # "qualifiers" or "bracket"
+        self.row = row
+        self.record_id = record_id  # Lobby or match ID, checked again when the plan is committed
+        self.start = start
+        self.end = end
+
+    @property
+    def lock_key(self):
+        """Key of the lock the /qclaim and /matches_claim commands take for this slot."""
+        return self.record_id if self.stage == "qualifiers" else f"bracket:{self.record_id}"
+
+    def overlaps(self, start, end):
+        return self.start < end and start < self.end
+
+
+class Plan:
+    """The result of one solver run: who referees which slot, and what stayed uncovered."""
+
+    def __init__(self, assignments, uncovered, busy):
+        self.assignments = assignments  # [(Slot, referee_id)] in start order
+        self.uncovered = uncovered  # [Slot] nobody could take, in start order
+        self.loads = {}  # referee_id -> new assignments
+        for _, referee_id in assignments:
+            self.loads[referee_id] = self.loads.get(referee_id, 0) + 1
+        self.busy = busy  # referee_id -> existing claims the plan worked around
+
+    @property
+    def coverage(self):
+        total = len(self.assignments) + len(self.uncovered)
+        return len(self.assignments) / total if total else 1.0
+
+
+def solve(slots, referees, busy=None, exact_slots=ASSIGNMENT_EXACT_SLOTS, search_nodes=ASSIGNMENT_SEARCH_NODES):
+    """Assigns referees to slots, covering as many slots as possible.
+
+    referees is {referee_id: (windows, cap)}, busy is {referee_id: [(start, end)]} of claims they already hold.
+    A referee only gets slots inside one of their windows, never two overlapping slots and never more than cap in
+    total. Slots are placed most constrained first: when every eligible referee is full or busy, a single slot
+    blocking one of them is moved to another referee if that frees the way (chains of such moves are followed).
+    Among free referees the least loaded one is tried first, so the work is spread evenly.
+
+    Caps and overlaps together make the general problem hard, so the greedy plan is then checked per group of
+    slots that share referees: groups of up to exact_slots are searched by branch and bound for a plan covering
+    more, within search_nodes steps. Small groups therefore get a maximum plan, larger ones keep the greedy one.
+    """
+    busy = busy or {}
+    caps = {referee_id: cap for referee_id, (_, cap) in referees.items()}
+    eligible = {}
+    for slot in slots:
+        eligible[slot] = [
+            referee_id for referee_id, (windows, _) in referees.items()
+            if is_available(windows, slot.start, slot.end) and not any(slot.overlaps(start, end) for start, end in busy.get(referee_id, ()))
+        ]
+    assigned = {referee_id: [] for referee_id in referees}  # referee_id -> slots given by the solver
+    owner = {}  # slot -> referee_id
+
+    def load(referee_id):
+        return len(busy.get(referee_id, ())) + len(assigned[referee_id])
+
+    def give(slot, referee_id):
+        assigned[referee_id].append(slot)
+        owner[slot] = referee_id
+
+    def take(slot, referee_id):
+        assigned[referee_id].remove(slot)
+        del owner[slot]
+
+    def place(slot, visited):
+        for referee_id in sorted(eligible[slot], key=lambda referee_id: (load(referee_id), referee_id)):
+            if referee_id in visited:
+                continue
+            visited.add(referee_id)
+            blockers = [other for other in assigned[referee_id] if other.overlaps(slot.start, slot.end)]
+            if not blockers and load(referee_id) < caps[referee_id]:
+                give(slot, referee_id)
+                return True
+            # Freeing the referee takes moving exactly one slot: the overlapping one, or any of theirs when full
+            if len(blockers) == 1:
+                movable = blockers
+            elif not blockers:
+                movable = list(assigned[referee_id])
+            else:
+                movable = []
+            for other in movable:
+                take(other, referee_id)
+                give(slot, referee_id)
+                if place(other, visited):
+                    return True
+                take(slot, referee_id)
+                give(other, referee_id)
+        return False
+
+    for slot in sorted(slots, key=lambda slot: (len(eligible[slot]), slot.start, slot.row)):
+        place(slot, set())
+
+    spare = {referee_id: caps[referee_id] - len(busy.get(referee_id, ())) for referee_id in referees}
+    for component in _components(slots, eligible):
+        if len(component) > exact_slots:
+            continue
+        current = {slot: owner[slot] for slot in component if slot in owner}
+        best = _search(component, eligible, spare, current, search_nodes)
+        if len(best) > len(current):
+            for slot, referee_id in current.items():
+                take(slot, referee_id)
+            for slot, referee_id in best.items():
+                give(slot, referee_id)
+
+    order = lambda slot: (slot.start, slot.stage, slot.row)
+    assignments = sorted(((slot, referee_id) for slot, referee_id in owner.items()), key=lambda item: order(item[0]))
+    uncovered = sorted((slot for slot in slots if slot not in owner), key=order)
+    return Plan(assignments, uncovered, busy)
+
+
+def _components(slots, eligible):
+    """Groups slots that share an eligible referee, caps and overlaps only tie slots within one group."""
+    parent = {slot: slot for slot in slots}
+
+    def root(slot):
+        while parent[slot] is not slot:
+            parent[slot] = parent[parent[slot]]
+            slot = parent[slot]
+        return slot
+
+    first = {}  # referee_id -> first slot seen for them
+    for slot in slots:
+        for referee_id in eligible[slot]:
+            if referee_id in first:
+                parent[root(slot)] = root(first[referee_id])
+            else:
+                first[referee_id] = slot
+    groups = {}
+    for slot in slots:
+        groups.setdefault(root(slot), []).append(slot)
+    return list(groups.values())
+
+
+def _search(component, eligible, spare, initial, limit):
+    """Branch and bound over one group of slots, returns the largest {slot: referee_id} found.
+
+    initial is the plan to beat, spare is {referee_id: assignments left under their cap}. A branch is cut as soon
+    as covering every remaining slot could not beat the best plan, and the search stops after limit steps.
+    """
+    order = [slot for slot in sorted(component, key=lambda slot: (len(eligible[slot]), slot.start, slot.row)) if eligible[slot]]
+    taken = {referee_id: [] for slot in order for referee_id in eligible[slot]}
+    best, current, steps = dict(initial), {}, 0
+
+    def search(i):
+        nonlocal best, steps
+        steps += 1
+        if len(current) > len(best):
+            best = dict(current)
+        if i == len(order) or steps > limit or len(best) == len(order) or len(current) + len(order) - i <= len(best):
+            return
+        slot = order[i]
+        for referee_id in sorted(eligible[slot], key=lambda referee_id: (len(taken[referee_id]), referee_id)):
+            mine = taken[referee_id]
+            if len(mine) < spare[referee_id] and not any(other.overlaps(slot.start, slot.end) for other in mine):
+                mine.append(slot)
+                current[slot] = referee_id
+                search(i + 1)
+                mine.pop()
+                del current[slot]
+        search(i + 1)  # Leave the slot uncovered
+
+    search(0)
+    return best
+
+
+def collect_slots(now):
+    """Returns a Slot for every upcoming lobby with teams and every upcoming match that has no referee."""
+    google_sheets.qschedule.get()
+    bracket_sheets.bschedule.get()
+    slots = []
+    for lobby in google_sheets.lobby_table.lobbies():
+        if lobby.start >= now and lobby.slot_mask and not lobby.staff.get("referee"):
+            slots.append(Slot("qualifiers", lobby.row, lobby.lobby_id, lobby.start, lobby.start + QUALIFIER_SECONDS))
+    table = bracket_sheets.match_table
+    with table.lock:
+        for row in bracket_sheets.staff_index.unassigned.get("referee", ()):
+            match = table.by_row.get(row)
+            if match and match.start is not None and match.start >= now and not match.finished:
+                slots.append(Slot("bracket", match.row, match.match_id, match.start, match.end))
+    return slots
+
+def collect_busy(referee_ids, now):
+    """Returns {referee_id: [(start, end)]} of the upcoming lobbies and matches each referee already claimed."""
+    busy = {}
+    for referee_id in referee_ids:
+        intervals = []
+        for row in google_sheets.staff_index.claimed_rows(referee_id):
+            lobby = google_sheets.lobby_table.get(row)
+            if lobby and lobby.start is not None and lobby.start + QUALIFIER_SECONDS > now:
+                intervals.append((lobby.start, lobby.start + QUALIFIER_SECONDS))
+        for row in bracket_sheets.staff_index.claimed_rows(referee_id):
+            match = bracket_sheets.match_table.by_row.get(row)
+            if match and match.start is not None and match.end > now:
+                intervals.append((match.start, match.end))
+        if intervals:
+            busy[referee_id] = intervals
+    return busy
+
+def plan_assignments():
+    """Loads the schedules and the availability file and returns a Plan for every uncovered lobby and match."""
+    now = int(datetime.now(pytz.UTC).timestamp())
+    referees = availability.referees()
+    slots = collect_slots(now)
+    return solve(slots, referees, collect_busy(referees, now))
+
+
+def commit_plan(plan):
+    """Writes the plan with one batched request per sheet.
+
+    Every referee cell must still be empty and every row must still hold the same lobby/match ID, otherwise that
+    sheet's batch is rejected as a whole and nothing of it is written.
+    """
+    stages = (
+        ("qualifiers", google_sheets.qschedule, 8, google_sheets.REFEREE_COLUMN),
+        ("bracket", bracket_sheets.bschedule, bracket_sheets.COLUMNS["match_id"], bracket_sheets.STAFF_COLUMNS["referee"]),
+    )
+    written, errors = 0, []
+    for stage, snapshot, id_col, referee_col in stages:
+        assignments = [(slot, referee_id) for slot, referee_id in plan.assignments if slot.stage == stage]
+        if not assignments:
+            continue
+        try:
+            with snapshot.batch() as batch:
+                for slot, referee_id in assignments:
+                    batch.set(slot.row, referee_col, str(referee_id))
+                    batch.expect(slot.row, referee_col, "")
+                    batch.expect(slot.row, id_col, slot.record_id)
+            written += len(assignments)
+            log_event("referees_assigned", stage=stage, count=len(assignments))
+        except StaleWriteError as e:
+            log_event("assignments_rejected", logging.WARNING, stage=stage, error=str(e))
+            errors.append(f"**The {stage} sheet changed since the preview, please run it again.**")
+        except SheetsBusyError as e:
+            log_event("sheets_busy", logging.WARNING, function="commit_plan", error=str(e))
+            errors.append(f"**Google Sheets is busy, the {stage} assignments were not written.**")
+        except Exception as e:
+            log_event("sheets_error", logging.ERROR, exc_info=e, function="commit_plan")
+            errors.append(f"An error occurred while writing the {stage} assignments.")
+    return written, errors
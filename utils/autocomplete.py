@@ -0,0 +1,61 @@
+import bisect
+from datetime import datetime
+import pytz
+from discord import app_commands
+from utils.sheet_cache import cell_value
+
+MAX_CHOICES = 25  # Discord shows at most 25 autocomplete choices
+
+
+class PrefixIndex:
+    """Snapshot index of the IDs in one column, kept sorted case-insensitively so a prefix is a bisect away.
+
+    Autocomplete answers from it without refreshing the snapshot, so a keystroke never waits on Google.
+    """
+
+    def __init__(self, id_col):
+        self.lock = None
+        self.id_col = id_col
+        self.entries = []  # Sorted [(casefolded ID, row)]
+
+    def rebuild(self, rows):
+        self.entries = sorted((key, row_index) for row_index, values in enumerate(rows[1:], start=2) if (key := self._key(values)))
+
+    def update_row(self, row, old_values, new_values):
+        if row < 2:
+            return
+        old_key, new_key = self._key(old_values), self._key(new_values)
+        if old_key == new_key:
+            return
+        if old_key:
+            i = bisect.bisect_left(self.entries, (old_key, row))
+            if i < len(self.entries) and self.entries[i] == (old_key, row):
+                self.entries.pop(i)
+        if new_key:
+            bisect.insort(self.entries, (new_key, row))
+
+    def _key(self, values):
+        return cell_value(values, self.id_col).strip().casefold()
+
+    def rows(self, prefix, accept=None):
+        """Returns the rows whose ID starts with prefix (case-insensitive) and that accept(row) lets through."""
+        prefix = prefix.strip().casefold()
+        with self.lock:
+            i = bisect.bisect_left(self.entries, (prefix, 0))
+            rows = []
+            while i < len(self.entries) and self.entries[i][0].startswith(prefix):
+                row = self.entries[i][1]
+                if accept is None or accept(row):
+                    rows.append(row)
+                i += 1
+            return rows
+
+
+def choices(records, describe):
+    """Turns records (Lobby/Match) into autocomplete choices, earliest first, labelled by describe(record)."""
+    records = sorted((record for record in records if record and record.start is not None), key=lambda record: record.start)
+    return [app_commands.Choice(name=f"{record.record_id} · {describe(record)}"[:100], value=record.record_id) for record in records[:MAX_CHOICES]]
+
+
+def start_label(record):
+    return datetime.fromtimestamp(record.start, pytz.UTC).strftime("%m/%d/%y %H:%M UTC")
@@ -0,0 +1,76 @@
+import logging
+import csv
+import os
+import threading
+from config import AVAILABILITY_FILE, REFEREE_MAX_ASSIGNMENTS
+from utils.sheet_cache import sheet_timestamp
+from utils.logs import log_event
+
+class Availability:
+    """Referee availability windows and load caps from a headerless id,from,to[,max] CSV, reloaded when the file changes.
+
+    A referee can have several rows, one per window. The last max given wins, REFEREE_MAX_ASSIGNMENTS otherwise.
+    """
+
+    def __init__(self, file_path, default_cap=REFEREE_MAX_ASSIGNMENTS):
+        self.file_path = file_path
+        self.default_cap = default_cap
+        self.windows_by_id = {}  # discord_id -> start-sorted [(start, end)] UTC epochs
+        self.caps_by_id = {}  # discord_id -> max assignments
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """Reloads the file if its mtime changed since the last load."""
+        try:
+            mtime = os.stat(self.file_path).st_mtime
+        except OSError as e:
+            log_event("availability_load_failed", logging.WARNING, path=self.file_path, error=str(e))
+            return
+        if mtime != self._mtime:
+            self.reload(mtime)
+
+    def reload(self, mtime=None):
+        with self._lock:
+            try:
+                windows_by_id = {}
+                caps_by_id = {}
+                with open(self.file_path, mode='r', newline='') as file:
+                    for row in csv.DictReader(file, fieldnames=['id', 'from', 'to', 'max']):
+                        user_id = (row['id'] or "").strip()
+                        start = sheet_timestamp(*_date_time(row['from']))
+                        end = sheet_timestamp(*_date_time(row['to']))
+                        if not user_id or start is None or end is None or end <= start:
+                            continue
+                        windows_by_id.setdefault(user_id, []).append((start, end))
+                        cap = (row['max'] or "").strip()
+                        if cap.isdigit():
+                            caps_by_id[user_id] = int(cap)
+
+                for windows in windows_by_id.values():
+                    windows.sort()
+                self.windows_by_id, self.caps_by_id = windows_by_id, caps_by_id
+                self._mtime = mtime if mtime is not None else os.stat(self.file_path).st_mtime
+                log_event("availability_loaded", referees=len(windows_by_id))
+                return True
+            except Exception as e:
+                log_event("availability_load_failed", logging.WARNING, path=self.file_path, error=str(e))
+                return False
+
+    def referees(self):
+        """Returns {discord_id: (windows, cap)} for every referee with at least one window."""
+        self._refresh()
+        return {user_id: (list(windows), self.caps_by_id.get(user_id, self.default_cap)) for user_id, windows in self.windows_by_id.items()}
+
+
+def is_available(windows, start, end):
+    """Checks whether [start, end) lies inside one of the windows."""
+    return any(window_start <= start and end <= window_end for window_start, window_end in windows)
+
+def _date_time(value):
+    parts = (value or "").strip().split(" ", 1)
+    return parts if len(parts) == 2 else (parts[0], "00:00")
+
+
+# Shared availability, the path is relative to the bot's root directory
+availability = Availability(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), AVAILABILITY_FILE))
@@ -1,10 +1,320 @@
-import gspread
-from config import GOOGLE_SHEETS_CREDENTIALS
-from datetime import datetime, timedelta
+import logging
+import bisect
+from datetime import datetime
 import pytz
+from config import SHEET_CACHE_TTL, STAGES
+from utils.connections import get_stage_worksheet
+from utils.sheet_cache import SheetSnapshot, StaleWriteError, sheet_timestamp, cell_value
+from utils.sheets_client import SheetsBusyError
+from utils.storage import make_backend
+from utils.staff import StaffIndex, claim_cell, drop_cell
+from utils.autocomplete import PrefixIndex
+from utils.metrics import timed
+from utils.logs import log_event
 
-gc = gspread.service_account(filename=GOOGLE_SHEETS_CREDENTIALS)
-sheet = gc.open("SST3 Ref Sheet")
+COLUMNS = STAGES["bracket"]["columns"]  # BSchedule layout, see config.STAGES
+STAFF_COLUMNS = STAGES["bracket"]["staff"]
+MATCH_SECONDS = STAGES["bracket"]["match_minutes"] * 60
 
 def get_worksheet():
-    return sheet.worksheet("BSchedule")
\ No newline at end of file
+    return get_stage_worksheet("bracket")
+
+
+class Match:
+    """One BSchedule row, parsed once per snapshot."""
+
+    __slots__ = ("row", "match_id", "start", "teams", "staff", "finished", "pinged")
+
+    def __init__(self, row, values):
+        self.row = row
+        self.match_id = cell_value(values, COLUMNS["match_id"]).strip()
+        self.start = sheet_timestamp(cell_value(values, COLUMNS["date"]).strip(), cell_value(values, COLUMNS["time"]).strip())  # UTC epoch, None if unparsable
+        self.teams = tuple(team for team in (cell_value(values, COLUMNS["team1"]).strip(), cell_value(values, COLUMNS["team2"]).strip()) if team)
+        self.staff = {role: cell_value(values, col).strip() for role, col in STAFF_COLUMNS.items()}  # role -> assigned staff ID
+        self.finished = bool(cell_value(values, COLUMNS["score1"]).strip() or cell_value(values, COLUMNS["score2"]).strip())  # A result was entered
+        self.pinged = cell_value(values, COLUMNS["pinged"]).strip() not in ("", "0")
+
+    @property
+    def record_id(self):
+        return self.match_id
+
+    @property
+    def end(self):
+        return self.start + MATCH_SECONDS
+
+    @property
+    def discord_timestamp(self):
+        return f"<t:{self.start}:F>"
+
+    def opponent(self, team):
+        """Returns the other team of the match, or None if team isn't playing it."""
+        if team not in self.teams or len(self.teams) != 2:
+            return None
+        return self.teams[1] if self.teams[0] == team else self.teams[0]
+
+
+class IntervalIndex:
+    """key -> start-sorted [(start, row)] of fixed-length intervals, answers which ones overlap a time range."""
+
+    def __init__(self, length):
+        self.length = length  # Every interval is [start, start + length)
+        self.by_key = {}
+
+    def add(self, key, start, row):
+        bisect.insort(self.by_key.setdefault(key, []), (start, row))
+
+    def remove(self, key, start, row):
+        intervals = self.by_key.get(key)
+        if not intervals:
+            return
+        i = bisect.bisect_left(intervals, (start, row))
+        if i < len(intervals) and intervals[i] == (start, row):
+            intervals.pop(i)
+        if not intervals:
+            del self.by_key[key]
+
+    def overlapping(self, key, start, end):
+        """Returns the rows of key whose interval overlaps [start, end)."""
+        intervals = self.by_key.get(key, [])
+        # An interval overlaps when it starts after start - length and before end
+        i = bisect.bisect_right(intervals, (start - self.length, float("inf")))
+        rows = []
+        while i < len(intervals) and intervals[i][0] < end:
+            rows.append(intervals[i][1])
+            i += 1
+        return rows
+
+
+class MatchTable:
+    """Snapshot index of BSchedule: a Match per row, match ID lookup and per-team / per-staff interval indexes."""
+
+    def __init__(self):
+        self.lock = None
+        self.by_row = {}  # row -> Match
+        self.by_id = {}  # match_id -> Match
+        self.team_intervals = IntervalIndex(MATCH_SECONDS)  # team -> matches
+        self.staff_intervals = IntervalIndex(MATCH_SECONDS)  # staff ID -> matches, whatever the role
+        self.team_upcoming = IntervalIndex(MATCH_SECONDS)  # team -> matches without a result yet
+
+    def rebuild(self, rows):
+        self.by_row, self.by_id = {}, {}
+        self.team_intervals = IntervalIndex(MATCH_SECONDS)
+        self.staff_intervals = IntervalIndex(MATCH_SECONDS)
+        self.team_upcoming = IntervalIndex(MATCH_SECONDS)
+        for row_index, values in enumerate(rows[1:], start=2):
+            self._add(Match(row_index, values))
+
+    def update_row(self, row, old_values, new_values):
+        if row < 2:
+            return
+        old_match = self.by_row.pop(row, None)
+        if old_match:
+            self._remove(old_match)
+        self._add(Match(row, new_values))
+
+    def _add(self, match):
+        if not match.match_id:
+            return
+        self.by_row[match.row] = match
+        self.by_id.setdefault(match.match_id, match)
+        if match.start is None:
+            return
+        for team in match.teams:
+            self.team_intervals.add(team, match.start, match.row)
+            if not match.finished:
+                self.team_upcoming.add(team, match.start, match.row)
+        for staff_id in set(match.staff.values()):
+            if staff_id:
+                self.staff_intervals.add(staff_id, match.start, match.row)
+
+    def _remove(self, match):
+        if self.by_id.get(match.match_id) is match:
+            del self.by_id[match.match_id]
+        if match.start is None:
+            return
+        for team in match.teams:
+            self.team_intervals.remove(team, match.start, match.row)
+            self.team_upcoming.remove(team, match.start, match.row)
+        for staff_id in set(match.staff.values()):
+            if staff_id:
+                self.staff_intervals.remove(staff_id, match.start, match.row)
+
+    def get(self, match_id):
+        return self.by_id.get(match_id.strip())
+
+    def upcoming_for_team(self, team, now, limit=None):
+        """Returns the team's matches without a result that haven't ended before now, earliest first."""
+        with self.lock:
+            intervals = self.team_upcoming.by_key.get(team, [])
+            i = bisect.bisect_right(intervals, (now - MATCH_SECONDS, float("inf")))  # Skip matches that already ended
+            rows = [row for _, row in intervals[i:i + limit if limit else None]]
+            return [self.by_row[row] for row in rows]
+
+    def find_conflicts(self, match, new_start):
+        """Returns [(who, other Match)] for every match of the same teams or staff overlapping match moved to new_start."""
+        with self.lock:
+            conflicts = []
+            seen = set()
+            keys = [(self.team_intervals, team, team) for team in match.teams]
+            keys += [(self.staff_intervals, staff_id, f"<@{staff_id}> ({role})") for role, staff_id in match.staff.items() if staff_id]
+            for index, key, who in keys:
+                for row in index.overlapping(key, new_start, new_start + MATCH_SECONDS):
+                    if row != match.row and (row, who) not in seen:
+                        seen.add((row, who))
+                        conflicts.append((who, self.by_row[row]))
+            return conflicts
+
+
+# Shared snapshot of the BSchedule grid
+bschedule = SheetSnapshot(make_backend("bracket"), ttl=SHEET_CACHE_TTL)
+match_table = bschedule.add_index(MatchTable())
+staff_index = bschedule.add_index(StaffIndex(COLUMNS["match_id"], STAFF_COLUMNS))  # Unassigned matches per role and claims per staff member
+match_ids = bschedule.add_index(PrefixIndex(COLUMNS["match_id"]))  # Match IDs by prefix for autocomplete
+
+@timed
+def get_match(match_id, refresh=True):
+    """Returns the Match with this ID from the snapshot, refreshing it first if it expired."""
+    if refresh:
+        bschedule.get()
+    return match_table.get(match_id)
+
+def format_conflicts(conflicts):
+    return "\n".join(f"- {who} already plays/works **{other.match_id}** at {other.discord_timestamp}" for who, other in conflicts)
+
+@timed
+def reschedule_match(match_id, new_start, expected_start):
+    """Moves a match to new_start if it still starts at expected_start and nobody involved is busy then."""
+    try:
+        bschedule.get()
+        match = match_table.get(match_id)
+        if not match:
+            return False, "**Match not found.**"
+        if match.start != expected_start:
+            return False, "**The match was moved since this reschedule was proposed.**"
+
+        conflicts = match_table.find_conflicts(match, new_start)
+        if conflicts:
+            return False, f"**The new time overlaps other matches:**\n{format_conflicts(conflicts)}"
+
+        new_datetime = datetime.fromtimestamp(new_start, pytz.UTC)
+        with bschedule.batch() as batch:  # Date and time change together in one request
+            batch.set(match.row, COLUMNS["date"], new_datetime.strftime("%m/%d/%y"))
+            batch.set(match.row, COLUMNS["time"], new_datetime.strftime("%H:%M"))
+            batch.expect(match.row, COLUMNS["date"], bschedule.value(match.row, COLUMNS["date"]))
+            batch.expect(match.row, COLUMNS["time"], bschedule.value(match.row, COLUMNS["time"]))
+
+        log_event("match_rescheduled", match_id=match_id, start=int(new_datetime.timestamp()))
+        return True, None
+
+    except StaleWriteError as e:
+        log_event("match_reschedule_rejected", logging.WARNING, match_id=match_id, error=str(e))
+        return False, "**The match changed on the sheet, please propose the reschedule again.**"
+    except SheetsBusyError as e:
+        log_event("sheets_busy", logging.WARNING, function="reschedule_match", error=str(e))
+        return False, "**Google Sheets is busy right now, please try again in a minute.**"
+    except Exception as e:
+        log_event("sheets_error", logging.ERROR, exc_info=e, function="reschedule_match")
+        return False, "An error occurred while rescheduling the match."
+
+
+def staff_conflicts(match, staff_id):
+    """Returns the other matches staff_id already works that overlap match, whatever the role."""
+    with match_table.lock:
+        rows = match_table.staff_intervals.overlapping(str(staff_id), match.start, match.end)
+        return [match_table.by_row[row] for row in rows if row != match.row]
+
+@timed
+def claim_match(match_id, role, staff_id):
+    """Assigns staff_id to role of a match if the role is still free and they work no overlapping match."""
+    try:
+        bschedule.get()
+        match = match_table.get(match_id)
+        if not match:
+            return False, "**Match not found.**"
+        if match.start is None:
+            return False, "**Invalid date or time format in the sheet.**"
+        if match.finished or match.end <= datetime.now(pytz.UTC).timestamp():
+            return False, "**This match is already over.**"
+        if match.staff.get(role) == str(staff_id):
+            return False, f"**You are already the {role} of this match.**"
+        if match.staff.get(role):
+            return False, f"**This match already has a {role}.**"
+
+        conflicts = staff_conflicts(match, staff_id)
+        if conflicts:
+            busy = "\n".join(f"- **{other.match_id}** at {other.discord_timestamp}" for other in conflicts)
+            return False, f"**You already work an overlapping match:**\n{busy}"
+
+        claim_cell(bschedule, match.row, STAFF_COLUMNS[role], staff_id)
+        log_event("match_claimed", match_id=match_id, role=role, staff=staff_id)
+        return True, None
+
+    except StaleWriteError as e:
+        log_event("match_claim_rejected", logging.WARNING, match_id=match_id, role=role, staff=staff_id, error=str(e))
+        return False, f"**Someone else just claimed the {role} of this match.**"
+    except SheetsBusyError as e:
+        log_event("sheets_busy", logging.WARNING, function="claim_match", error=str(e))
+        return False, "**Google Sheets is busy right now, please try again in a minute.**"
+    except Exception as e:
+        log_event("sheets_error", logging.ERROR, exc_info=e, function="claim_match")
+        return False, "An error occurred while claiming the match."
+
+@timed
+def drop_match(match_id, role, staff_id):
+    """Removes staff_id from role of a match if they still hold it on the sheet."""
+    try:
+        bschedule.get()
+        match = match_table.get(match_id)
+        if not match:
+            return False, "**Match not found.**"
+        if match.staff.get(role) != str(staff_id):
+            return False, f"**You are not the {role} of this match.**"
+
+        drop_cell(bschedule, match.row, STAFF_COLUMNS[role], staff_id)
+        log_event("match_dropped", match_id=match_id, role=role, staff=staff_id)
+        return True, None
+
+    except StaleWriteError as e:
+        log_event("match_drop_rejected", logging.WARNING, match_id=match_id, role=role, staff=staff_id, error=str(e))
+        return False, f"**The {role} of this match changed on the sheet.**"
+    except SheetsBusyError as e:
+        log_event("sheets_busy", logging.WARNING, function="drop_match", error=str(e))
+        return False, "**Google Sheets is busy right now, please try again in a minute.**"
+    except Exception as e:
+        log_event("sheets_error", logging.ERROR, exc_info=e, function="drop_match")
+        return False, "An error occurred while dropping the match."
+
+@timed
+def find_matches(query, refresh=True):
+    """Returns the matches without a result that satisfy query, in its sort order.
+
+    Conditions like referee=empty start from the role's unassigned set instead of every match.
+    """
+    if refresh:
+        bschedule.get()
+    with match_table.lock:
+        if query.unassigned_roles:
+            rows = set.intersection(*(staff_index.unassigned.get(role, set()) for role in query.unassigned_roles))
+        else:
+            rows = match_table.by_row.keys()
+        candidates = [match_table.by_row[row] for row in rows if row in match_table.by_row]
+    return query.run([match for match in candidates if match.start is not None and not match.finished])
+
+@timed
+def get_claimed_matches(staff_id, refresh=True):
+    """Returns [(role, Match)] for every match staff_id works, earliest first."""
+    if refresh:
+        bschedule.get()
+    with match_table.lock:
+        claims = [(role, match_table.by_row.get(row)) for row, role in staff_index.claims.get(str(staff_id), ())]
+    claims = [(role, match) for role, match in claims if match and match.start is not None]
+    return sorted(claims, key=lambda claim: (claim[1].start, claim[1].row))
+
+@timed
+def mark_pinged(notifications):
+    """Sets the pinged flag of every delivered match ping in one request, skipping rows that no longer hold their match."""
+    bschedule.get()
+    with bschedule.batch() as batch:
+        for notification in notifications:
+            if bschedule.value(notification.row, COLUMNS["match_id"]).strip() == notification.record_id:
+                batch.set(notification.row, COLUMNS["pinged"], 1)
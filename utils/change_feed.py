@@ -0,0 +1,47 @@
+import logging
+import asyncio
+from utils.sheet_executor import run_sheet
+from utils.logs import log_event
+
+
+class ChangeFeed:
+    """Detects edits to a spreadsheet and refreshes its snapshot only when something actually changed.
+
+    The default probe asks the snapshot's backend for its modified marker, for Google Sheets that is the Drive
+    modifiedTime, a metadata call that costs no Sheets read quota. Index updates reach the rest of the bot through
+    the snapshot's indexes, which are fed the diff of every refresh.
+    """
+
+    def __init__(self, snapshot, interval, probe=None):
+        self.snapshot = snapshot
+        self.interval = interval  # Seconds between probes
+        self.probe = probe or snapshot.backend.modified_marker
+        self._last_modified = None
+        self._task = None
+
+    def poll(self):
+        """Probes the sheet and refreshes the snapshot if it changed. Blocking, returns True if it re-fetched."""
+        modified = self.probe()
+        if modified != self._last_modified or not self.snapshot.version:
+            self.snapshot.refresh()
+            self._last_modified = modified
+            return True
+        self.snapshot.touch()  # Nothing changed, keep serving the snapshot without a TTL re-fetch
+        return False
+
+    async def run(self):
+        while True:
+            try:
+                await run_sheet(self.poll)
+            except Exception as e:
+                log_event("change_probe_failed", logging.WARNING, error=str(e))
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,80 @@
+import logging
+import threading
+import time
+import gspread
+import requests
+from config import GOOGLE_SHEETS_CREDENTIALS, SHEETS_MAX_WORKERS, STAGES
+from utils import metrics
+from utils.logs import log_event
+
+# One authorized session for every cog, opened on first use instead of at import
+_client = None
+_spreadsheets = {}  # spreadsheet ID -> gspread.Spreadsheet
+_spreadsheet_ids = {}  # spreadsheet name or key from config -> spreadsheet ID
+_worksheets = {}  # (spreadsheet ID, tab name) -> gspread.Worksheet
+_lock = threading.RLock()
+
+# Seconds spent on each startup phase, filled in as they complete
+startup_timings = {}
+
+def get_client():
+    """Returns the shared gspread client, authorizing the service account on first use."""
+    global _client
+    with _lock:
+        if _client is None:
+            started = time.perf_counter()
+            client = gspread.service_account(filename=GOOGLE_SHEETS_CREDENTIALS)
+            # Keep one keep-alive connection per sheets worker instead of requests' default pool of 10
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=SHEETS_MAX_WORKERS)
+            client.http_client.session.mount("https://", adapter)
+            client.http_client.session.hooks["response"].append(metrics.record_response)  # Bytes to and from Google
+            _client = client
+            startup_timings.setdefault("google_auth", time.perf_counter() - started)
+        return _client
+
+def open_spreadsheet(name=None, key=None):
+    """Returns the spreadsheet handle for a name or key, opening it on first use.
+
+    Opening by key skips the Drive search that opening by name needs.
+    """
+    lookup = key or name
+    with _lock:
+        spreadsheet_id = _spreadsheet_ids.get(lookup)
+        if spreadsheet_id:
+            return _spreadsheets[spreadsheet_id]
+
+        client = get_client()
+        started = time.perf_counter()
+        spreadsheet = client.open_by_key(key) if key else client.open(name)
+        _spreadsheets.setdefault(spreadsheet.id, spreadsheet)
+        _spreadsheet_ids[lookup] = spreadsheet.id
+        startup_timings.setdefault(f"open {lookup}", time.perf_counter() - started)
+        return _spreadsheets[spreadsheet.id]
+
+def get_stage_worksheet(stage):
+    """Returns the worksheet configured for a tournament stage in config.STAGES, resolved once and cached."""
+    config = STAGES[stage]
+    spreadsheet = open_spreadsheet(name=config.get("spreadsheet"), key=config.get("spreadsheet_key"))
+    cache_key = (spreadsheet.id, config["worksheet"])
+    worksheet = _worksheets.get(cache_key)
+    if worksheet is None:
+        with _lock:
+            worksheet = _worksheets.get(cache_key)
+            if worksheet is None:
+                worksheet = _worksheets[cache_key] = spreadsheet.worksheet(config["worksheet"])
+    return worksheet
+
+def forget_worksheet(stage):
+    """Drops a cached worksheet handle, e.g. after the tab was renamed, so the next use resolves it again."""
+    config = STAGES[stage]
+    with _lock:
+        spreadsheet_id = _spreadsheet_ids.get(config.get("spreadsheet_key") or config.get("spreadsheet"))
+        _worksheets.pop((spreadsheet_id, config["worksheet"]), None)
+
+def warm_up(stages):
+    """Opens the worksheet of every stage ahead of the first command. Blocking, run it on the sheets pool."""
+    for stage in stages:
+        try:
+            get_stage_worksheet(stage)
+        except Exception as e:
+            log_event("sheet_open_failed", logging.WARNING, stage=stage, error=str(e))
@@ -1,91 +1,222 @@
+import logging
 import gspread
-from config import GOOGLE_SHEETS_CREDENTIALS
+from config import SHEET_CACHE_TTL, STAGES
 from datetime import datetime, timedelta
 import pytz
-
-gc = gspread.service_account(filename=GOOGLE_SHEETS_CREDENTIALS)
-sheet = gc.open("MBB7 // Ref Sheet")
+import heapq
+import threading
+from utils.sheet_cache import SheetSnapshot, StaleWriteError, cell_value
+from utils.storage import make_backend
+from utils.sheets_client import SheetsBusyError
+from utils.lobbies import LobbyTable
+from utils.lobby_query import parse_conditions
+from utils.staff import StaffIndex, claim_cell, drop_cell
+from utils.autocomplete import PrefixIndex
+from utils.metrics import timed
+from utils.logs import log_event
+
+from utils.connections import get_stage_worksheet
 
 def get_worksheet():
-    return sheet.worksheet("QSchedule")
-
+    return get_stage_worksheet("qualifiers")
+
+class QScheduleIndex:
+    """In-memory lookups over the QSchedule snapshot: lobby ID and team name."""
+
+    def __init__(self):
+        self.lock = None  # Set to the snapshot lock by SheetSnapshot.add_index
+        self.lobby_rows = {}  # lobby_id -> row (column H)
+        self.team_slots = {}  # team -> (row, col) (columns M-Q)
+
+    def rebuild(self, rows):
+        self.lobby_rows, self.team_slots = {}, {}
+        for row_index, values in enumerate(rows[1:], start=2):  # Row 1 is the header
+            self._add(row_index, values, replace=False)
+
+    def update_row(self, row, old_values, new_values):
+        if row < 2:
+            return
+        self._remove(row, old_values)
+        self._add(row, new_values, replace=True)
+
+    def _add(self, row, values, replace):
+        # A rebuild keeps the first occurrence like a top-down scan, a patch points the key at the cell just written
+        lobby_id = cell_value(values, 8)
+        if lobby_id and (replace or lobby_id not in self.lobby_rows):
+            self.lobby_rows[lobby_id] = row
+        for col in range(13, 18):  # Columns M (13) to Q (17)
+            team = cell_value(values, col).strip()
+            if team and (replace or team not in self.team_slots):
+                self.team_slots[team] = (row, col)
+
+    def _remove(self, row, values):
+        lobby_id = cell_value(values, 8)
+        if self.lobby_rows.get(lobby_id) == row:
+            del self.lobby_rows[lobby_id]
+        for col in range(13, 18):
+            team = cell_value(values, col).strip()
+            if self.team_slots.get(team) == (row, col):
+                del self.team_slots[team]
+
+    def lobby_row(self, lobby_id):
+        return self.lobby_rows.get(lobby_id)
+
+    def team_slot(self, team):
+        return self.team_slots.get(team.strip())
+
+
+class LobbyAllocator:
+    """Snapshot index for /qmake: the next lobby number, the free rows and the open lobbies per (date, time).
+
+    The lobby counter only ever grows, a deleted X<n> is never handed out again.
+    """
+
+    def __init__(self):
+        self.lock = None
+        self.last_number = 0  # Highest X<n> ever seen
+        self.free_rows = set()  # Rows without a lobby ID (column H)
+        self._free_heap = []  # Same rows for lowest-first pops, may hold rows that were taken since (skipped lazily)
+        self.open_lobbies = {}  # (date, time) -> {row: lobby_id} of lobbies with an empty team slot
+
+    def rebuild(self, rows):
+        self.free_rows, self._free_heap, self.open_lobbies = set(), [], {}
+        for row_index, values in enumerate(rows[1:], start=2):
+            self._add(row_index, values)
+
+    def update_row(self, row, old_values, new_values):
+        if row < 2:
+            return
+        self._remove(row, old_values)
+        self._add(row, new_values)
+
+    def _add(self, row, values):
+        lobby_id = cell_value(values, 8)
+        if not lobby_id:
+            if row not in self.free_rows:
+                self.free_rows.add(row)
+                heapq.heappush(self._free_heap, row)
+            return
+        if lobby_id.startswith("X") and lobby_id[1:].isdigit():
+            self.last_number = max(self.last_number, int(lobby_id[1:]))
+        if any(not cell_value(values, col) for col in range(13, 18)):  # Columns M-Q
+            self.open_lobbies.setdefault((cell_value(values, 9), cell_value(values, 10)), {})[row] = lobby_id
+
+    def _remove(self, row, values):
+        self.free_rows.discard(row)
+        lobbies = self.open_lobbies.get((cell_value(values, 9), cell_value(values, 10)))
+        if lobbies:
+            lobbies.pop(row, None)
+            if not lobbies:
+                del self.open_lobbies[(cell_value(values, 9), cell_value(values, 10))]
+
+    def open_lobby(self, date, time):
+        """Returns the ID of a lobby at date/time that still has a free slot, or None."""
+        with self.lock:
+            lobbies = self.open_lobbies.get((date, time))
+            return next(iter(lobbies.values())) if lobbies else None
+
+    def next_slot(self):
+        """Returns (first free row, next lobby ID), the row is None when the sheet is full."""
+        with self.lock:
+            while self._free_heap and self._free_heap[0] not in self.free_rows:
+                heapq.heappop(self._free_heap)
+            return (self._free_heap[0] if self._free_heap else None), f"X{self.last_number + 1}"
+
+
+# Shared snapshot of the QSchedule grid, every read below is answered from it
+qschedule = SheetSnapshot(make_backend("qualifiers"), ttl=SHEET_CACHE_TTL)
+qschedule_index = qschedule.add_index(QScheduleIndex())
+lobby_table = qschedule.add_index(LobbyTable(STAGES["qualifiers"]["staff"]))  # Typed Lobby records, re-parsed only for changed rows
+staff_index = qschedule.add_index(StaffIndex(8, STAGES["qualifiers"]["staff"]))  # Referee claims per lobby and per referee
+lobby_allocator = qschedule.add_index(LobbyAllocator())  # Free rows and lobby numbers for /qmake
+lobby_ids = qschedule.add_index(PrefixIndex(8))  # Lobby IDs by prefix for autocomplete
+_create_lock = threading.Lock()  # Serializes /qmake so two calls never pick the same row or ID
+REFEREE_COLUMN = STAGES["qualifiers"]["staff"]["referee"]
+
+@timed
+def find_lobby_row(lobby_id):
+    """Returns the row of a lobby ID in column H of the qualifiers snapshot, or None."""
+    return qschedule_index.lobby_row(lobby_id)
+
+@timed
+def get_team_lobby(discord_nickname, refresh=True):
+    """Returns the lobby ID the team is currently signed up for, or None."""
+    if refresh:
+        qschedule.get()
+    team_slot = qschedule_index.team_slot(discord_nickname)
+    if not team_slot:
+        return None
+    return qschedule.value(team_slot[0], 8) or None
+
+@timed
 def update_sheet(discord_nickname, lobby_id):
     """Updates Google Sheets with the user’s scheduled lobby."""
     try:
-        worksheet = sheet.worksheet("QSchedule")
+        snapshot = qschedule.get()
 
         # Step 1: Try to find the old lobby the player is in (if there's one)
         old_lobby_cell = None  # Variable to store the old lobby cell if the user is found
         old_lobby_column = None  # Variable to store the column where the player is found
-        for team_row_index, team_row in enumerate(worksheet.get_all_values(), start=1):  # Start from row 1 if data starts there
-            for col in range(12, 17):  # Columns M (12) to Q (16)
-                # Compare nickname with value in M-Q, removing extra spaces from both
-                if discord_nickname.strip() == team_row[col - 1].strip():  # Strip any leading/trailing spaces
-                    # Found the player's current cell in the old lobby, save it
-                    print(f"Found {discord_nickname} in old lobby (row {team_row_index}, column {chr(col + 64)}).")
-                    old_lobby_cell = f"{chr(col + 64)}{team_row_index}"  # Save the exact cell address (e.g., 'M5')
-                    old_lobby_column = col  # Save the column for clearing
-                    break  # Exit the loop once the player is found in the old lobby
-            if old_lobby_cell:
-                break  # Exit outer loop once the player is found
+        old_lobby_row = None  # Variable to store the row where the player is found
+        team_slot = qschedule_index.team_slot(discord_nickname)  # Team name -> (row, col) in M-Q
+        if team_slot:
+            # Found the player's current cell in the old lobby, save it
+            old_lobby_row, old_lobby_column = team_slot
+            old_lobby_cell = gspread.utils.rowcol_to_a1(old_lobby_row, old_lobby_column)  # Save the exact cell address (e.g., 'M5')
+            log_event("old_lobby_found", team=discord_nickname, cell=old_lobby_cell)
 
         # Step 2: Check if the lobby exists and retrieve necessary data
-        cell = worksheet.find(lobby_id)
-        if not cell:
+        row = find_lobby_row(lobby_id)
+        if not row:
             return False, "**Lobby not found.**"
-        
-        row = cell.row
-        print(f"row {row}")
-        date_cell = worksheet.cell(row, 9)
-        time_cell = worksheet.cell(row, 10)
-        current_datetime = datetime.now(pytz.UTC)
-
-        try:
-            # Parse date and time correctly
-            date_value = datetime.strptime(date_cell.value, "%m/%d/%y").date()
-            time_value = datetime.strptime(time_cell.value, "%H:%M").time()  # Parses 'HH:MM' format
 
-            # Combine into a full datetime
-            combined_datetime = datetime.combine(date_value, time_value).replace(tzinfo=pytz.UTC)
+        lobby = lobby_table.get(row)
 
-            # Compare to ensure it's not a past date/time
-            if combined_datetime < current_datetime:
-                return False, "**The scheduled time for this lobby is earlier than current time.**"
-
-        except ValueError:
+        # The start time was parsed once when the row was loaded
+        if lobby.start is None:
             return False, "**Invalid date or time format in the sheet.**"
 
+        # Compare to ensure it's not a past date/time
+        if lobby.start < datetime.now(pytz.UTC).timestamp():
+            return False, "**The scheduled time for this lobby is earlier than current time.**"
+
         # Track if the user was added successfully to the new lobby
         added_to_new_lobby = False
 
         # Step 3: Try to find and update the new lobby
-        team_cells = worksheet.range(f"M{row}:Q{row}")  # Ensure using the correct row value (row is dynamic)
-        for cell in team_cells:
-            if not cell.value:  # Find the first empty cell
-                worksheet.update(cell.address, [[discord_nickname]])  # Update the cell with the user's nickname as a list
-                added_to_new_lobby = True  # Set the flag to indicate the user was added
-                break  # Exit the loop once added
+        batch = snapshot.batch()  # New slot and old slot are written in one request
+        col = lobby.first_free_slot  # First empty cell in M-Q, from the slot bitmask
+        if col:
+            batch.set(row, col, discord_nickname)
+            batch.expect(row, col, "")  # Nobody else took the slot since the snapshot was read
+            added_to_new_lobby = True  # Set the flag to indicate the user was added
 
         # Step 4: If the user was successfully added to the new lobby, now remove the player from the old lobby
         if added_to_new_lobby:
             # Step 5: Clear the old lobby cell if it exists
             if old_lobby_cell:
-                # Clear the old lobby cell using batch_clear
-                worksheet.batch_clear([old_lobby_cell])  # Clears the contents of the specified cell
-                print(f"❌ Removed {discord_nickname} from old lobby: {old_lobby_cell}.")
-            else:
-                print(f"❌ No old lobby entry found for {discord_nickname}.")
+                batch.clear(old_lobby_row, old_lobby_column)
+                batch.expect(old_lobby_row, old_lobby_column, discord_nickname)
+            batch.commit()  # Write through to the sheet and the snapshot
+            log_event("lobby_signup", team=discord_nickname, lobby_id=lobby_id, row=row, col=col, old_cell=old_lobby_cell)
 
 
             return True, None  # Return success after the update
         
         return False, "**Lobby not found or full.**"  # If the user wasn't added to the new lobby
         
+    except StaleWriteError as e:
+        log_event("lobby_signup_rejected", logging.WARNING, team=discord_nickname, lobby_id=lobby_id, error=str(e))
+        return False, "**The lobby changed while you were signing up, please try again.**"
+    except SheetsBusyError as e:
+        log_event("sheets_busy", logging.WARNING, function="update_sheet", error=str(e))
+        return False, "**Google Sheets is busy right now, please try again in a minute.**"
     except Exception as e:
-        print(f"⚠️ Google Sheets Error: {e}")
+        log_event("sheets_error", logging.ERROR, exc_info=e, function="update_sheet")
         return False, "An error occurred while updating the sheet."
 
 
+@timed
 def create_lobby(date, time):
     """Creates a new qualifiers lobby with the next available identifier."""
     try:
@@ -101,217 +232,162 @@ def create_lobby(date, time):
         if input_datetime_utc < current_datetime + timedelta(hours=6):
             return None, "**The date must be at least 6 hours from the current time.**"
         
-        start_date = datetime(2025, 4, 14, 12, 0, tzinfo=pytz.UTC)
-        end_date = datetime(2025, 4, 21, 12, 0, tzinfo=pytz.UTC)
+        start_date, end_date = (pytz.utc.localize(datetime.strptime(bound, "%m/%d/%y %H:%M")) for bound in STAGES["qualifiers"]["lobby_window"])
         
         if not (start_date <= input_datetime_utc <= end_date):
             return None, f"The date must be between** {start_date.strftime('%m/%d/%y %H:%M')} and {end_date.strftime('%m/%d/%y %H:%M')}.**"
         
-        worksheet = sheet.worksheet("QSchedule")
-        date_cells = worksheet.range("I2:I")  
-        time_cells = worksheet.range("J2:J")  
-        
-        for date_cell, time_cell in zip(date_cells, time_cells):
-            if date_cell.value == input_datetime.strftime("%m/%d/%y") and time_cell.value == time:
-                row = date_cell.row
-                team_cells = worksheet.range(f"M{row}:Q{row}")
-                
-                for team_cell in team_cells:
-                    if not team_cell.value:
-                        lobby_id = worksheet.cell(row, 8).value  
-                        return None, f"**Lobby at this time already exists: {lobby_id}**"
-        
-        lobby_cells = worksheet.range("H2:H")
-        last_lobby_number = 0
-        for cell in lobby_cells:
-            if cell.value and cell.value.startswith("X"):
-                try:
-                    lobby_num = int(cell.value[1:])
-                    if lobby_num > last_lobby_number:
-                        last_lobby_number = lobby_num
-                except ValueError:
-                    continue
-        
-        new_lobby_id = f"X{last_lobby_number + 1}"
-        
-        for cell in lobby_cells:
-            if not cell.value:
-                row = cell.row
-                formatted_date_str = input_datetime_utc.strftime("%m/%d/%y")
-                
-                worksheet.update(f"H{row}", [[new_lobby_id]])
-                worksheet.update(f"I{row}", [[formatted_date_str]])
-                worksheet.update(f"J{row}", [[time]])
-                
-                timestamp = int(input_datetime_utc.timestamp())
-                discord_timestamp = f"<t:{timestamp}:F>"
-                
-                print(f"✅ Created new lobby {new_lobby_id} on {formatted_date_str} at {time}. Timestamp for Discord: {discord_timestamp}")
-                return new_lobby_id, None
-        
-        return None, "**No available space for a new lobby.**"
+        snapshot = qschedule.get()
+        formatted_date_str = input_datetime_utc.strftime("%m/%d/%y")
+
+        with _create_lock:  # The check, the row and the ID stay valid until the write has patched the snapshot
+            lobby_id = lobby_allocator.open_lobby(formatted_date_str, time)
+            if lobby_id:
+                return None, f"**Lobby at this time already exists: {lobby_id}**"
+
+            row, new_lobby_id = lobby_allocator.next_slot()
+            if row is None:
+                return None, "**No available space for a new lobby.**"
+
+            with snapshot.batch() as batch:  # H, I and J are written in one request
+                batch.set(row, 8, new_lobby_id)
+                batch.expect(row, 8, "")  # The row is still free on the sheet
+                batch.set(row, 9, formatted_date_str)
+                batch.set(row, 10, time)
+
+        log_event("lobby_created", lobby_id=new_lobby_id, row=row, start=int(input_datetime_utc.timestamp()))
+        return new_lobby_id, None
+    except StaleWriteError as e:
+        log_event("lobby_create_rejected", logging.WARNING, error=str(e))
+        return None, "**The sheet changed while the lobby was being created, please try again.**"
+    except SheetsBusyError as e:
+        log_event("sheets_busy", logging.WARNING, function="create_lobby", error=str(e))
+        return None, "**Google Sheets is busy right now, please try again in a minute.**"
     except Exception as e:
-        print(f"⚠️ Google Sheets Error: {e}")
+        log_event("sheets_error", logging.ERROR, exc_info=e, function="create_lobby")
         return None, "An error occurred while creating the lobby."
     
+@timed
 def get_lobbies(condition):
-    """Fetches upcoming lobbies based on the given condition: 'empty' for no referee, 'free' for at least one empty team slot."""
+    """Fetches upcoming lobbies matching the conditions, see lobby_query.parse_conditions ('referee=empty', 'free', ...)."""
     try:
-        worksheet = sheet.worksheet("QSchedule")
-        lobby_cells = worksheet.range("H2:H")
-        date_cells = worksheet.range("I2:I")
-        time_cells = worksheet.range("J2:J")
-        referee_cells = worksheet.range("K2:K")
-        team_cells = worksheet.range("M2:Q")  # Range of cells for the team slots
-
-        upcoming_lobbies = []
-        current_time = datetime.now(pytz.UTC)
-
-        # Iterate over the lobbies
-        for i, (lobby_cell, date_cell, time_cell, referee_cell) in enumerate(zip(lobby_cells, date_cells, time_cells, referee_cells)):
-            # Determine which slice of team_cells corresponds to this row
-            row_start = i * 5  # 5 team cells per row
-            team_cell_range = team_cells[row_start:row_start + 5]  # Get 5 consecutive cells for each lobby
-
-            if not lobby_cell.value or not date_cell.value or not time_cell.value:
-                continue
-
-            try:
-                lobby_datetime = datetime.strptime(f"{date_cell.value} {time_cell.value}", "%m/%d/%y %H:%M").replace(tzinfo=pytz.UTC)
-                if lobby_datetime < current_time:
-                    continue  # Skip past lobbies
-            except ValueError:
-                continue
-
-            # Handle the 'referee=empty' condition (no referee assigned)
-            if condition == "referee=empty" and not referee_cell.value:
-                discord_timestamp = f"<t:{int(lobby_datetime.timestamp())}:F>"
-                upcoming_lobbies.append((lobby_cell.value, discord_timestamp))
-                print(f"Lobby found: {lobby_cell.value}")  # Debugging log
-
-            # Handle the 'free' condition (at least one empty team slot)
-            elif condition == "free" and any(not cell.value for cell in team_cell_range):
-                discord_timestamp = f"<t:{int(lobby_datetime.timestamp())}:F>"
-                upcoming_lobbies.append((lobby_cell.value, discord_timestamp))
-                print(f"Lobby found: {lobby_cell.value}")  # Debugging log
-
-            # Handle the 'needs ref' condition (at least one team filled and no referee assigned)
-            elif condition == "referee=needed" and any(cell.value for cell in team_cell_range) and not referee_cell.value:
-                discord_timestamp = f"<t:{int(lobby_datetime.timestamp())}:F>"
-                upcoming_lobbies.append((lobby_cell.value, discord_timestamp))
-                print(f"Lobby found (needs referee): {lobby_cell.value}")  # Debugging log
-
-        return upcoming_lobbies
+        return [(lobby.lobby_id, lobby.discord_timestamp) for lobby in find_lobbies(parse_conditions(condition, STAGES["qualifiers"]["staff"]))]
 
     except Exception as e:
-        print(f"⚠️ Google Sheets Error: {e}")
+        log_event("sheets_error", logging.ERROR, exc_info=e, function="get_lobbies")
         return []
 
+@timed
+def find_lobbies(query, refresh=True):
+    """Runs a LobbyQuery over the cached lobbies, refreshing the snapshot first if it expired."""
+    if refresh:
+        qschedule.get()
+    lobbies = query.run(lobby_table.lobbies())
+    log_event("lobbies_found", query=str(query), count=len(lobbies))
+    return lobbies
+
+@timed
 def claim_referee(lobby_id, discord_id):
     """Claims a lobby by adding a referee's id to the referee cell."""
     try:
-        worksheet = sheet.worksheet("QSchedule")
-        cell = worksheet.find(lobby_id)
+        snapshot = qschedule.get()
+        row = find_lobby_row(lobby_id)
 
-        if cell:
-            row = cell.row
-            referee_cell = worksheet.cell(row, 23)  # Referee cell is in column W (23rd column)
-
-            if referee_cell.value:
+        if row:
+            if snapshot.value(row, REFEREE_COLUMN):  # Referee cell is in column W (23rd column)
                 return False, "**Lobby is already claimed.**"
 
-            # Update the referee cell with the Discord user's nickname
-            worksheet.update(referee_cell.address, [[str(discord_id)]])
-            print(f"✅ {discord_id} claimed lobby {lobby_id} successfully.")
+            # Update the referee cell with the Discord user's id
+            claim_cell(snapshot, row, REFEREE_COLUMN, discord_id)
+            log_event("lobby_claimed", lobby_id=lobby_id, referee=discord_id)
             return True, None
         else:
             return False, "**Lobby not found.**"
 
+    except StaleWriteError as e:
+        log_event("lobby_claim_rejected", logging.WARNING, lobby_id=lobby_id, referee=discord_id, error=str(e))
+        return False, "**Lobby is already claimed.**"
+    except SheetsBusyError as e:
+        log_event("sheets_busy", logging.WARNING, function="claim_referee", error=str(e))
+        return False, "**Google Sheets is busy right now, please try again in a minute.**"
     except Exception as e:
-        print(f"⚠️ Google Sheets Error: {e}")
+        log_event("sheets_error", logging.ERROR, exc_info=e, function="claim_referee")
         return False, "An error occurred while claiming the lobby."
 
+@timed
 def drop_referee(lobby_id, discord_id):
     """Drops a referee's claim on a lobby."""
     try:
-        worksheet = sheet.worksheet("QSchedule")
-        cell = worksheet.find(lobby_id)
-
-        if cell:
-            row = cell.row
-            referee_cell_addr = gspread.utils.rowcol_to_a1(row, 23)  # Referee cell is in column W (23rd column)
+        snapshot = qschedule.get()
+        row = find_lobby_row(lobby_id)
 
+        if row:
             # Get the current value of the referee cell as a string
-            current_referee_id = worksheet.acell(referee_cell_addr).value.strip()  # Strip any surrounding spaces
+            current_referee_id = snapshot.value(row, REFEREE_COLUMN).strip()  # Referee cell is in column W (23rd column)
 
             # Compare the current value with the provided discord ID
             if current_referee_id != str(discord_id):
                 return False, "**This lobby is claimed by another referee. You cannot drop this claim.**"
 
-            # Use batch_clear to clear the referee cell
-            worksheet.batch_clear([referee_cell_addr])
-            print(f"✅ {discord_id} dropped from lobby {lobby_id}.")
+            # Clear the referee cell on the sheet and in the snapshot
+            drop_cell(snapshot, row, REFEREE_COLUMN, discord_id)
+            log_event("lobby_dropped", lobby_id=lobby_id, referee=discord_id)
             return True, None
         else:
             return False, "**Lobby not found.**"
 
+    except StaleWriteError as e:
+        log_event("lobby_drop_rejected", logging.WARNING, lobby_id=lobby_id, referee=discord_id, error=str(e))
+        return False, "**This lobby is claimed by another referee. You cannot drop this claim.**"
+    except SheetsBusyError as e:
+        log_event("sheets_busy", logging.WARNING, function="drop_referee", error=str(e))
+        return False, "**Google Sheets is busy right now, please try again in a minute.**"
     except Exception as e:
-        print(f"⚠️ Google Sheets Error: {e}")
+        log_event("sheets_error", logging.ERROR, exc_info=e, function="drop_referee")
         return False, "An error occurred while dropping the lobby."
     
-def get_claimed_lobbies(discord_id):
+@timed
+def get_claimed_lobbies(discord_id, refresh=True):
     """Fetches the lobbies claimed by the referee, ensuring that the lobby times are not earlier than the current time by more than 1 hour."""
     try:
-        worksheet = sheet.worksheet("QSchedule")
-        lobby_cells = worksheet.range("H2:H")
-        date_cells = worksheet.range("I2:I")
-        time_cells = worksheet.range("J2:J")
-        referee_cells = worksheet.range("W2:W")
-        
-        claimed_lobbies = []
-        current_time = datetime.now(pytz.UTC)
-        one_hour_earlier = current_time - timedelta(hours=1)
-
-        # Iterate over the lobbies to find the ones claimed by the referee
-        for i, (lobby_cell, date_cell, time_cell, referee_cell) in enumerate(zip(lobby_cells, date_cells, time_cells, referee_cells)):
-            if referee_cell.value != str(discord_id):  # Only look for lobbies claimed by this referee
-                continue
+        if refresh:
+            qschedule.get()
+        one_hour_earlier = int((datetime.now(pytz.UTC) - timedelta(hours=1)).timestamp())
 
-            try:
-                lobby_datetime = datetime.strptime(f"{date_cell.value} {time_cell.value}", "%m/%d/%y %H:%M").replace(tzinfo=pytz.UTC)
-                if lobby_datetime < one_hour_earlier:
-                    continue  # Skip lobbies claimed more than 1 hour earlier
-            except ValueError:
-                continue  # Skip invalid date/time formats
-
-            # Add the valid lobby to the list
-            discord_timestamp = f"<t:{int(lobby_datetime.timestamp())}:F>"
-            claimed_lobbies.append((lobby_cell.value, discord_timestamp))
+        claimed_lobbies = []
+        # Only look at the lobbies claimed by this referee
+        for row in staff_index.claimed_rows(discord_id, "referee"):
+            lobby = lobby_table.get(row)
+            if not lobby or lobby.start is None or lobby.start < one_hour_earlier:
+                continue  # Skip invalid times and lobbies claimed more than 1 hour earlier
+            claimed_lobbies.append(lobby)
 
-        return claimed_lobbies
+        return [(lobby.lobby_id, lobby.discord_timestamp) for lobby in sorted(claimed_lobbies, key=lambda lobby: lobby.start)]
 
     except Exception as e:
-        print(f"⚠️ Google Sheets Error: {e}")
+        log_event("sheets_error", logging.ERROR, exc_info=e, function="get_claimed_lobbies")
         return []
 
-def fetch_pings(lobbyID):
-    worksheet = sheet.worksheet("QSchedule")
-
-    # Fetch data ranges
-    lobby_cells = worksheet.range("H2:H")  # Lobby IDs
-    referee_cells = worksheet.range("W2:W")  # Referee id
-    team_cells = worksheet.range("X2:AB")  # Team cap IDs (5 columns)
-
-    # Loop through lobby cells to find the matching lobbyID
-    for i, cell in enumerate(lobby_cells):
-        if cell.value == lobbyID:
-            # Get referee id from column W
-            referee_nickname = referee_cells[i].value.strip() if referee_cells[i].value else None
-            
-            # Get team cap IDs from columns X to AB
-            team_cap_ids = [team_cells[j].value.strip() for j in range(i * 5, i * 5 + 5) if team_cells[j].value]
-
-            return referee_nickname, team_cap_ids
-
-    # If no matching lobby found
-    return None, None
+@timed
+def fetch_pings(lobbyID, snapshot=None):
+    if snapshot is None:
+        qschedule.get()  # The caller didn't refresh the snapshot for this tick
+
+    # Find the matching lobbyID in column H
+    row = find_lobby_row(lobbyID)
+    lobby = lobby_table.get(row) if row else None
+    if not lobby:
+        # If no matching lobby found
+        return None, None
+
+    # Referee id from column W and team cap IDs from columns X to AB
+    return lobby.referee_id or None, list(lobby.captain_ids)
+
+@timed
+def mark_pinged(notifications):
+    """Sets the pinged flag (column T) of every delivered lobby ping in one request, skipping rows that no longer hold their lobby."""
+    snapshot = qschedule.get()
+    with snapshot.batch() as batch:
+        for notification in notifications:
+            if snapshot.value(notification.row, 8) == notification.record_id:  # Lobby ID is in column H
+                batch.set(notification.row, 20, 1)
@@ -0,0 +1,185 @@
+import logging
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from config import SQLITE_PATH, JOB_RETRY_SECONDS, JOB_RETENTION_DAYS
+from utils.sheet_executor import run_sheet
+from utils.logs import log_event
+
+
+class Job:
+    """One unit of pending work, payload is a JSON-serializable dict."""
+
+    __slots__ = ("id", "kind", "key", "payload", "run_at", "attempts")
+
+    def __init__(self, id, kind, key, payload, run_at, attempts):
+        self.id = id  # Enqueue order, jobs are always handed out in it
+        self.kind = kind
+        self.key = key  # Idempotency key, a key is only ever enqueued once
+        self.payload = payload
+        self.run_at = run_at  # Unix time the job becomes due
+        self.attempts = attempts
+
+
+class JobQueue:
+    """Persistent job queue in SQLite (WAL), shared by every cog.
+
+    Jobs stay pending until they are completed, so work a crash interrupted is handed out again after the restart
+    (at-least-once). Enqueuing a key that already exists, pending or done, does nothing, which makes retries and
+    replays idempotent.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None  # Opened on first use, so the database is only created when there is work
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, key TEXT UNIQUE, payload TEXT,
+                    run_at REAL, attempts INTEGER DEFAULT 0, done_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (done_at, kind, run_at);
+            """)
+        return self._conn
+
+    def enqueue(self, kind, key, payload, run_at=0):
+        """Adds a job, returns False if its key was enqueued before."""
+        return bool(self.enqueue_many([(kind, key, payload, run_at)]))
+
+    def enqueue_many(self, jobs):
+        """Adds [(kind, key, payload, run_at)] in one transaction, returns the keys that were new."""
+        added = []
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for kind, key, payload, run_at in jobs:
+                    cursor = conn.execute("INSERT OR IGNORE INTO jobs (kind, key, payload, run_at) VALUES (?, ?, ?, ?)", (kind, key, json.dumps(payload), run_at))
+                    if cursor.rowcount:
+                        added.append(key)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def pending(self, kind, due_before=None):
+        """Returns the pending jobs of kind in enqueue order, only those due before due_before when it's given."""
+        query = "SELECT id, kind, key, payload, run_at, attempts FROM jobs WHERE done_at IS NULL AND kind = ?"
+        args = [kind]
+        if due_before is not None:
+            query += " AND run_at <= ?"
+            args.append(due_before)
+        with self._lock:
+            rows = self._connection().execute(query + " ORDER BY id", args).fetchall()
+        return [Job(id, kind, key, json.loads(payload), run_at, attempts) for id, kind, key, payload, run_at, attempts in rows]
+
+    def next_run_at(self, kinds):
+        """Returns when the earliest pending job of kinds becomes due, or None if there is none."""
+        if not kinds:
+            return None
+        with self._lock:
+            found = self._connection().execute(f"SELECT MIN(run_at) FROM jobs WHERE done_at IS NULL AND kind IN ({','.join('?' * len(kinds))})", list(kinds)).fetchone()
+        return found[0]
+
+    def complete(self, keys, follow_ups=()):
+        """Marks jobs done and enqueues [(kind, key, payload, run_at)] follow-ups in the same transaction."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                conn.executemany("UPDATE jobs SET done_at = ? WHERE key = ? AND done_at IS NULL", [(now, key) for key in keys])
+                for kind, key, payload, run_at in follow_ups:
+                    conn.execute("INSERT OR IGNORE INTO jobs (kind, key, payload, run_at) VALUES (?, ?, ?, ?)", (kind, key, json.dumps(payload), run_at))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def update(self, key, payload):
+        """Replaces the payload of a pending job."""
+        with self._lock:
+            self._connection().execute("UPDATE jobs SET payload = ? WHERE key = ? AND done_at IS NULL", (json.dumps(payload), key))
+
+    def retry(self, keys, delay):
+        """Pushes pending jobs back by delay seconds and counts the attempt."""
+        with self._lock:
+            self._connection().executemany("UPDATE jobs SET attempts = attempts + 1, run_at = ? WHERE key = ? AND done_at IS NULL", [(time.time() + delay, key) for key in keys])
+
+    def purge(self, older_than_days=JOB_RETENTION_DAYS):
+        """Deletes jobs completed more than older_than_days ago, their keys can be enqueued again afterwards."""
+        with self._lock:
+            self._connection().execute("DELETE FROM jobs WHERE done_at IS NOT NULL AND done_at < ?", (time.time() - older_than_days * 86400,))
+
+
+class JobRunner:
+    """Hands due jobs to async handlers, kind by kind in enqueue order.
+
+    A handler receives every due job of its kind at once and completes them itself (it may enqueue follow-ups in the
+    same transaction). When it raises, its jobs are retried after JOB_RETRY_SECONDS.
+    """
+
+    def __init__(self, queue, max_sleep=30):
+        self.queue = queue
+        self.max_sleep = max_sleep
+        self.handlers = {}  # kind -> async callable(jobs)
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+        self.notify()
+
+    def unregister(self, kind):
+        self.handlers.pop(kind, None)
+
+    def notify(self):
+        """Wakes the runner up after new jobs were enqueued."""
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def run(self):
+        # The first pass replays everything a previous run left pending
+        while True:
+            self._wakeup.clear()
+            await self.run_due()
+            next_run_at = await run_sheet(self.queue.next_run_at, list(self.handlers))
+            sleep = self.max_sleep if next_run_at is None else min(self.max_sleep, max(0, next_run_at - time.time()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=sleep)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_due(self):
+        now = time.time()
+        for kind, handler in list(self.handlers.items()):
+            jobs = await run_sheet(self.queue.pending, kind, now)
+            if not jobs:
+                continue
+            try:
+                await handler(jobs)
+            except Exception as e:
+                log_event("jobs_failed", logging.WARNING, exc_info=e, kind=kind, count=len(jobs), retry_in=JOB_RETRY_SECONDS)
+                await run_sheet(self.queue.retry, [job.key for job in jobs], JOB_RETRY_SECONDS)
+
+
+# Shared queue and runner, the jobs live next to the sqlite backend's database
+job_queue = JobQueue(SQLITE_PATH)
+job_runner = JobRunner(job_queue)
@@ -0,0 +1,79 @@
+from utils.sheet_cache import sheet_timestamp, cell_value
+
+SLOT_COUNT = 5  # Team slots per lobby, columns M-Q
+FULL_MASK = (1 << SLOT_COUNT) - 1
+
+
+class Lobby:
+    """One QSchedule row, parsed once per snapshot."""
+
+    __slots__ = ("row", "lobby_id", "start", "slot_mask", "teams", "referee", "referee_id", "captain_ids", "pinged", "staff")
+
+    def __init__(self, row, values, staff_columns=None):
+        self.row = row
+        self.lobby_id = cell_value(values, 8)  # Column H
+        self.start = sheet_timestamp(cell_value(values, 9), cell_value(values, 10))  # Columns I and J as a UTC epoch, None if unparsable
+        self.teams = tuple(cell_value(values, col).strip() for col in range(13, 13 + SLOT_COUNT))  # Columns M-Q
+        self.slot_mask = sum(1 << i for i, team in enumerate(self.teams) if team)  # Bit i set when slot i is taken
+        self.referee = cell_value(values, 11).strip()  # Column K
+        self.referee_id = cell_value(values, 23).strip()  # Column W
+        self.captain_ids = tuple(cell_value(values, col).strip() for col in range(24, 24 + SLOT_COUNT) if cell_value(values, col).strip())  # Columns X-AB
+        self.pinged = cell_value(values, 20).strip() not in ("", "0")  # Column T
+        self.staff = {role: cell_value(values, col).strip() for role, col in (staff_columns or {}).items()}  # role -> assigned staff ID
+
+    @property
+    def record_id(self):
+        return self.lobby_id
+
+    @property
+    def free_slots(self):
+        return SLOT_COUNT - bin(self.slot_mask).count("1")
+
+    @property
+    def first_free_slot(self):
+        """Returns the column of the first empty team slot, or None if the lobby is full."""
+        for i in range(SLOT_COUNT):
+            if not self.slot_mask & (1 << i):
+                return 13 + i
+        return None
+
+    @property
+    def discord_timestamp(self):
+        return f"<t:{self.start}:F>"
+
+
+class LobbyTable:
+    """Snapshot index holding a Lobby per row, re-parsing only the rows that changed."""
+
+    def __init__(self, staff_columns=None):
+        self.lock = None
+        self.staff_columns = staff_columns or {}  # role -> column holding the assigned staff member's ID
+        self.by_row = {}  # row -> Lobby
+        self._sorted = None  # Cached list of valid lobbies ordered by start, rebuilt after a change
+
+    def rebuild(self, rows):
+        self.by_row = {}
+        for row_index, values in enumerate(rows[1:], start=2):
+            self._set(row_index, values)
+        self._sorted = None
+
+    def update_row(self, row, old_values, new_values):
+        if row < 2:
+            return
+        self.by_row.pop(row, None)
+        self._set(row, new_values)
+        self._sorted = None
+
+    def _set(self, row, values):
+        if cell_value(values, 8):
+            self.by_row[row] = Lobby(row, values, self.staff_columns)
+
+    def get(self, row):
+        return self.by_row.get(row)
+
+    def lobbies(self):
+        """Returns every lobby with a valid start time, earliest first."""
+        with self.lock:
+            if self._sorted is None:
+                self._sorted = sorted((lobby for lobby in self.by_row.values() if lobby.start is not None), key=lambda lobby: (lobby.start, lobby.row))
+            return self._sorted
@@ -0,0 +1,28 @@
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+
+# One lock per lobby ID, commands touching different lobbies never wait on each other. A lock lives only as long
+# as a command holds or waits on it, so IDs typed by users don't pile up.
+_locks = weakref.WeakValueDictionary()
+
+def lobby_lock(lobby_id):
+    """Returns the asyncio lock guarding a lobby, creating it on first use. Keep a reference while using it."""
+    lock = _locks.get(lobby_id)
+    if lock is None:
+        lock = _locks[lobby_id] = asyncio.Lock()
+    return lock
+
+@asynccontextmanager
+async def lock_lobbies(*lobby_ids):
+    """Holds the locks of every given lobby, acquired in sorted order so two commands can't deadlock."""
+    locks = [lobby_lock(lobby_id) for lobby_id in sorted({lobby_id for lobby_id in lobby_ids if lobby_id})]
+    acquired = []
+    try:
+        for lock in locks:
+            await lock.acquire()
+            acquired.append(lock)
+        yield
+    finally:
+        for lock in reversed(acquired):
+            lock.release()
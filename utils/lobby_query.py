@@ -0,0 +1,150 @@
+import shlex
+from datetime import datetime
+import pytz
+from utils.sheet_cache import sheet_timestamp
+
+# Sort orders: each key ends with the row so every record has a unique, stable position for cursors
+# Queries work on anything with row, record_id, start, teams and staff (Lobby, Match), "free" needs Lobby slots
+SORT_KEYS = {
+    "start": lambda lobby: (lobby.start, lobby.row),
+    "free": lambda lobby: (-lobby.free_slots, lobby.start, lobby.row),
+    "id": lambda lobby: (_id_key(lobby.record_id), lobby.row),
+}
+
+
+class QueryError(ValueError):
+    """Raised for a condition the query engine doesn't understand, the message is shown to the user."""
+
+
+class LobbyQuery:
+    """Composable filter over Lobby records with sort order and cursor-based pages."""
+
+    def __init__(self, predicates=(), sort="start", descending=False, description=(), unassigned_roles=()):
+        if sort not in SORT_KEYS:
+            raise QueryError(f"Unknown sort order '{sort}', use one of: {', '.join(SORT_KEYS)}.")
+        self.predicates = tuple(predicates)
+        self.sort = sort
+        self.descending = descending
+        self.description = tuple(description)  # Human readable conditions, for embed titles
+        self.unassigned_roles = frozenset(unassigned_roles)  # Roles that must be empty, lets callers start from a staff index
+
+    def where(self, predicate, description=None):
+        """Returns a new query with predicate added."""
+        return LobbyQuery(self.predicates + (predicate,), self.sort, self.descending, self.description + ((description,) if description else ()), self.unassigned_roles)
+
+    def unassigned(self, role, description=None):
+        """Returns a new query that only keeps records without anyone in role."""
+        query = self.where(unassigned(role), description)
+        query.unassigned_roles = self.unassigned_roles | {role}
+        return query
+
+    def sorted_by(self, sort, descending=False):
+        return LobbyQuery(self.predicates, sort, descending, self.description, self.unassigned_roles)
+
+    def run(self, lobbies):
+        """Returns every matching lobby in sort order."""
+        key = SORT_KEYS[self.sort]
+        matches = [lobby for lobby in lobbies if all(predicate(lobby) for predicate in self.predicates)]
+        return sorted(matches, key=key, reverse=self.descending)
+
+    def page(self, lobbies, cursor=None, size=8):
+        """Returns (page, next cursor, total) for the lobbies after cursor.
+
+        The cursor is the sort key of the last lobby shown, so pages stay consistent when lobbies are added or
+        removed between clicks. The next cursor is None on the last page.
+        """
+        key = SORT_KEYS[self.sort]
+        matches = self.run(lobbies)
+        if cursor is not None:
+            matches_after = [lobby for lobby in matches if (key(lobby) < cursor if self.descending else key(lobby) > cursor)]
+        else:
+            matches_after = matches
+        page = matches_after[:size]
+        next_cursor = key(page[-1]) if len(matches_after) > size else None
+        return page, next_cursor, len(matches)
+
+    def __str__(self):
+        return ", ".join(self.description) or "all"
+
+
+def upcoming(now=None):
+    now = int(now if now is not None else datetime.now(pytz.UTC).timestamp())
+    return lambda lobby: lobby.start >= now
+
+def starts_between(after=None, before=None):
+    return lambda lobby: (after is None or lobby.start >= after) and (before is None or lobby.start <= before)
+
+def min_free_slots(count):
+    return lambda lobby: lobby.free_slots >= count
+
+def has_teams():
+    """Lobby has at least one team signed up."""
+    return lambda lobby: lobby.slot_mask != 0
+
+def match_has_teams():
+    """Match has at least one team filled in."""
+    return lambda match: bool(match.teams)
+
+def unassigned(role):
+    return lambda lobby: not lobby.staff.get(role)
+
+def team_named(name):
+    name = name.strip().lower()
+    return lambda lobby: any(team.lower() == name for team in lobby.teams)
+
+
+def parse_conditions(text, roles, query=None, slots=True, teams_signed_up=None):
+    """Builds a query from space separated conditions, e.g. 'free>=2 referee=empty after="04/15/25 12:00"'.
+
+    Supported: free, free>=N, <role>=empty, <role>=needed (teams signed up but no <role>), team=<name>,
+    after=<m/d/yy HH:MM>, before=<m/d/yy HH:MM>, sort=start|free|id and order=asc|desc.
+    The free conditions and sort are only accepted when slots is True, bracket matches have no team slots.
+    teams_signed_up is the predicate behind <role>=needed, has_teams() (Lobby slots) unless given.
+    """
+    teams_signed_up = teams_signed_up or has_teams()
+    query = query or LobbyQuery().where(upcoming())
+    try:
+        tokens = shlex.split(text or "")
+    except ValueError as e:
+        raise QueryError(f"Could not read the conditions: {e}.")
+
+    for token in tokens:
+        name, op, value = _split(token)
+        if not slots and (name == "free" or (name == "sort" and value == "free")):
+            raise QueryError(f"'{token}' only works for lobbies.")
+        if name == "free" and op is None:
+            query = query.where(min_free_slots(1), "free")
+        elif name == "free" and op == ">=" and value.isdigit():
+            query = query.where(min_free_slots(int(value)), f"free>={value}")
+        elif name in roles and op == "=" and value in ("empty", "needed"):
+            query = query.unassigned(name, f"{name}={value}")
+            if value == "needed":
+                query = query.where(teams_signed_up)
+        elif name == "team" and op == "=" and value:
+            query = query.where(team_named(value), f"team={value}")
+        elif name in ("after", "before") and op == "=":
+            timestamp = sheet_timestamp(*value.split(" ", 1)) if " " in value else sheet_timestamp(value, "00:00")
+            if timestamp is None:
+                raise QueryError(f"Invalid date in '{token}', please use m/d/yy or \"m/d/yy HH:MM\".")
+            bounds = {"after": timestamp} if name == "after" else {"before": timestamp}
+            query = query.where(starts_between(**bounds), f"{name} {value}")
+        elif name == "sort" and op == "=":
+            query = query.sorted_by(value, query.descending)
+        elif name == "order" and op == "=" and value in ("asc", "desc"):
+            query = query.sorted_by(query.sort, value == "desc")
+        else:
+            raise QueryError(f"Unknown condition '{token}'.")
+    return query
+
+
+def _split(token):
+    for op in (">=", "="):
+        if op in token:
+            name, value = token.split(op, 1)
+            return name.strip().lower(), op, value.strip()
+    return token.strip().lower(), None, ""
+
+def _id_key(lobby_id):
+    """Sorts X2 before X10."""
+    digits = "".join(ch for ch in lobby_id if ch.isdigit())
+    return (lobby_id.rstrip("0123456789"), int(digits) if digits else 0, lobby_id)
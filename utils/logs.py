@@ -0,0 +1,29 @@
+import json
+import logging
+import sys
+
+logger = logging.getLogger("syncro")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, event and the event's fields."""
+
+    def format(self, record):
+        entry = {"ts": round(record.created, 3), "level": record.levelname.lower(), "event": record.getMessage()}
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def setup_logging(level=logging.INFO):
+    """Sends the bot's events to stderr as JSON lines."""
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+def log_event(event, level=logging.INFO, exc_info=None, **fields):
+    """Logs a named event with key/value fields, e.g. log_event("lobby_found", lobby_id="A1", row=5)."""
+    logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
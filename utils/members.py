@@ -0,0 +1,116 @@
+import asyncio
+import csv
+import os
+import tempfile
+import threading
+from config import MEMBER_EXPORT_CHUNK
+from utils.roster import roster
+from utils.logs import log_event
+
+
+class MemberEntry:
+    """What the bot keeps of one guild member, enough for exports and roster checks."""
+
+    __slots__ = ("id", "name", "display_name", "role_ids", "bot")
+
+    def __init__(self, member):
+        self.id = member.id
+        self.name = f"{member.name}#{member.discriminator}" if member.discriminator not in ("0", None) else member.name
+        self.display_name = member.display_name
+        self.role_ids = frozenset(role.id for role in member.roles)
+        self.bot = member.bot
+
+
+class MemberDirectory:
+    """ID -> member index of the tournament server, loaded once and then kept current by the member events.
+
+    The bot serves one server, so members are keyed by their Discord ID alone.
+    """
+
+    def __init__(self):
+        self.members = {}  # member ID -> MemberEntry
+        self.by_role = {}  # role ID -> {member ID}
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self, members):
+        """Replaces the directory with a full member list, e.g. guild.members after chunking."""
+        entries = {member.id: MemberEntry(member) for member in members}
+        by_role = {}
+        for entry in entries.values():
+            for role_id in entry.role_ids:
+                by_role.setdefault(role_id, set()).add(entry.id)
+        with self._lock:
+            self.members, self.by_role = entries, by_role
+            self.loaded = True
+        log_event("members_loaded", members=len(entries))
+
+    def upsert(self, member):
+        """Adds a member who joined or re-indexes one whose name or roles changed."""
+        entry = MemberEntry(member)
+        with self._lock:
+            self._remove(member.id)
+            self.members[entry.id] = entry
+            for role_id in entry.role_ids:
+                self.by_role.setdefault(role_id, set()).add(entry.id)
+
+    def remove(self, member_id):
+        with self._lock:
+            self._remove(member_id)
+
+    def _remove(self, member_id):
+        entry = self.members.pop(member_id, None)
+        if not entry:
+            return
+        for role_id in entry.role_ids:
+            members = self.by_role.get(role_id)
+            if members:
+                members.discard(member_id)
+                if not members:
+                    del self.by_role[role_id]
+
+    def get(self, member_id):
+        return self.members.get(int(member_id))
+
+    def present(self, member_ids):
+        """Returns the member_ids still in the server, in order, all of them until the directory is loaded."""
+        if not self.loaded:
+            return list(member_ids)
+        return [member_id for member_id in member_ids if str(member_id).isdigit() and self.get(member_id)]
+
+    def select(self, role_id=None, team=None):
+        """Returns the IDs of the members with role_id and on team's roster, all members when both are None."""
+        with self._lock:
+            ids = set(self.by_role.get(role_id, ())) if role_id is not None else set(self.members)
+        if team is not None:
+            ids &= {int(member_id) for member_id in roster.get_members(team) if member_id.isdigit()}
+        return sorted(ids)
+
+    async def export_csv(self, member_ids, chunk_size=MEMBER_EXPORT_CHUNK):
+        """Writes Username,ID,Display Name,Team rows of member_ids to a temporary CSV file and returns its path.
+
+        Rows are written chunk by chunk, yielding to the event loop in between, so a large server neither holds the
+        whole file in memory nor blocks the bot. The caller deletes the file.
+        """
+        teams = roster.member_teams()  # One roster check for the whole export instead of one per member
+        file = tempfile.NamedTemporaryFile(mode="w", newline="", encoding="utf-8", suffix=".csv", delete=False)
+        try:
+            with file:
+                writer = csv.writer(file)
+                writer.writerow(["Username", "ID", "Display Name", "Team"])
+                for start in range(0, len(member_ids), chunk_size):
+                    rows = []
+                    for member_id in member_ids[start:start + chunk_size]:
+                        entry = self.members.get(member_id)
+                        if entry:  # Left since the selection was made
+                            rows.append([entry.name, entry.id, entry.display_name, teams.get(str(entry.id), "")])
+                    writer.writerows(rows)
+                    await asyncio.sleep(0)
+        except Exception:
+            os.unlink(file.name)
+            raise
+        return file.name
+
+
+# Shared member directory, the Members cog keeps it current
+member_directory = MemberDirectory()
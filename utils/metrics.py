@@ -0,0 +1,205 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+BYTES_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout, plus the running count, sum and max."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimates the q-quantile as the upper bound of the bucket it falls in (max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+
+class Registry:
+    """Process-wide counters and histograms keyed by metric name and label set."""
+
+    def __init__(self):
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> Histogram
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def histogram_items(self, name):
+        """Returns [(labels dict, Histogram)] of one histogram name."""
+        with self._lock:
+            return [(dict(labels), histogram) for (metric, labels), histogram in self.histograms.items() if metric == name]
+
+    def counter_items(self, name):
+        """Returns [(labels dict, value)] of one counter name."""
+        with self._lock:
+            return [(dict(labels), value) for (metric, labels), value in self.counters.items() if metric == name]
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def render_prometheus(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE syncro_{name} counter")
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"syncro_{name}{_labels(labels)} {value}")
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE syncro_{name} histogram")
+                for (metric, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f"syncro_{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"syncro_{name}_sum{_labels(labels)} {histogram.sum}")
+                    lines.append(f"syncro_{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class Scope:
+    """Sheets work done on behalf of one command or reminder tick, summed across the threads it used."""
+
+    def __init__(self, kind, name):
+        self.kind = kind  # "command" or "tick"
+        self.name = name
+        self.started = time.perf_counter()
+        self.calls = {}  # "read"/"write"/"metadata" -> requests
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def add_call(self, kind):
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+
+    def add_bytes(self, count):
+        with self._lock:
+            self.bytes += count
+
+
+registry = Registry()
+_scope = contextvars.ContextVar("metrics_scope", default=None)  # Copied into the sheets pool by run_sheet
+
+
+def begin(kind, name):
+    """Starts measuring a command or tick in the current context, returns the token for finish()."""
+    return _scope.set(Scope(kind, name))
+
+def finish(token=None, status="ok"):
+    """Records the wall time and Sheets usage of the current scope and ends it."""
+    scope = _scope.get()
+    if scope is None:
+        return
+    labels = {scope.kind: scope.name}
+    registry.observe(f"{scope.kind}_seconds", time.perf_counter() - scope.started, status=status, **labels)
+    for kind in ("read", "write"):
+        registry.observe(f"{scope.kind}_sheets_{kind}s", scope.calls.get(kind, 0), buckets=COUNT_BUCKETS, **labels)
+    registry.observe(f"{scope.kind}_sheets_bytes", scope.bytes, buckets=BYTES_BUCKETS, **labels)
+    if token is not None:
+        _scope.reset(token)
+    else:
+        _scope.set(None)
+
+@contextmanager
+def measure(kind, name):
+    """Measures a block as one command or tick, errors are recorded with status="error"."""
+    token = begin(kind, name)
+    try:
+        yield
+    except BaseException:
+        finish(token, "error")
+        raise
+    else:
+        finish(token)
+
+def timed(func):
+    """Records the wall time of every call of a sheet function as function_seconds{function="module.name"}."""
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            registry.observe("function_seconds", time.perf_counter() - started, function=name)
+    return wrapper
+
+def record_sheets_call(kind, seconds, outcome):
+    """Called by the Sheets client for every request that reached Google, retries included."""
+    registry.inc("sheets_requests_total", kind=kind, outcome=outcome)
+    registry.observe("sheets_request_seconds", seconds, kind=kind)
+    scope = _scope.get()
+    if scope:
+        scope.add_call(kind)
+
+def record_response(response, *args, **kwargs):
+    """requests response hook counting the bytes sent to and received from Google."""
+    sent = len(response.request.body or b"") if response.request is not None else 0
+    received = len(response.content or b"")
+    registry.inc("sheets_bytes_total", sent, direction="sent")
+    registry.inc("sheets_bytes_total", received, direction="received")
+    scope = _scope.get()
+    if scope:
+        scope.add_bytes(sent + received)
+
+
+async def start_http_server(host, port):
+    """Serves registry.render_prometheus() at http://host:port/metrics, returns the aiohttp runner."""
+    from aiohttp import web  # Installed with discord.py
+
+    async def handle(request):
+        return web.Response(text=registry.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
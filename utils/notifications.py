@@ -0,0 +1,197 @@
+import logging
+import asyncio
+import time
+from collections import deque
+import discord
+from config import CHANNEL_MESSAGES_PER_WINDOW, CHANNEL_WINDOW_SECONDS, NOTIFY_MERGE_SECONDS, NOTIFY_MAX_ATTEMPTS, JOB_RETRY_SECONDS
+from utils.sheet_executor import run_sheet
+from utils.jobs import job_queue, job_runner
+from utils.logs import log_event
+
+MESSAGE_LIMIT = 2000  # Discord's maximum message length
+
+
+class Notification:
+    """One ping for one lobby or match."""
+
+    __slots__ = ("key", "source", "channel_id", "row", "record_id", "text", "attempts")
+
+    def __init__(self, key, source, channel_id, row, record_id, text):
+        self.key = key  # Unique per ping, e.g. "qualifiers:A1:<start>", a key is only ever delivered once
+        self.source = source  # Name of the handler that marks it as pinged on the sheet
+        self.channel_id = channel_id
+        self.row = row
+        self.record_id = record_id  # Lobby or match ID, the handler checks the row still holds it
+        self.text = text
+        self.attempts = 0
+
+    def payload(self, text=True):
+        payload = {"source": self.source, "channel_id": self.channel_id, "row": self.row, "record_id": self.record_id}
+        if text:
+            payload["text"] = self.text
+        return payload
+
+    @classmethod
+    def from_job(cls, job):
+        payload = job.payload
+        notification = cls(job.key, payload["source"], payload["channel_id"], payload["row"], payload["record_id"], payload.get("text", ""))
+        notification.attempts = job.attempts
+        return notification
+
+
+class ChannelLimiter:
+    """Sliding window limit of messages per channel, waits instead of letting Discord answer 429."""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.sent = deque()  # Monotonic times of the last sends
+
+    async def wait(self):
+        while True:
+            now = time.monotonic()
+            while self.sent and now - self.sent[0] >= self.window:
+                self.sent.popleft()
+            if len(self.sent) < self.limit:
+                self.sent.append(now)
+                return
+            await asyncio.sleep(self.window - (now - self.sent[0]))
+
+
+class Dispatcher:
+    """Queues pings per channel and sends them from one worker per channel.
+
+    Every ping is a "ping" job in the job queue before it is sent, so pings a restart interrupted are replayed in
+    order and a key is never queued twice. Pings queued together are merged into as few messages as possible and
+    every channel is paced to Discord's rate limit. Sending a message completes its ping jobs and enqueues their
+    "mark_pinged" jobs in one transaction, the runner then hands those to the source's handler in one call.
+    """
+
+    def __init__(self, queue, runner, limit=CHANNEL_MESSAGES_PER_WINDOW, window=CHANNEL_WINDOW_SECONDS, merge_seconds=NOTIFY_MERGE_SECONDS):
+        self.queue = queue  # utils.jobs.JobQueue
+        self.runner = runner  # utils.jobs.JobRunner
+        self.limit = limit
+        self.window = window
+        self.merge_seconds = merge_seconds
+        self.handlers = {}  # source -> blocking callable(notifications) writing their pinged flags in one request
+        self.bot = None
+        self._queues = {}  # channel_id -> asyncio.Queue
+        self._workers = {}  # channel_id -> Task
+        self._channels = {}  # channel_id -> resolved channel, looked up once
+
+    def register(self, source, handler):
+        self.handlers[source] = handler
+
+    def unregister(self, source):
+        self.handlers.pop(source, None)
+
+    def bind(self, bot):
+        """Sets the bot pings are sent through, before any cog can submit one."""
+        self.bot = bot
+
+    async def start(self):
+        """Replays the pings a previous run didn't send."""
+        self.runner.register("mark_pinged", self.flag)
+        pending = await run_sheet(self.queue.pending, "ping")
+        if pending:
+            log_event("pings_replayed", count=len(pending))
+        for job in pending:
+            self._enqueue(Notification.from_job(job))
+
+    def stop(self):
+        self.runner.unregister("mark_pinged")
+        for worker in self._workers.values():
+            worker.cancel()
+        self._workers, self._queues = {}, {}
+
+    async def submit(self, notifications):
+        """Queues pings, a ping whose key was queued before (sent or not) is ignored."""
+        added = set(await run_sheet(self.queue.enqueue_many, [("ping", n.key, n.payload(), 0) for n in notifications]))
+        for notification in notifications:
+            if notification.key in added:
+                self._enqueue(notification)
+
+    def _enqueue(self, notification):
+        queue = self._queues.get(notification.channel_id)
+        if queue is None:
+            queue = self._queues[notification.channel_id] = asyncio.Queue()
+            self._workers[notification.channel_id] = asyncio.create_task(self._channel_worker(notification.channel_id, queue))
+        queue.put_nowait(notification)
+
+    async def _channel_worker(self, channel_id, queue):
+        limiter = ChannelLimiter(self.limit, self.window)
+        while True:
+            batch = [await queue.get()]
+            await asyncio.sleep(self.merge_seconds)  # Let the rest of the simultaneous pings arrive
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+
+            for group in merge(batch):
+                try:
+                    channel = await self._channel(channel_id)
+                    await limiter.wait()
+                    await channel.send("\n".join(n.text for n in group), allowed_mentions=discord.AllowedMentions(roles=True, users=True))
+                except Exception as e:
+                    log_event("pings_send_failed", logging.WARNING, channel_id=channel_id, count=len(group), error=str(e))
+                    asyncio.create_task(self._retry(group))
+                    continue
+                try:
+                    follow_ups = [("mark_pinged", f"{n.key}:pinged", n.payload(text=False), 0) for n in group]
+                    await run_sheet(self.queue.complete, [n.key for n in group], follow_ups)
+                    self.runner.notify()
+                except Exception as e:
+                    # Sent but not recorded: the worker carries on, the pings are replayed after a restart
+                    log_event("pings_complete_failed", logging.ERROR, exc_info=e, channel_id=channel_id, keys=[n.key for n in group])
+
+    async def _retry(self, notifications):
+        """Queues failed pings again after JOB_RETRY_SECONDS, giving up after NOTIFY_MAX_ATTEMPTS."""
+        await run_sheet(self.queue.retry, [n.key for n in notifications], JOB_RETRY_SECONDS)
+        await asyncio.sleep(JOB_RETRY_SECONDS)
+        for notification in notifications:
+            notification.attempts += 1
+            if notification.attempts < NOTIFY_MAX_ATTEMPTS:
+                self._enqueue(notification)
+            else:
+                log_event("ping_dropped", logging.WARNING, key=notification.key, attempts=notification.attempts)
+                await run_sheet(self.queue.complete, [notification.key])
+
+    async def _channel(self, channel_id):
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            channel = self.bot.get_channel(channel_id) or await self.bot.fetch_channel(channel_id)
+            self._channels[channel_id] = channel
+        return channel
+
+    async def flag(self, jobs):
+        """Runner handler: writes the pinged flags of every due mark_pinged job, one request per source."""
+        by_source = {}
+        for job in jobs:
+            by_source.setdefault(job.payload["source"], []).append(job)
+        for source, source_jobs in by_source.items():
+            handler = self.handlers.get(source)
+            if not handler:
+                # The cog is unloaded, the jobs wait for it without keeping the runner busy
+                await run_sheet(self.queue.retry, [job.key for job in source_jobs], JOB_RETRY_SECONDS)
+                continue
+            await run_sheet(handler, [Notification.from_job(job) for job in source_jobs])
+            await run_sheet(self.queue.complete, [job.key for job in source_jobs])
+
+
+def merge(notifications):
+    """Splits notifications into groups whose texts fit in one message together, in order."""
+    groups, group, length = [], [], 0
+    for notification in notifications:
+        added = len(notification.text) + (1 if group else 0)
+        if group and length + added > MESSAGE_LIMIT:
+            groups.append(group)
+            group, length = [], 0
+            added = len(notification.text)
+        group.append(notification)
+        length += added
+    if group:
+        groups.append(group)
+    return groups
+
+
+# Shared dispatcher for every cog, pings are persisted in the shared job queue
+dispatcher = Dispatcher(job_queue, job_runner)
@@ -0,0 +1,157 @@
+import logging
+import asyncio
+import heapq
+import threading
+import time
+from utils.sheet_cache import sheet_timestamp, cell_value
+from utils.logs import log_event
+
+
+class ReminderScheduler:
+    """Min-heap of reminder deadlines that sleeps until the next one is due.
+
+    schedule() and cancel() are safe to call from the sheets thread pool, the callback runs on the event loop
+    with every key that became due at the same time.
+    """
+
+    def __init__(self, callback, lead_seconds):
+        self.callback = callback  # async callable taking a list of due keys
+        self.lead_seconds = lead_seconds  # How long before the start time the reminder fires
+        self._heap = []  # (deadline, key), entries whose deadline no longer matches _deadlines are skipped
+        self._deadlines = {}  # key -> current deadline
+        self._starts = {}  # key -> start epoch
+        self._fired = {}  # key -> deadline it already fired for
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+
+    def schedule(self, key, start, rearm=False):
+        """Schedules a reminder lead_seconds before start. A deadline that already fired is ignored unless rearm is set."""
+        deadline = start - self.lead_seconds
+        with self._lock:
+            if self._deadlines.get(key) == deadline:
+                return
+            if not rearm and self._fired.get(key) == deadline:
+                return
+            self._fired.pop(key, None)
+            self._deadlines[key] = deadline
+            self._starts[key] = start
+            heapq.heappush(self._heap, (deadline, key))
+        self._wake()
+
+    def cancel(self, key):
+        with self._lock:
+            self._deadlines.pop(key, None)
+            self._starts.pop(key, None)
+
+    def replace(self, starts):
+        """Replaces every scheduled reminder with {key: start}."""
+        with self._lock:
+            for key in set(self._deadlines) - set(starts):
+                self._deadlines.pop(key, None)
+                self._starts.pop(key, None)
+        for key, start in starts.items():
+            self.schedule(key, start)
+
+    def start_time(self, key):
+        return self._starts.get(key)
+
+    def pending(self):
+        """Returns (deadline, key) pairs of every scheduled reminder, earliest first."""
+        with self._lock:
+            return sorted((deadline, key) for key, deadline in self._deadlines.items())
+
+    def _wake(self):
+        if self._loop and self._wakeup:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _pop_due(self, now):
+        """Pops every key whose deadline passed and returns (due keys, seconds until the next deadline)."""
+        due = []
+        with self._lock:
+            while self._heap:
+                deadline, key = self._heap[0]
+                if self._deadlines.get(key) != deadline:
+                    heapq.heappop(self._heap)  # Cancelled or rescheduled
+                    continue
+                if deadline > now:
+                    return due, deadline - now
+                heapq.heappop(self._heap)
+                del self._deadlines[key]
+                self._fired[key] = deadline
+                due.append(key)
+        return due, None
+
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            due, delay = self._pop_due(time.time())
+            if due:
+                try:
+                    await self.callback(due)
+                except Exception as e:
+                    log_event("reminder_failed", logging.ERROR, exc_info=e, due=due)
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self.run())
+        return self._task
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+class ReminderIndex:
+    """Snapshot index feeding a ReminderScheduler with the start time of every upcoming, not yet pinged row."""
+
+    def __init__(self, scheduler, id_col, date_col, time_col, pinged_col=None, rearm_cols=()):
+        self.lock = None
+        self.scheduler = scheduler
+        self.id_col = id_col
+        self.date_col = date_col
+        self.time_col = time_col
+        self.pinged_col = pinged_col
+        self.rearm_cols = tuple(rearm_cols)  # A change in these columns (e.g. a team signing up) fires a skipped reminder again
+
+    def _start(self, values):
+        """Returns (key, start epoch) for a row that needs a reminder, (key, None) otherwise."""
+        key = cell_value(values, self.id_col)
+        if not key:
+            return None, None
+        if self.pinged_col and cell_value(values, self.pinged_col).strip() not in ("", "0"):
+            return key, None
+        start = sheet_timestamp(cell_value(values, self.date_col), cell_value(values, self.time_col))
+        if start is None or start < time.time():
+            return key, None
+        return key, start
+
+    def rebuild(self, rows):
+        starts = {}
+        for values in rows[1:]:
+            key, start = self._start(values)
+            if start is not None:
+                starts[key] = start
+        self.scheduler.replace(starts)
+
+    def update_row(self, row, old_values, new_values):
+        if row < 2:
+            return
+        old_key = cell_value(old_values, self.id_col)
+        key, start = self._start(new_values)
+        if old_key and old_key != key:
+            self.scheduler.cancel(old_key)
+        if start is None:
+            if key:
+                self.scheduler.cancel(key)
+        else:
+            rearm = any(cell_value(old_values, col) != cell_value(new_values, col) for col in self.rearm_cols)
+            self.scheduler.schedule(key, start, rearm=rearm)
@@ -0,0 +1,90 @@
+import time
+import uuid
+from utils.sheet_executor import run_sheet
+
+
+class RescheduleProposal:
+    """A captain's request to move a match, waiting for the opposing captain."""
+
+    def __init__(self, proposal_id, match_id, team, opponent, proposer_id, old_start, new_start, expires_at, channel_id=None, message_id=None):
+        self.proposal_id = proposal_id
+        self.match_id = match_id
+        self.team = team  # Team of the captain who proposed
+        self.opponent = opponent  # Team whose captain has to accept
+        self.proposer_id = proposer_id
+        self.old_start = old_start
+        self.new_start = new_start
+        self.expires_at = expires_at
+        self.channel_id = channel_id  # Message holding the Accept/Decline buttons, set once it was sent
+        self.message_id = message_id
+
+    @property
+    def expired(self):
+        return time.time() >= self.expires_at
+
+    @property
+    def job_key(self):
+        return f"reschedule:{self.proposal_id}"
+
+    def payload(self):
+        return {name: getattr(self, name) for name in ("proposal_id", "match_id", "team", "opponent", "proposer_id", "old_start", "new_start", "expires_at", "channel_id", "message_id")}
+
+
+class ProposalStore:
+    """Pending reschedule proposals, at most one per match, dropped once they expire.
+
+    With a job queue every proposal is also a "reschedule" job due at its expiry, so pending proposals survive a
+    restart (see load) and the job runner expires them even if the bot was down at the time. Queue calls go through
+    the sheets pool like every other storage call, so the event loop never waits on SQLite.
+    """
+
+    def __init__(self, ttl_seconds, queue=None):
+        self.ttl_seconds = ttl_seconds
+        self.queue = queue  # utils.jobs.JobQueue, None keeps proposals in memory only
+        self.by_id = {}  # proposal_id -> RescheduleProposal
+        self.by_match = {}  # match_id -> proposal_id
+
+    def load(self):
+        """Restores the proposals that were still pending when the bot stopped, returns them."""
+        if not self.queue:
+            return []
+        for job in self.queue.pending("reschedule"):
+            proposal = RescheduleProposal(**job.payload)
+            self.by_id[proposal.proposal_id] = proposal
+            self.by_match[proposal.match_id] = proposal.proposal_id
+        return list(self.by_id.values())
+
+    async def create(self, match_id, team, opponent, proposer_id, old_start, new_start):
+        """Stores a new proposal, replacing any pending one for the same match."""
+        await self.purge()
+        replaced = self.by_match.get(match_id)
+        if replaced:
+            await self.pop(replaced)
+        proposal = RescheduleProposal(uuid.uuid4().hex[:12], match_id, team, opponent, proposer_id, old_start, new_start, time.time() + self.ttl_seconds)
+        self.by_id[proposal.proposal_id] = proposal
+        self.by_match[match_id] = proposal.proposal_id
+        if self.queue:
+            await run_sheet(self.queue.enqueue, "reschedule", proposal.job_key, proposal.payload(), run_at=proposal.expires_at)
+        return proposal
+
+    async def attach(self, proposal, channel_id, message_id):
+        """Remembers the message with the buttons, so they keep working after a restart."""
+        proposal.channel_id, proposal.message_id = channel_id, message_id
+        if self.queue:
+            await run_sheet(self.queue.update, proposal.job_key, proposal.payload())
+
+    async def get(self, proposal_id):
+        await self.purge()
+        return self.by_id.get(proposal_id)
+
+    async def pop(self, proposal_id):
+        proposal = self.by_id.pop(proposal_id, None)
+        if proposal and self.by_match.get(proposal.match_id) == proposal_id:
+            del self.by_match[proposal.match_id]
+        if proposal and self.queue:
+            await run_sheet(self.queue.complete, [proposal.job_key])
+        return proposal
+
+    async def purge(self):
+        for proposal_id in [proposal_id for proposal_id, proposal in self.by_id.items() if proposal.expired]:
+            await self.pop(proposal_id)
@@ -0,0 +1,108 @@
+import logging
+import csv
+import os
+import threading
+import time
+from config import ROSTER_FILE, ROSTER_CHECK_SECONDS
+from utils.logs import log_event
+
+class Roster:
+    """Team roster loaded from a headerless id,team[,role] CSV, reloaded only when the file changes.
+
+    Rows without a role are captains, so the original id,team captain list still loads unchanged.
+    """
+
+    def __init__(self, file_path, check_seconds=ROSTER_CHECK_SECONDS):
+        self.file_path = file_path
+        self.check_seconds = check_seconds
+        self.teams_by_id = {}  # discord_id -> team
+        self.captains_by_team = {}  # team -> [discord_id, ...]
+        self.members_by_id = {}  # discord_id -> team, captains and players
+        self.members_by_team = {}  # team -> [discord_id, ...], captains first
+        self._mtime = None  # mtime of the last parse, good or broken
+        self._checked = None  # Monotonic time of the last mtime check
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """Reloads the file if its mtime changed since the last load, checked at most every check_seconds."""
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < self.check_seconds:
+            return
+        self._checked = now
+        try:
+            mtime = os.stat(self.file_path).st_mtime
+        except OSError as e:
+            log_event("roster_load_failed", logging.WARNING, path=self.file_path, error=str(e))
+            return
+        if mtime != self._mtime:
+            self.reload(mtime)
+
+    def reload(self, mtime=None):
+        """Parses the whole file into fresh indexes and swaps them in."""
+        with self._lock:
+            try:
+                teams_by_id = {}
+                captains_by_team = {}
+                members_by_id = {}
+                players_by_team = {}
+                with open(self.file_path, mode='r', newline='') as file:
+                    # Manually specify the column names since there are no headers
+                    for row in csv.DictReader(file, fieldnames=['id', 'team', 'role']):
+                        user_id = (row['id'] or "").strip()
+                        team = (row['team'] or "").strip()
+                        role = (row['role'] or "captain").strip().lower()
+                        if not user_id or not team:
+                            continue
+                        members_by_id[user_id] = team
+                        if role == "player":
+                            players_by_team.setdefault(team, []).append(user_id)
+                        else:
+                            teams_by_id[user_id] = team
+                            captains_by_team.setdefault(team, []).append(user_id)
+
+                members_by_team = {team: captains_by_team.get(team, []) + players_by_team.get(team, []) for team in set(captains_by_team) | set(players_by_team)}
+                self.teams_by_id, self.captains_by_team = teams_by_id, captains_by_team
+                self.members_by_id, self.members_by_team = members_by_id, members_by_team
+                self._mtime = mtime if mtime is not None else os.stat(self.file_path).st_mtime
+                log_event("roster_loaded", captains=len(teams_by_id), teams=len(captains_by_team))
+                return True
+            except Exception as e:
+                # Keep the last good data and don't parse the broken file again until it changes
+                if mtime is not None:
+                    self._mtime = mtime
+                log_event("roster_load_failed", logging.WARNING, path=self.file_path, error=str(e))
+                return False
+
+    def get_team(self, user_id):
+        """Returns the team captained by user_id, or None."""
+        self._refresh()
+        return self.teams_by_id.get(str(user_id))
+
+    def get_captains(self, team):
+        """Returns the Discord IDs of a team's captains."""
+        self._refresh()
+        return list(self.captains_by_team.get(team, []))
+
+    def get_member_team(self, user_id):
+        """Returns the team user_id plays for as captain or player, or None."""
+        self._refresh()
+        return self.members_by_id.get(str(user_id))
+
+    def member_teams(self):
+        """Returns {discord_id: team} of every captain and player."""
+        self._refresh()
+        return self.members_by_id
+
+    def get_members(self, team):
+        """Returns the Discord IDs of everyone on a team, captains first."""
+        self._refresh()
+        return list(self.members_by_team.get(team, []))
+
+    def is_captain(self, user_id, team=None):
+        """Checks whether user_id captains any team, or the given team."""
+        user_team = self.get_team(user_id)
+        return user_team is not None and (team is None or user_team == team)
+
+
+# Shared roster for every cog, the path is relative to the bot's root directory
+roster = Roster(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ROSTER_FILE))
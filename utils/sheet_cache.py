@@ -0,0 +1,256 @@
+import threading
+import time
+from datetime import datetime
+import pytz
+from utils.sheet_executor import waiting
+from utils.logs import log_event
+
+
+def sheet_timestamp(date, time_value):
+    """Parses a sheet's mm/dd/yy date and HH:MM time (UTC) into a Unix timestamp, or None if they don't parse."""
+    try:
+        return int(datetime.strptime(f"{date} {time_value}", "%m/%d/%y %H:%M").replace(tzinfo=pytz.UTC).timestamp())
+    except ValueError:
+        return None
+
+
+def cell_value(values, col):
+    """Returns the 1-based col of a row's values, or an empty string past the end of the row."""
+    return values[col - 1] if col <= len(values) else ""
+
+
+class StaleWriteError(Exception):
+    """Raised when a precondition cell no longer holds the value the write was based on."""
+
+    def __init__(self, mismatches):
+        super().__init__(f"Sheet changed under the write: {mismatches}")
+        self.mismatches = mismatches  # {(row, col): (expected, actual)}
+
+
+class SheetSnapshot:
+    """Versioned in-memory copy of a schedule grid with write-through updates to its storage backend."""
+
+    def __init__(self, backend, ttl=30):
+        self.backend = backend  # utils.storage.StorageBackend holding the grid
+        self.ttl = ttl  # Seconds before the snapshot is fetched again
+        self.rows = []  # rows[0] is sheet row 1, exactly as returned by get_all_values()
+        self.version = 0  # Bumped on every refresh and every patch
+        self.fetched_at = 0.0
+        self._stale = True
+        self._lock = threading.RLock()  # Guards rows and indexes, never held across a network call
+        self._refresh_lock = threading.Lock()  # One fetch at a time, callers arriving meanwhile share its result
+        self._fetches = 0  # Completed fetches
+        self._invalidations = 0
+        self._fetch_patches = None  # {(row, col): value} patched while a fetch is in flight, None otherwise
+        self.indexes = []  # Objects with rebuild(rows) and update_row(row, old_values, new_values)
+
+    def add_index(self, index):
+        """Attaches an index that is rebuilt on every refresh and kept current on every patch."""
+        with self._lock:
+            index.lock = self._lock
+            self.indexes.append(index)
+            if self.rows:
+                index.rebuild(self.rows)
+        return index
+
+    def is_fresh(self):
+        return not self._stale and time.monotonic() - self.fetched_at < self.ttl
+
+    def get(self, force=False):
+        """Returns the snapshot, fetching the whole grid once if it expired or was invalidated."""
+        if force or not self.is_fresh():
+            self.refresh(force=force)
+        return self
+
+    def refresh(self, force=True):
+        """Replaces the snapshot with a single fetch of the whole grid.
+
+        The fetch runs outside the snapshot lock, so index readers never wait on Google, and callers that queued up
+        behind a running fetch use its result instead of fetching again. Writes patched in while the fetch was in
+        flight are laid over the fetched rows. The first load rebuilds every index, later loads only feed them the
+        rows that actually changed.
+        """
+        fetches = self._fetches
+        with waiting():  # Waiting for another caller's fetch doesn't hold a sheets worker
+            self._refresh_lock.acquire()
+        try:
+            if self._fetches != fetches and not self._stale:
+                return  # Someone else fetched while we waited
+            if not force and self.is_fresh():
+                return
+            with self._lock:
+                self._fetch_patches = {}
+                invalidations = self._invalidations
+            try:
+                rows = self.backend.fetch_rows()
+            except Exception:
+                with self._lock:
+                    self._fetch_patches = None
+                raise
+            self._swap(rows, invalidations)
+        finally:
+            self._refresh_lock.release()
+
+    def _swap(self, rows, invalidations):
+        """Installs fetched rows and feeds the indexes the rows that changed."""
+        with self._lock:
+            for (row, col), value in self._fetch_patches.items():
+                while len(rows) < row:
+                    rows.append([])
+                rows[row - 1] = list(rows[row - 1]) + [""] * (col - len(rows[row - 1]))
+                rows[row - 1][col - 1] = value
+            self._fetch_patches = None
+            first_load = self._fetches == 0 or not self.rows
+            changes = [] if first_load else diff_rows(self.rows, rows)
+            self.rows = rows
+            for index in self.indexes:
+                if first_load:
+                    index.rebuild(self.rows)
+                else:
+                    for row, old_values, new_values in changes:
+                        index.update_row(row, old_values, new_values)
+            self.fetched_at = time.monotonic()
+            self._stale = self._invalidations != invalidations  # Invalidated mid-fetch, the next read fetches again
+            self._fetches += 1
+            self.version += 1
+            log_event("snapshot_refreshed", rows=len(self.rows), changed=len(changes), version=self.version)
+
+    def touch(self):
+        """Marks the snapshot as fresh without fetching, used when a change probe says the sheet is unchanged."""
+        with self._lock:
+            if self.version:
+                self.fetched_at = time.monotonic()
+
+    def invalidate(self):
+        """Forces the next read to fetch the grid again."""
+        with self._lock:
+            self._stale = True
+            self._invalidations += 1
+
+    def value(self, row, col):
+        """Returns the cached value at a 1-based (row, col), or an empty string outside the grid."""
+        if row < 1 or row > len(self.rows):
+            return ""
+        return cell_value(self.rows[row - 1], col)
+
+    def column(self, col, start_row=2):
+        """Returns (row, value) pairs for a 1-based column, starting at start_row."""
+        return [(row_index, self.value(row_index, col)) for row_index in range(start_row, len(self.rows) + 1)]
+
+    def patch(self, row, col, value):
+        """Patches a single cell in place without touching the sheet."""
+        with self._lock:
+            while len(self.rows) < row:
+                self.rows.append([])
+            # Copy the row so readers iterating the old list never see a half-written row
+            old_row = self.rows[row - 1]
+            new_row = list(old_row)
+            if len(new_row) < col:
+                new_row.extend([""] * (col - len(new_row)))
+            new_row[col - 1] = value
+            self.rows[row - 1] = new_row
+            if self._fetch_patches is not None:
+                self._fetch_patches[(row, col)] = value
+            for index in self.indexes:
+                index.update_row(row, old_row, new_row)
+            self.version += 1
+
+    def check_cells(self, expected):
+        """Reads the {(row, col): value} precondition cells from the backend in one request.
+
+        Cells that changed are patched into the snapshot and reported with a StaleWriteError.
+        """
+        mismatches = {}
+        for (row, col), actual in self.backend.read_cells(list(expected)).items():
+            if actual.strip() != str(expected[(row, col)]).strip():
+                mismatches[(row, col)] = (expected[(row, col)], actual)
+                self.patch(row, col, actual)
+        if mismatches:
+            raise StaleWriteError(mismatches)
+
+    def write_cells(self, updates, expected=None):
+        """Writes {(row, col): value} to the backend in one request and patches the snapshot.
+
+        Nothing is patched unless the whole request went through, so the bot never sees a half-applied write.
+        When expected is given the write only happens if those cells still hold the expected values.
+        """
+        if not updates:
+            return
+        if expected:
+            self.check_cells(expected)
+        self.backend.write_cells(updates)
+        with self._lock:
+            for (row, col), value in updates.items():
+                self.patch(row, col, "" if value is None else str(value))
+
+    def update_cell(self, row, col, value, expected=None):
+        """Writes a single cell to the sheet and patches the snapshot once the write went through."""
+        self.write_cells({(row, col): value}, expected)
+
+    def clear_cell(self, row, col, expected=None):
+        """Clears a single cell on the sheet and in the snapshot."""
+        self.write_cells({(row, col): ""}, expected)
+
+    def remove_index(self, index):
+        with self._lock:
+            if index in self.indexes:
+                self.indexes.remove(index)
+
+    def batch(self):
+        return SheetBatch(self)
+
+
+class SheetBatch:
+    """Collects the cell mutations of one logical operation and commits them as a single request.
+
+    Used as a context manager: the batch is committed when the block exits normally and discarded on an exception.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.updates = {}
+        self.expected = {}
+
+    def set(self, row, col, value):
+        self.updates[(row, col)] = value
+
+    def expect(self, row, col, value):
+        """Adds a precondition: the write is rejected unless this cell still holds value."""
+        self.expected[(row, col)] = value
+
+    def clear(self, row, col):
+        self.updates[(row, col)] = ""
+
+    def commit(self):
+        updates, self.updates = self.updates, {}
+        expected, self.expected = self.expected, {}
+        self.snapshot.write_cells(updates, expected)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.updates, self.expected = {}, {}
+        return False
+
+
+def diff_rows(old_rows, new_rows):
+    """Returns [(row, old_values, new_values)] for every 1-based row whose values differ between two grids."""
+    changes = []
+    for row_index in range(max(len(old_rows), len(new_rows))):
+        old_values = old_rows[row_index] if row_index < len(old_rows) else []
+        new_values = new_rows[row_index] if row_index < len(new_rows) else []
+        if _trimmed(old_values) != _trimmed(new_values):
+            changes.append((row_index + 1, old_values, new_values))
+    return changes
+
+
+def _trimmed(values):
+    """Drops trailing empty cells so rows padded to different widths compare equal."""
+    end = len(values)
+    while end and values[end - 1] == "":
+        end -= 1
+    return values[:end]
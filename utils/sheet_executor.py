@@ -0,0 +1,86 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from config import SHEETS_MAX_WORKERS, SHEETS_WAITING_WORKERS
+
+
+class WorkerSlots:
+    """Caps the pool threads doing work at SHEETS_MAX_WORKERS.
+
+    A thread sleeping on a quota or a backoff gives its slot back meanwhile, so calls that only read memory or are
+    within quota never queue behind throttled ones. Resuming never waits, a thread that holds a lock while it sleeps
+    must always be able to finish.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def resume(self):
+        with self._cond:
+            self.active += 1
+
+
+# Dedicated pool for blocking gspread calls so the discord.py event loop never waits on Google
+_executor = ThreadPoolExecutor(max_workers=SHEETS_MAX_WORKERS + SHEETS_WAITING_WORKERS, thread_name_prefix="sheets")
+_slots = WorkerSlots(SHEETS_MAX_WORKERS)
+_local = threading.local()
+
+def _run(context, func, args, kwargs):
+    _slots.acquire()
+    _local.active = True
+    try:
+        return context.run(func, *args, **kwargs)
+    finally:
+        _local.active = False
+        _slots.release()
+
+@contextmanager
+def waiting():
+    """Frees the calling pool thread's slot while it sleeps, outside the pool it does nothing."""
+    if not getattr(_local, "active", False):
+        yield
+        return
+    _local.active = False
+    _slots.release()
+    try:
+        yield
+    finally:
+        _slots.resume()
+        _local.active = True
+
+async def run_sheet(func, *args, **kwargs):
+    """Runs a blocking sheet function on the sheets pool and awaits its result.
+
+    The caller's context goes along, so Sheets requests are counted towards the command or tick that made them.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(_run, context, func, args, kwargs))
+
+async def run_lookup(snapshot, func, *args):
+    """Runs a snapshot lookup, on the event loop while the snapshot is fresh and on the sheets pool when it needs a
+    refresh, so in-memory reads never queue behind Sheets requests. func takes refresh=False to skip the refresh.
+    """
+    if snapshot.is_fresh():
+        return func(*args, refresh=False)
+    return await run_sheet(func, *args)
+
+def shutdown():
+    """Stops accepting new sheet calls, in-flight ones are allowed to finish."""
+    _executor.shutdown(wait=False)
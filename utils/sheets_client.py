@@ -0,0 +1,160 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
+import gspread
+import requests
+from config import SHEETS_READS_PER_MINUTE, SHEETS_WRITES_PER_MINUTE, SHEETS_MAX_RETRIES
+from utils import metrics
+from utils.sheet_executor import waiting
+from utils.logs import log_event
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+STALE_STATUS_CODES = {400, 404}  # What Google answers for a range on a tab that was renamed or deleted
+
+
+class SheetsBusyError(Exception):
+    """Raised when Google kept answering 429 after every retry."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0  # Tokens per second
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes a token, sleeping until one is available. Returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            with waiting():
+                time.sleep(delay)
+            waited += delay
+
+
+class SheetsClient:
+    """Runs gspread calls within Google's per-minute quotas.
+
+    Reads and writes take a token from their bucket, 429/5xx answers and dropped connections are retried with jittered
+    exponential backoff, and identical reads that are already in flight share one request.
+    """
+
+    def __init__(self, reads_per_minute, writes_per_minute, max_retries, base_delay=1.0, max_delay=32.0):
+        self.buckets = {"read": TokenBucket(reads_per_minute), "write": TokenBucket(writes_per_minute)}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.counters = {"requests": 0, "throttled": 0, "retried": 0, "coalesced": 0, "failed": 0}
+        self._in_flight = {}  # key -> Future of the read currently running for it
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def call(self, kind, func, *args, key=None, on_stale=None, **kwargs):
+        """Runs func(*args, **kwargs) as a 'read', 'write' or 'metadata' request (metadata calls have no bucket).
+
+        Reads with a key are coalesced: callers arriving while the same key is in flight get its result.
+        When the worksheet is missing or the range no longer resolves, on_stale() is called and the request is retried
+        once, func should then look the worksheet up again rather than be bound to the old handle.
+        """
+        if key is None or kind != "read":
+            return self._call(kind, func, args, kwargs, on_stale)
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+            else:
+                self.counters["coalesced"] += 1
+        if not owner:
+            with waiting():
+                return future.result()
+
+        try:
+            result = self._call(kind, func, args, kwargs, on_stale)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _call(self, kind, func, args, kwargs, on_stale=None):
+        attempt = 0
+        while True:
+            bucket = self.buckets.get(kind)
+            if bucket and bucket.acquire() > 0:
+                self._count("throttled")
+            self._count("requests")
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                metrics.record_sheets_call(kind, time.perf_counter() - started, "ok")
+                return result
+            except gspread.exceptions.WorksheetNotFound as e:
+                metrics.record_sheets_call(kind, time.perf_counter() - started, "not_found")
+                if not on_stale:
+                    raise
+                self._forget(on_stale, e)
+                on_stale = None  # Only once, a tab that is really gone fails on the next attempt
+                continue
+            except gspread.exceptions.APIError as e:
+                status = e.code if isinstance(e.code, int) and e.code > 0 else getattr(e.response, "status_code", None)
+                metrics.record_sheets_call(kind, time.perf_counter() - started, str(status))
+                if status in STALE_STATUS_CODES and on_stale:
+                    self._forget(on_stale, e)
+                    on_stale = None
+                    continue
+                if status not in RETRY_STATUS_CODES:
+                    raise
+                if attempt >= self.max_retries:
+                    self._count("failed")
+                    if status == 429:
+                        raise SheetsBusyError(str(e)) from e
+                    raise
+                error = e
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                metrics.record_sheets_call(kind, time.perf_counter() - started, "connection_error")
+                if attempt >= self.max_retries:
+                    self._count("failed")
+                    raise
+                error = e
+
+            # Full jitter: sleep a random time up to the exponential backoff cap
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            attempt += 1
+            self._count("retried")
+            log_event("sheets_retry", logging.WARNING, error=str(error), attempt=attempt, max_retries=self.max_retries, delay=round(delay, 1))
+            with waiting():
+                time.sleep(delay)
+
+    def _forget(self, on_stale, error):
+        self._count("retried")
+        log_event("sheets_stale_worksheet", logging.WARNING, error=str(error))
+        on_stale()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+# Shared client, every Sheets request of the bot goes through it so the quotas are enforced globally
+sheets_client = SheetsClient(SHEETS_READS_PER_MINUTE, SHEETS_WRITES_PER_MINUTE, SHEETS_MAX_RETRIES)
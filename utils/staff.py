@@ -0,0 +1,65 @@
+from utils.sheet_cache import cell_value
+
+
+class StaffIndex:
+    """Snapshot index of staff assignments for any number of roles.
+
+    Keeps, per role, the rows that have no one assigned yet, and per staff member the (row, role) pairs they claimed.
+    """
+
+    def __init__(self, id_col, staff_columns):
+        self.lock = None
+        self.id_col = id_col  # Column holding the lobby/match ID, rows without one are ignored
+        self.staff_columns = dict(staff_columns)  # role -> column of the assigned staff member's Discord ID
+        self.unassigned = {role: set() for role in self.staff_columns}  # role -> rows without anyone
+        self.claims = {}  # staff ID -> {(row, role)}
+
+    def rebuild(self, rows):
+        self.unassigned = {role: set() for role in self.staff_columns}
+        self.claims = {}
+        for row_index, values in enumerate(rows[1:], start=2):
+            self._add(row_index, values)
+
+    def update_row(self, row, old_values, new_values):
+        if row < 2:
+            return
+        self._remove(row, old_values)
+        self._add(row, new_values)
+
+    def _add(self, row, values):
+        if not cell_value(values, self.id_col).strip():
+            return
+        for role, col in self.staff_columns.items():
+            staff_id = cell_value(values, col).strip()
+            if staff_id:
+                self.claims.setdefault(staff_id, set()).add((row, role))
+            else:
+                self.unassigned[role].add(row)
+
+    def _remove(self, row, values):
+        for role, col in self.staff_columns.items():
+            self.unassigned[role].discard(row)
+            staff_id = cell_value(values, col).strip()
+            claims = self.claims.get(staff_id)
+            if claims:
+                claims.discard((row, role))
+                if not claims:
+                    del self.claims[staff_id]
+
+    def unassigned_rows(self, role):
+        with self.lock:
+            return set(self.unassigned.get(role, ()))
+
+    def claimed_rows(self, staff_id, role=None):
+        """Returns the sorted rows staff_id claimed, for one role or all of them."""
+        with self.lock:
+            return sorted({row for row, claimed_role in self.claims.get(str(staff_id), ()) if role is None or claimed_role == role})
+
+
+def claim_cell(snapshot, row, col, staff_id):
+    """Writes staff_id into an assignment cell only if it is still empty on the sheet. Raises StaleWriteError otherwise."""
+    snapshot.update_cell(row, col, str(staff_id), expected={(row, col): ""})
+
+def drop_cell(snapshot, row, col, staff_id):
+    """Clears an assignment cell only if it still holds staff_id on the sheet. Raises StaleWriteError otherwise."""
+    snapshot.clear_cell(row, col, expected={(row, col): str(staff_id)})
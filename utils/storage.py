@@ -0,0 +1,260 @@
+import logging
+import asyncio
+import sqlite3
+import threading
+import gspread
+from config import STORAGE_BACKEND, SQLITE_PATH, STAGES
+from utils.connections import get_stage_worksheet, forget_worksheet
+from utils.sheet_executor import run_sheet
+from utils.sheets_client import sheets_client
+from utils.logs import log_event
+
+
+class StorageBackend:
+    """Where a schedule grid lives. Lobbies, team slots, referee claims and ping flags are all cells of that grid,
+    so the scheduling functions work unchanged on any backend.
+
+    Rows and columns are 1-based like the sheet.
+    """
+
+    def fetch_rows(self):
+        """Returns the whole grid as a list of rows of strings, row 1 first."""
+        raise NotImplementedError
+
+    def read_cells(self, cells):
+        """Returns {(row, col): value} for the given cells, read from the backend rather than any cache."""
+        raise NotImplementedError
+
+    def write_cells(self, updates):
+        """Writes {(row, col): value} atomically."""
+        raise NotImplementedError
+
+    def modified_marker(self):
+        """Returns a cheap value that changes whenever the grid was modified."""
+        raise NotImplementedError
+
+    def sync(self):
+        """Pushes pending writes to a mirror, if the backend has one. Returns the number of cells pushed."""
+        return 0
+
+
+class SheetsBackend(StorageBackend):
+    """The grid is a Google Sheets worksheet."""
+
+    def __init__(self, load_worksheet, forget_worksheet=None):
+        self._load_worksheet = load_worksheet  # Callable returning the gspread worksheet
+        self._forget_worksheet = forget_worksheet  # Callable dropping the cached handle when the tab went stale
+
+    @property
+    def worksheet(self):
+        return self._load_worksheet()
+
+    # The requests look the worksheet up on every attempt, so a retry after _forget_worksheet uses a fresh handle
+    def fetch_rows(self):
+        worksheet = self.worksheet
+        rows = sheets_client.call("read", lambda: self.worksheet.get_all_values(), key=(worksheet.spreadsheet_id, worksheet.id, "get_all_values"), on_stale=self._forget_worksheet)
+        return [list(row) for row in rows]
+
+    def read_cells(self, cells):
+        cells = list(cells)
+        if not cells:
+            return {}
+        ranges = [gspread.utils.rowcol_to_a1(row, col) for row, col in cells]
+        results = sheets_client.call("read", lambda: self.worksheet.batch_get(ranges), on_stale=self._forget_worksheet)
+        return {cell: str(values[0][0]) if values and values[0] else "" for cell, values in zip(cells, results)}
+
+    def write_cells(self, updates):
+        if not updates:
+            return
+        data = [{"range": address, "values": [values]} for address, values in _row_runs(updates)]
+        sheets_client.call("write", lambda: self.worksheet.batch_update(data), on_stale=self._forget_worksheet)
+
+    def modified_marker(self):
+        # Drive metadata call, it doesn't count against the Sheets read quota
+        worksheet = self.worksheet
+        return sheets_client.call("metadata", worksheet.spreadsheet.get_lastUpdateTime, key=(worksheet.spreadsheet_id, "modifiedTime"))
+
+
+class SQLiteBackend(StorageBackend):
+    """The grid is stored cell by cell in a local SQLite database in WAL mode, several tabs can share one file."""
+
+    def __init__(self, path, tab):
+        self.path = path
+        self.tab = tab
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cells (tab TEXT, row INTEGER, col INTEGER, value TEXT, PRIMARY KEY (tab, row, col));
+            CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, tab TEXT, row INTEGER, col INTEGER, value TEXT);
+            CREATE TABLE IF NOT EXISTS versions (tab TEXT PRIMARY KEY, version INTEGER);
+        """)
+
+    def fetch_rows(self):
+        with self._lock:
+            cells = self._conn.execute("SELECT row, col, value FROM cells WHERE tab = ?", (self.tab,)).fetchall()
+        if not cells:
+            return []
+        width = max(col for _, col, _ in cells)
+        rows = [[""] * width for _ in range(max(row for row, _, _ in cells))]
+        for row, col, value in cells:
+            rows[row - 1][col - 1] = value
+        return rows
+
+    def read_cells(self, cells):
+        values = {}
+        with self._lock:
+            for row, col in cells:
+                found = self._conn.execute("SELECT value FROM cells WHERE tab = ? AND row = ? AND col = ?", (self.tab, row, col)).fetchone()
+                values[(row, col)] = found[0] if found else ""
+        return values
+
+    def write_cells(self, updates, outbox=False):
+        """Writes the cells in one transaction, optionally queueing them for the mirror in the same transaction."""
+        if not updates:
+            return
+        rows = [(self.tab, row, col, "" if value is None else str(value)) for (row, col), value in updates.items()]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO cells (tab, row, col, value) VALUES (?, ?, ?, ?)", rows)
+                if outbox:
+                    self._conn.executemany("INSERT INTO outbox (tab, row, col, value) VALUES (?, ?, ?, ?)", rows)
+                self._conn.execute("INSERT INTO versions (tab, version) VALUES (?, 1) ON CONFLICT(tab) DO UPDATE SET version = version + 1", (self.tab,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def replace_rows(self, rows, keep=()):
+        """Replaces the whole grid with rows, leaving the cells in keep untouched."""
+        keep = set(keep)
+        cells = [
+            (self.tab, row_index, col_index, value)
+            for row_index, values in enumerate(rows, start=1)
+            for col_index, value in enumerate(values, start=1)
+            if value != "" and (row_index, col_index) not in keep
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                kept = [
+                    (self.tab, row, col, value)
+                    for row, col, value in self._conn.execute("SELECT row, col, value FROM cells WHERE tab = ?", (self.tab,))
+                    if (row, col) in keep
+                ]
+                self._conn.execute("DELETE FROM cells WHERE tab = ?", (self.tab,))
+                self._conn.executemany("INSERT OR REPLACE INTO cells (tab, row, col, value) VALUES (?, ?, ?, ?)", cells + kept)
+                self._conn.execute("INSERT INTO versions (tab, version) VALUES (?, 1) ON CONFLICT(tab) DO UPDATE SET version = version + 1", (self.tab,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def pending(self):
+        """Returns [(id, row, col, value)] of writes not yet pushed to the mirror, oldest first."""
+        with self._lock:
+            return self._conn.execute("SELECT id, row, col, value FROM outbox WHERE tab = ? ORDER BY id", (self.tab,)).fetchall()
+
+    def acknowledge(self, last_id):
+        """Drops every outbox entry up to and including last_id."""
+        with self._lock:
+            self._conn.execute("DELETE FROM outbox WHERE tab = ? AND id <= ?", (self.tab, last_id))
+
+    def modified_marker(self):
+        with self._lock:
+            found = self._conn.execute("SELECT version FROM versions WHERE tab = ?", (self.tab,)).fetchone()
+        return found[0] if found else 0
+
+
+class MirroredBackend(StorageBackend):
+    """Commits to a local SQLite backend and mirrors the writes to Google Sheets in the background.
+
+    Commands never wait on Google: writes land in SQLite together with an outbox entry, and sync() pushes the outbox
+    to the sheet in one batch_update. Edits made directly on the sheet (and its formula columns) are pulled back when
+    the sheet's modified time changes, except for cells the bot still has to push.
+    """
+
+    def __init__(self, local, remote):
+        self.local = local
+        self.remote = remote
+        self._remote_marker = None
+        self._sync_lock = threading.Lock()
+
+    def fetch_rows(self):
+        if self._remote_marker is None and not self.local.fetch_rows():
+            self.pull()  # First start, seed the local copy from the sheet
+        return self.local.fetch_rows()
+
+    def read_cells(self, cells):
+        return self.local.read_cells(cells)
+
+    def write_cells(self, updates):
+        self.local.write_cells(updates, outbox=True)
+
+    def pull(self, marker=None):
+        """Copies the sheet into the local grid, keeping cells that are still waiting in the outbox."""
+        with self._sync_lock:
+            rows = self.remote.fetch_rows()
+            pending = {(row, col) for _, row, col, _ in self.local.pending()}
+            self.local.replace_rows(rows, keep=pending)
+            self._remote_marker = marker if marker is not None else self.remote.modified_marker()
+
+    def modified_marker(self):
+        try:
+            marker = self.remote.modified_marker()
+            if marker != self._remote_marker:
+                self.pull(marker)
+        except Exception as e:
+            log_event("mirror_probe_failed", logging.WARNING, error=str(e))
+        return self.local.modified_marker()
+
+    def sync(self):
+        with self._sync_lock:
+            pending = self.local.pending()
+            if not pending:
+                return 0
+            updates = {}
+            for _, row, col, value in pending:
+                updates[(row, col)] = value  # Later writes to the same cell win
+            seen = self.remote.modified_marker() == self._remote_marker  # No external edit waiting to be pulled
+            self.remote.write_cells(updates)
+            self.local.acknowledge(pending[-1][0])
+            if seen:
+                # The push moved the sheet's modified time, remember it so the next probe doesn't pull our own write
+                self._remote_marker = self.remote.modified_marker()
+            log_event("mirror_synced", cells=len(updates))
+            return len(updates)
+
+    async def run_sync(self, interval):
+        """Pushes the outbox every interval seconds, a failed push is retried on the next round."""
+        while True:
+            try:
+                await run_sheet(self.sync)
+            except Exception as e:
+                log_event("mirror_sync_failed", logging.WARNING, error=str(e))
+            await asyncio.sleep(interval)
+
+
+def make_backend(stage):
+    """Returns the storage of a stage's grid: the sheet itself, or a local SQLite copy mirrored to the sheet."""
+    sheets = SheetsBackend(lambda: get_stage_worksheet(stage), lambda: forget_worksheet(stage))
+    if STORAGE_BACKEND == "sqlite":
+        return MirroredBackend(SQLiteBackend(SQLITE_PATH, STAGES[stage]["worksheet"]), sheets)
+    return sheets
+
+
+def _row_runs(updates):
+    """Groups {(row, col): value} into (A1 range, values) runs of horizontally adjacent cells."""
+    runs = []
+    for row, col in sorted(updates):
+        value = "" if updates[(row, col)] is None else updates[(row, col)]
+        if runs and runs[-1][0] == row and runs[-1][1] + len(runs[-1][2]) == col:
+            runs[-1][2].append(value)
+        else:
+            runs.append((row, col, [value]))
+    return [
+        (gspread.utils.rowcol_to_a1(row, col) + (f":{gspread.utils.rowcol_to_a1(row, col + len(values) - 1)}" if len(values) > 1 else ""), values)
+        for row, col, values in runs
+    ]